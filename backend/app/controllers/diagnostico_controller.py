@@ -0,0 +1,157 @@
+"""
+Controlador de diagnóstico de rendimiento
+Sistema de Gestión Papelería Dohko
+"""
+
+import anyio
+from fastapi import APIRouter, HTTPException, Query, Response
+from app.utils.estadisticas_sql import estadisticas_sql
+from app.utils.perfilador import perfilador, MAX_SEGUNDOS
+from app.utils.memoria import diagnostico_memoria
+from app.services.tareas_service import cola_tareas
+
+router = APIRouter()
+
+@router.get("/consultas")
+def obtener_consultas_costosas(
+    limite: int = Query(20, ge=1, le=500),
+    orden: str = Query("total", description="total, maximo, conteo, promedio o filas")
+):
+    """Obtener las sentencias SQL más costosas con su último plan lento"""
+    try:
+        consultas = estadisticas_sql.top(limite, orden)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "exito": True,
+        "data": {
+            "resumen": estadisticas_sql.resumen(),
+            "consultas": consultas
+        }
+    }
+
+@router.delete("/consultas")
+def reiniciar_estadisticas_consultas():
+    """Descartar las estadísticas de sentencias acumuladas"""
+    estadisticas_sql.reiniciar()
+    return {"exito": True, "mensaje": "Estadísticas de consultas reiniciadas"}
+
+def _formatear_perfil(resultado: dict, formato: str, limite: int):
+    if formato == "colapsado":
+        return Response(perfilador.pilas_colapsadas(resultado), media_type="text/plain; charset=utf-8")
+    return {
+        "exito": True,
+        "data": {
+            "fecha": resultado["fecha"],
+            "duracion_segundos": resultado["duracion_segundos"],
+            "intervalo_ms": resultado["intervalo_ms"],
+            "muestras": resultado["muestras"],
+            "funciones": perfilador.funciones_principales(resultado, limite),
+            "pilas_colapsadas": perfilador.pilas_colapsadas(resultado)
+        }
+    }
+
+@router.post("/perfil")
+async def perfilar(
+    segundos: float = Query(10, gt=0, le=MAX_SEGUNDOS),
+    intervalo_ms: float = Query(5, ge=1, le=1000),
+    incluir_inactivos: bool = Query(False, description="Incluir hilos que solo esperan trabajo"),
+    formato: str = Query("json", pattern="^(json|colapsado)$"),
+    limite: int = Query(30, ge=1, le=500)
+):
+    """
+    Muestrear las pilas de todos los hilos durante N segundos.
+    formato=colapsado devuelve texto listo para flamegraph.pl o speedscope.
+    """
+    sesion = perfilador.iniciar(segundos, intervalo_ms, incluir_inactivos)
+    if sesion is None:
+        raise HTTPException(status_code=409, detail="Ya hay una sesión de perfilado en curso")
+    # Esperar sin ocupar un hilo del pool para no distorsionar la muestra
+    while not sesion.terminada():
+        await anyio.sleep(0.1)
+    if sesion.resultado is None:
+        raise HTTPException(status_code=500, detail="El muestreo falló y no produjo resultados")
+    return _formatear_perfil(sesion.resultado, formato, limite)
+
+@router.get("/perfil/ultimo")
+def obtener_ultimo_perfil(
+    formato: str = Query("json", pattern="^(json|colapsado)$"),
+    limite: int = Query(30, ge=1, le=500)
+):
+    """Obtener el resultado de la última sesión de perfilado"""
+    if perfilador.ultimo_resultado is None:
+        raise HTTPException(status_code=404, detail="Todavía no se ha ejecutado ningún perfilado")
+    return _formatear_perfil(perfilador.ultimo_resultado, formato, limite)
+
+@router.get("/memoria")
+def obtener_estado_memoria():
+    """Estado de tracemalloc, instantáneas guardadas y picos por ruta"""
+    return {
+        "exito": True,
+        "data": {
+            **diagnostico_memoria.estado(),
+            "picos_por_ruta": diagnostico_memoria.picos_por_ruta()
+        }
+    }
+
+@router.post("/memoria/iniciar")
+def iniciar_rastreo_memoria(
+    marcos: int = Query(1, ge=1, le=50, description="Profundidad de pila guardada por asignación"),
+    tasa_muestreo: float = Query(0.0, ge=0, le=1, description="Fracción de peticiones a las que se mide el pico")
+):
+    """Activar tracemalloc (tiene costo mientras está activo)"""
+    return {"exito": True, "data": diagnostico_memoria.iniciar(marcos, tasa_muestreo)}
+
+@router.post("/memoria/detener")
+def detener_rastreo_memoria():
+    """Desactivar tracemalloc y descartar las instantáneas"""
+    return {"exito": True, "data": diagnostico_memoria.detener()}
+
+@router.post("/memoria/instantaneas")
+def tomar_instantanea_memoria(nombre: str = Query(None)):
+    """Tomar una instantánea de las asignaciones actuales"""
+    try:
+        return {"exito": True, "data": diagnostico_memoria.tomar_instantanea(nombre)}
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/memoria/instantaneas/{nombre}")
+def obtener_instantanea_memoria(
+    nombre: str,
+    agrupar: str = Query("lineno", description="lineno, filename o traceback"),
+    limite: int = Query(25, ge=1, le=500)
+):
+    """Mayores consumidores de memoria de una instantánea"""
+    try:
+        return {"exito": True, "data": diagnostico_memoria.estadisticas(nombre, agrupar, limite)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/memoria/comparar")
+def comparar_instantaneas_memoria(
+    anterior: str,
+    posterior: str,
+    agrupar: str = Query("lineno", description="lineno, filename o traceback"),
+    limite: int = Query(25, ge=1, le=500)
+):
+    """Diferencia de memoria entre dos instantáneas"""
+    try:
+        return {"exito": True, "data": diagnostico_memoria.comparar(anterior, posterior, agrupar, limite)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/tareas")
+def obtener_estado_tareas(limite_fallidas: int = Query(20, ge=0, le=500)):
+    """Cola de tareas en segundo plano: pendientes por tipo, espera y tareas fallidas"""
+    return {"exito": True, "data": cola_tareas.estado(limite_fallidas)}
+
+@router.post("/tareas/{tarea_id}/reintentar")
+def reintentar_tarea(tarea_id: int):
+    """Volver a encolar una tarea fallida"""
+    if not cola_tareas.reintentar(tarea_id):
+        raise HTTPException(status_code=404, detail="No existe una tarea fallida con ese id")
+    return {"exito": True, "mensaje": f"Tarea {tarea_id} encolada de nuevo"}
@@ -0,0 +1,73 @@
+"""
+Controlador de Eventos
+Stream de cambios (Server-Sent Events) para que el frontend no tenga que
+volver a pedir las listas completas
+"""
+
+import asyncio
+import time
+from typing import Optional
+import anyio
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+from app.utils.eventos import difusor_eventos
+
+router = APIRouter()
+
+# Comentario periódico para que proxies y navegadores no cierren la conexión inactiva
+INTERVALO_LATIDO = 15.0
+# Las conexiones se renuevan cada cierto tiempo: el navegador reconecta con
+# Last-Event-ID sin perder eventos, y uvicorn no queda esperando streams al apagarse
+DURACION_MAXIMA_CONEXION = 60.0
+# Espera sugerida al navegador antes de reconectar (milisegundos)
+REINTENTO_MS = 3000
+
+TIPOS_EVENTO = ("stock_actualizado", "venta_registrada", "venta_eliminada", "alerta_creada", "productos_importados")
+
+@router.get("/stream")
+async def stream_eventos(
+    tipos: Optional[str] = Query(None, description=f"Tipos separados por coma: {', '.join(TIPOS_EVENTO)}"),
+    ultimo_id: Optional[str] = Query(None, description="Reanudar después de este id (alternativa a Last-Event-ID)"),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Stream text/event-stream con eventos compactos de cambios: stock_actualizado,
+    venta_registrada, venta_eliminada, alerta_creada y productos_importados.
+    Al reconectar, el navegador envía Last-Event-ID y recibe los eventos
+    perdidos; si ya no están disponibles recibe 'reinicio' y debe recargar.
+    """
+    filtro = [t.strip() for t in tipos.split(",") if t.strip()] if tipos else None
+    # Lee el historial de la base: fuera del bucle de eventos
+    suscripcion, pendientes, reiniciar = await anyio.to_thread.run_sync(
+        difusor_eventos.suscribir, asyncio.get_running_loop(), last_event_id or ultimo_id, filtro
+    )
+
+    async def generar():
+        try:
+            yield f"retry: {REINTENTO_MS}\n\n".encode()
+            if reiniciar:
+                yield (f"id: {difusor_eventos.ultimo_id()}\nevent: reinicio\n"
+                       f"data: {{\"motivo\": \"eventos no disponibles, recargar datos\"}}\n\n").encode()
+            for evento in pendientes:
+                yield difusor_eventos.formatear(evento)
+            fin = time.monotonic() + DURACION_MAXIMA_CONEXION
+            while True:
+                restante = fin - time.monotonic()
+                if restante <= 0:
+                    return
+                try:
+                    evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=min(INTERVALO_LATIDO, restante))
+                except asyncio.TimeoutError:
+                    yield b": latido\n\n"
+                    continue
+                if evento is None:
+                    return
+                yield difusor_eventos.formatear(evento)
+        finally:
+            difusor_eventos.cancelar(suscripcion)
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,66 @@
+"""
+Controlador de Exportación
+Descargas CSV/NDJSON de ventas, movimientos de inventario, órdenes y facturas
+Sistema de Gestión Papelería Dohko
+"""
+
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from app.services.exportacion_service import exportacion_service, FORMATOS
+
+router = APIRouter()
+
+PATRON_FORMATO = "^(" + "|".join(FORMATOS) + ")$"
+
+def _descargar(nombre: str, formato: str, desde: Optional[date], hasta: Optional[date]) -> StreamingResponse:
+    try:
+        contenido = exportacion_service.exportar(nombre, formato, desde, hasta)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"exito": False, "mensaje": str(e)}
+        )
+    archivo = exportacion_service.nombre_archivo(nombre, formato, desde, hasta)
+    return StreamingResponse(
+        contenido,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'}
+    )
+
+@router.get("/ventas")
+def exportar_ventas(
+    formato: str = Query("csv", pattern=PATRON_FORMATO),
+    desde: Optional[date] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (inclusive)")
+):
+    """Exportar ventas con sus productos (CSV: una fila por producto vendido)"""
+    return _descargar("ventas", formato, desde, hasta)
+
+@router.get("/inventario")
+def exportar_movimientos_inventario(
+    formato: str = Query("csv", pattern=PATRON_FORMATO),
+    desde: Optional[date] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (inclusive)")
+):
+    """Exportar los movimientos de inventario"""
+    return _descargar("inventario", formato, desde, hasta)
+
+@router.get("/ordenes")
+def exportar_ordenes(
+    formato: str = Query("csv", pattern=PATRON_FORMATO),
+    desde: Optional[date] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (inclusive)")
+):
+    """Exportar órdenes de compra con sus productos"""
+    return _descargar("ordenes", formato, desde, hasta)
+
+@router.get("/facturas")
+def exportar_facturas(
+    formato: str = Query("csv", pattern=PATRON_FORMATO),
+    desde: Optional[date] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (inclusive)")
+):
+    """Exportar facturas de proveedores"""
+    return _descargar("facturas", formato, desde, hasta)
@@ -3,8 +3,8 @@ Controlador de Inventario
 Gestiona productos, stock y alertas
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, File, Query, UploadFile
+from typing import List, Optional
 from app.schemas.inventario_schemas import (
     ProductoCreate, ProductoUpdate, ProductoResponse, 
     ActualizarStockRequest, VerificarDisponibilidadRequest,
@@ -13,6 +13,12 @@ from app.schemas.inventario_schemas import (
 from app.models.producto import Producto
 from app.models.inventario import Inventario
 from app.services.inventario_service import InventarioService
+from app.utils.single_flight import lectura_agrupada
+from app.utils.eventos import publicar_stock
+from app.utils.respuesta_json import RespuestaJSON
+from app.services.importacion_service import (
+    importacion_service, ErrorImportacion, formato_por_nombre, FORMATOS_IMPORTACION
+)
 
 router = APIRouter()
 inventario_service = InventarioService()
@@ -30,6 +36,7 @@ def registrar_producto(producto: ProductoCreate):
     )
     
     if nuevo_producto.registrar():
+        publicar_stock([nuevo_producto.id])
         return ProductoResponse(
             id=nuevo_producto.id,
             nombre=nuevo_producto.nombre,
@@ -42,38 +49,38 @@ def registrar_producto(producto: ProductoCreate):
     else:
         raise HTTPException(status_code=400, detail="Error al registrar el producto")
 
+@router.post("/productos/importar")
+def importar_productos(
+    archivo: UploadFile = File(..., description="Lista de productos en CSV, JSON o NDJSON"),
+    formato: Optional[str] = Query(None, pattern="^(" + "|".join(FORMATOS_IMPORTACION) + ")$",
+                                   description="Se deduce de la extensión si no se indica"),
+    solo_validar: bool = Query(False, description="Validar y reportar errores sin guardar cambios")
+):
+    """
+    Importar productos de forma masiva. Columnas: nombre, precio (obligatorias),
+    sku, descripcion, stock_actual, stock_minimo, proveedor_id. Cada fila
+    actualiza el producto con el mismo sku (o nombre) o crea uno nuevo.
+    """
+    formato = formato or formato_por_nombre(archivo.filename)
+    if not formato:
+        raise HTTPException(status_code=400, detail="No se pudo deducir el formato; indique formato=csv o formato=json")
+    try:
+        return importacion_service.importar_archivo(archivo.file, formato, solo_validar)
+    except ErrorImportacion as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/productos", response_model=List[ProductoResponse])
 def obtener_productos():
     """Obtener todos los productos del inventario"""
-    productos = Producto.obtener_todos()
-    return [
-        ProductoResponse(
-            id=p.id,
-            nombre=p.nombre,
-            descripcion=p.descripcion,
-            precio=p.precio,
-            stock_actual=p.stock_actual,
-            stock_minimo=p.stock_minimo,
-            proveedor_id=p.proveedor_id
-        ) for p in productos
-    ]
+    return RespuestaJSON(Producto.listar_json())
 
 @router.get("/productos/{producto_id}", response_model=ProductoResponse)
 def obtener_producto(producto_id: int):
     """Obtener un producto específico por ID"""
-    producto = Producto.obtener_por_id(producto_id)
+    producto = Producto.obtener_json(producto_id)
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    
-    return ProductoResponse(
-        id=producto.id,
-        nombre=producto.nombre,
-        descripcion=producto.descripcion,
-        precio=producto.precio,
-        stock_actual=producto.stock_actual,
-        stock_minimo=producto.stock_minimo,
-        proveedor_id=producto.proveedor_id
-    )
+    return RespuestaJSON(producto)
 
 @router.put("/stock/actualizar")
 def actualizar_stock(request: ActualizarStockRequest):
@@ -90,21 +97,15 @@ def verificar_disponibilidad(producto_id: int):
     disponibilidad = inventario_service.verificar_disponibilidad(producto_id)
     return disponibilidad
 
+@lectura_agrupada()
+def _alertas_stock_bajo_json() -> bytes:
+    # Se agrupan los bytes: cada petición recibe su propia Response
+    return Inventario.productos_stock_bajo_json()
+
 @router.get("/alertas/stock-bajo", response_model=List[ProductoResponse])
 def obtener_alertas_stock_bajo():
     """Obtener productos con stock bajo"""
-    productos_stock_bajo = Inventario.obtener_productos_stock_bajo()
-    return [
-        ProductoResponse(
-            id=p.id,
-            nombre=p.nombre,
-            descripcion=p.descripcion,
-            precio=p.precio,
-            stock_actual=p.stock_actual,
-            stock_minimo=p.stock_minimo,
-            proveedor_id=p.proveedor_id
-        ) for p in productos_stock_bajo
-    ]
+    return RespuestaJSON(_alertas_stock_bajo_json())
 
 @router.get("/productos/{producto_id}/historial")
 def obtener_historial_producto(producto_id: int):
@@ -134,6 +135,7 @@ def actualizar_producto(producto_id: int, producto_data: ProductoUpdate):
         producto.proveedor_id = producto_data.proveedor_id
     
     if producto.actualizar():
+        publicar_stock([producto_id])
         return {"mensaje": "Producto actualizado exitosamente"}
     else:
         raise HTTPException(status_code=400, detail="Error al actualizar el producto")
@@ -12,6 +12,7 @@ from app.schemas.proveedores_schemas import (
 )
 from app.models.proveedor import Proveedor
 from app.services.proveedores_service import ProveedoresService
+from app.utils.single_flight import lectura_agrupada
 
 router = APIRouter()
 proveedores_service = ProveedoresService()
@@ -80,6 +81,7 @@ def crear_orden(orden_data: OrdenCreate):
         raise HTTPException(status_code=400, detail=resultado["mensaje"])
 
 @router.get("/ordenes")
+@lectura_agrupada()
 def obtener_ordenes():
     """Obtener todas las órdenes"""
     ordenes = proveedores_service.obtener_ordenes()
@@ -3,9 +3,14 @@ Controlador para gestión de respaldos
 Sistema de Gestión Papelería Dohko
 """
 
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
 from app.services.backup_service import backup_service
 from app.services.backup_scheduler import backup_scheduler
+from app.services.backup_retention import PoliticaRetencion
+from app.services.replication_service import replicacion_service
+from app.utils.streaming import RespuestaArchivoRango, RespuestaTarStreaming
 
 router = APIRouter()
 
@@ -27,6 +32,7 @@ def obtener_estado_respaldos():
             "data": {
                 "respaldos_disponibles": respaldos_lista,
                 "total_respaldos": len(respaldos_lista),
+                "verificacion": backup_service.resumen_verificacion(),
                 "programador": estado_programador
             }
         }
@@ -71,6 +77,48 @@ def limpiar_respaldos_antiguos():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al limpiar respaldos: {str(e)}")
 
+@router.get("/retencion/simular")
+def simular_retencion(
+    horarios: int = Query(24, ge=0), diarios: int = Query(7, ge=0),
+    semanales: int = Query(4, ge=0), mensuales: int = Query(12, ge=0)
+):
+    """Mostrar qué respaldos eliminaría la política de retención, sin borrar nada"""
+    try:
+        politica = PoliticaRetencion(horarios, diarios, semanales, mensuales)
+        resultado = backup_service.aplicar_retencion(politica, simulacion=True)
+        
+        if not resultado["exito"]:
+            raise Exception(resultado.get("mensaje", "Error al simular retención"))
+        
+        return {"exito": True, "mensaje": resultado["mensaje"], "data": resultado}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al simular retención: {str(e)}")
+
+@router.post("/retencion/aplicar")
+def aplicar_retencion(
+    horarios: int = Query(24, ge=0), diarios: int = Query(7, ge=0),
+    semanales: int = Query(4, ge=0), mensuales: int = Query(12, ge=0)
+):
+    """Eliminar los respaldos que no cubre la política de retención"""
+    try:
+        politica = PoliticaRetencion(horarios, diarios, semanales, mensuales)
+        resultado = backup_service.aplicar_retencion(politica)
+        
+        if not resultado["exito"]:
+            raise Exception(resultado.get("mensaje", "Error al aplicar retención"))
+        
+        return {
+            "exito": True,
+            "mensaje": resultado["mensaje"],
+            "data": {
+                "archivos_eliminados": len(resultado["eliminar"]),
+                "bytes_liberados": resultado["bytes_liberados"],
+                "eliminados": resultado["eliminar"]
+            }
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al aplicar retención: {str(e)}")
+
 @router.get("/listar")
 def listar_respaldos():
     """Listar todos los respaldos disponibles"""
@@ -90,6 +138,77 @@ def listar_respaldos():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar respaldos: {str(e)}")
 
+@router.post("/catalogo/reconciliar")
+def reconciliar_catalogo():
+    """Sincronizar el catálogo de respaldos con los archivos en disco"""
+    try:
+        resultado = backup_service.reconciliar_catalogo()
+        
+        if not resultado["exito"]:
+            raise Exception(resultado.get("mensaje", "Error al reconciliar catálogo"))
+        
+        return {
+            "exito": True,
+            "mensaje": resultado["mensaje"],
+            "data": {
+                "agregados": resultado["agregados"],
+                "actualizados": resultado["actualizados"],
+                "eliminados": resultado["eliminados"]
+            }
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al reconciliar catálogo: {str(e)}")
+
+@router.post("/verificar")
+def verificar_respaldos():
+    """Iniciar en segundo plano la verificación de integridad de los respaldos pendientes"""
+    try:
+        iniciada = backup_service.verificador.verificar_en_segundo_plano()
+        
+        return {
+            "exito": True,
+            "mensaje": "Verificación iniciada" if iniciada else "Ya hay una verificación en curso",
+            "data": backup_service.resumen_verificacion()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al iniciar verificación: {str(e)}")
+
+@router.get("/replica/estado")
+def estado_replica():
+    """Obtener el estado de la replicación continua hacia el standby"""
+    try:
+        estado = replicacion_service.estado()
+        
+        return {
+            "exito": True,
+            "data": estado,
+            "mensaje": "Replicación activa" if estado["ejecutando"] else "Replicación detenida"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener estado de la réplica: {str(e)}")
+
+@router.get("/descargar")
+def descargar_respaldos(nombres: List[str] = Query(...)):
+    """Descargar varios respaldos en un archivo .tar generado al vuelo"""
+    archivos = []
+    for nombre in dict.fromkeys(nombres):
+        ruta = backup_service.ruta_respaldo(nombre)
+        if not ruta:
+            raise HTTPException(status_code=404, detail=f"Respaldo no encontrado: {nombre}")
+        archivos.append((ruta, nombre))
+    
+    nombre_descarga = f"respaldos_papeleria_dohko_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.tar"
+    return RespuestaTarStreaming(archivos, nombre_descarga)
+
+@router.get("/descargar/{nombre}")
+def descargar_respaldo(nombre: str, request: Request):
+    """Descargar un respaldo por streaming (admite Range para reanudar)"""
+    ruta = backup_service.ruta_respaldo(nombre)
+    if not ruta:
+        raise HTTPException(status_code=404, detail="Respaldo no encontrado")
+    
+    return RespuestaArchivoRango(ruta, nombre, request.headers, media_type="application/vnd.sqlite3")
+
 @router.get("/programador/estado")
 def estado_programador():
     """Obtener estado detallado del programador de respaldos"""
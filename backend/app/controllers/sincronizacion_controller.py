@@ -0,0 +1,45 @@
+"""
+Controlador de Sincronización
+Cambios incrementales para el frontend y sistemas externos
+"""
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.services.sincronizacion_service import (
+    sincronizacion_service, TABLAS_SINCRONIZADAS, LIMITE_DEFECTO, LIMITE_MAXIMO
+)
+
+router = APIRouter()
+
+@router.get("")
+def obtener_cambios(
+    since: int = Query(0, ge=0, description="Último seq recibido (0 = estado completo)"),
+    limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Cambios como máximo por página"),
+    tablas: Optional[str] = Query(None, description=f"Separadas por coma: {', '.join(TABLAS_SINCRONIZADAS)}")
+):
+    """
+    Filas de producto, venta, orden, factura y alerta que cambiaron después
+    de 'since', con su estado actual, más los ids eliminados. Guarde 'hasta'
+    y úselo como since en la siguiente llamada; si hay_mas es verdadero pida
+    la página siguiente de inmediato. Con reinicio=True vuelva a since=0.
+    """
+    seleccion = None
+    if tablas:
+        seleccion = [t.strip() for t in tablas.split(",") if t.strip()]
+        desconocidas = [t for t in seleccion if t not in TABLAS_SINCRONIZADAS]
+        if desconocidas or not seleccion:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tablas no sincronizables: {', '.join(desconocidas)}. Use {', '.join(TABLAS_SINCRONIZADAS)}"
+            )
+    return sincronizacion_service.cambios_desde(since, limite, seleccion)
+
+@router.get("/estado")
+def estado_sincronizacion():
+    """Tamaño del registro de cambios, último seq y horizonte de compactación"""
+    return {"exito": True, "data": sincronizacion_service.estado()}
+
+@router.post("/compactar")
+def compactar_registro():
+    """Compactar el registro de cambios ahora (normalmente lo hace la tarea programada)"""
+    return sincronizacion_service.compactar()
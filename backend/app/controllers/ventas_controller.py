@@ -8,17 +8,18 @@ from fastapi import APIRouter, HTTPException, status
 from typing import List
 from app.schemas.ventas_schemas import (
     VentaCreate, VentaUpdate, VentaResponse, PagoCreate, PagoResponse,
-    ComprobanteResponse, VerificarDisponibilidadVentaRequest
+    ComprobanteResponse, VerificarDisponibilidadVentaRequest, VentasLoteRequest, VentasLoteResponse
 )
 from app.models.venta import Venta
 from app.services.ventas_service import VentasService
-from app.utils.performance import medir_tiempo_transaccion
+from app.utils.single_flight import lectura_agrupada
+from app.utils.eventos import difusor_eventos, publicar_stock
+from app.utils.respuesta_json import RespuestaJSON
 
 router = APIRouter()
 ventas_service = VentasService()
 
 @router.post("/", response_model=VentaResponse, status_code=status.HTTP_201_CREATED)
-@medir_tiempo_transaccion("Registrar Venta")
 async def registrar_venta(venta_data: VentaCreate):
     """Registrar una nueva venta"""
     try:
@@ -44,6 +45,8 @@ async def registrar_venta(venta_data: VentaCreate):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={"exito": False, "mensaje": resultado["mensaje"]}
             )
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -56,27 +59,32 @@ async def registrar_venta(venta_data: VentaCreate):
             detail={"exito": False, "mensaje": "Error interno del servidor al registrar venta"}
         )
 
+@router.post("/lote", response_model=VentasLoteResponse)
+def registrar_ventas_lote(lote: VentasLoteRequest):
+    """
+    Registrar en bloque las ventas de una caja que estuvo sin conexión.
+    Cada venta lleva un UUID generado por la caja; reenviar el lote no
+    duplica ventas (las ya registradas vuelven como 'duplicada').
+    """
+    try:
+        return ventas_service.registrar_lote(lote.ventas)
+    except Exception as e:
+        print(f"Error en registrar_ventas_lote: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"exito": False, "mensaje": "Error interno del servidor al registrar el lote de ventas"}
+        )
+
+@lectura_agrupada()
+def _ventas_json() -> bytes:
+    # Se agrupan los bytes: cada petición recibe su propia Response
+    return Venta.listar_json()
+
 @router.get("/", response_model=List[VentaResponse])
-@medir_tiempo_transaccion("Obtener Ventas")
-async def obtener_ventas():
+def obtener_ventas():
     """Obtener todas las ventas"""
     try:
-        ventas = Venta.obtener_todas()
-        return [
-            VentaResponse(
-                id=v.id,
-                fecha=v.fecha,
-                total=v.total,
-                estado=v.estado,
-                cliente_nombre=getattr(v, 'cliente_nombre', None),
-                cliente_email=getattr(v, 'cliente_email', None),
-                cliente_telefono=getattr(v, 'cliente_telefono', None),
-                tipo_pago=getattr(v, 'tipo_pago', None),
-                observaciones=getattr(v, 'observaciones', None),
-                cliente_id=v.cliente_id,
-                administradora_id=v.administradora_id
-            ) for v in ventas
-        ]
+        return RespuestaJSON(_ventas_json())
     except Exception as e:
         print(f"Error en obtener_ventas: {str(e)}")
         raise HTTPException(
@@ -85,7 +93,6 @@ async def obtener_ventas():
         )
 
 @router.get("/{venta_id}")
-@medir_tiempo_transaccion("Obtener Venta")
 async def obtener_venta(venta_id: int):
     """Obtener una venta específica con productos"""
     try:
@@ -129,7 +136,6 @@ async def obtener_venta(venta_id: int):
 
 
 @router.post("/{venta_id}/pago", response_model=PagoResponse)
-@medir_tiempo_transaccion("Procesar Pago")
 async def procesar_pago(venta_id: int, pago_data: PagoCreate):
     """Procesar pago de una venta"""
     try:
@@ -165,7 +171,6 @@ async def procesar_pago(venta_id: int, pago_data: PagoCreate):
 
 
 @router.put("/{venta_id}", response_model=VentaResponse)
-@medir_tiempo_transaccion("Actualizar Venta")
 async def actualizar_venta(venta_id: int, venta_data: VentaUpdate):
     """Actualizar información de una venta"""
     try:
@@ -217,7 +222,6 @@ async def actualizar_venta(venta_id: int, venta_data: VentaUpdate):
         )
 
 @router.delete("/{venta_id}")
-@medir_tiempo_transaccion("Eliminar Venta")
 async def eliminar_venta(venta_id: int):
     """Eliminar una venta"""
     try:
@@ -228,7 +232,10 @@ async def eliminar_venta(venta_id: int):
                 detail={"exito": False, "mensaje": "Venta no encontrada"}
             )
         
+        producto_ids = [p["producto_id"] for p in ventas_service.obtener_productos_venta(venta_id)]
         if venta.eliminar():
+            difusor_eventos.publicar("venta_eliminada", {"id": venta_id})
+            publicar_stock(producto_ids)
             return {"mensaje": "Venta eliminada exitosamente"}
         else:
             raise HTTPException(
@@ -245,7 +252,6 @@ async def eliminar_venta(venta_id: int):
         )
 
 @router.get("/{venta_id}/productos")
-@medir_tiempo_transaccion("Obtener Productos Venta")
 async def obtener_productos_venta(venta_id: int):
     """Obtener productos de una venta específica"""
     try:
@@ -4,46 +4,207 @@ Configuración de la base de datos
 
 import sqlite3
 import os
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional
+from app.utils.metrics import conexiones_db_abiertas, duracion_db
+from app.utils.estadisticas_sql import estadisticas_sql
+from app.utils.contexto_peticion import registrar_conexion, registrar_consulta
+
+# Series precalculadas para no resolver etiquetas en cada consulta
+_duracion_execute = duracion_db.etiquetar("execute_query")
+_duracion_fetch_one = duracion_db.etiquetar("fetch_one")
+_duracion_fetch_all = duracion_db.etiquetar("fetch_all")
+_duracion_transaccion = duracion_db.etiquetar("transaccion")
+_duracion_transaccion_execute = duracion_db.etiquetar("transaccion_execute")
+_duracion_transaccion_executemany = duracion_db.etiquetar("transaccion_executemany")
+
+# Registros por página al recorrer resultados grandes con iterar()
+TAMAÑO_PAGINA_ITERACION = 500
+
+class ConexionMedida(sqlite3.Connection):
+    """
+    Conexión entregada por transaccion(): execute y executemany pasan por
+    _medir igual que execute_query/fetch_one/fetch_all (duración, estadísticas
+    por sentencia, plan si es lenta y conteo de la petición). En una lectura
+    se mide hasta la primera fila; el resto lo recorre quien llama.
+    """
+    _medir = None
+
+    def execute(self, sql, parameters=()):
+        medir = self._medir
+        if medir is None:
+            return super().execute(sql, parameters)
+        inicio = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        self._registrar(medir, sql, parameters, inicio, cursor, _duracion_transaccion_execute)
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        medir = self._medir
+        if medir is None:
+            return super().executemany(sql, seq_of_parameters)
+        # El primer juego de parámetros sirve para el plan si la sentencia resulta lenta
+        if isinstance(seq_of_parameters, (list, tuple)):
+            primero = seq_of_parameters[:1]
+        else:
+            primero = []
+            seq_of_parameters = self._recordar_primero(seq_of_parameters, primero)
+        inicio = time.perf_counter()
+        cursor = super().executemany(sql, seq_of_parameters)
+        self._registrar(medir, sql, primero[0] if primero else (), inicio, cursor, _duracion_transaccion_executemany)
+        return cursor
+
+    @staticmethod
+    def _recordar_primero(parametros, primero: list):
+        for fila in parametros:
+            if not primero:
+                primero.append(fila)
+            yield fila
+
+    def _registrar(self, medir, sql, parameters, inicio, cursor, serie):
+        # Sin medición mientras tanto: el EXPLAIN de una sentencia lenta no cuenta como consulta
+        self._medir = None
+        try:
+            medir(self, sql, parameters, inicio, max(cursor.rowcount, 0), serie)
+        finally:
+            self._medir = medir
 
 class DatabaseConnection:
     def __init__(self):
-        self.db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'database', 'papeleria_dohko.db')
+        # DOHKO_DB_PATH permite apuntar a otra base (p. ej. datos sintéticos para benchmarks)
+        self.db_path = os.environ.get("DOHKO_DB_PATH") or os.path.join(
+            os.path.dirname(__file__), '..', '..', 'database', 'papeleria_dohko.db'
+        )
+    
+        # Conexión de solo lectura para PRAGMA data_version (ver version_datos)
+        self._conexion_version = None
+        self._ruta_version = None
+        self._lock_version = threading.Lock()
     
-    def get_connection(self):
+    def version_datos(self) -> int:
+        """
+        Número que cambia cada vez que otra conexión confirma cambios en la base.
+        Solo es comparable dentro de este proceso; sirve para invalidar resultados en memoria.
+        """
+        with self._lock_version:
+            if self._conexion_version is None or self._ruta_version != self.db_path:
+                if self._conexion_version is not None:
+                    self._conexion_version.close()
+                # Esta conexión nunca escribe: su data_version refleja los commits de las demás
+                self._conexion_version = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._ruta_version = self.db_path
+            return self._conexion_version.execute("PRAGMA data_version").fetchone()[0]
+    
+    def get_connection(self, factory=sqlite3.Connection):
         """Obtener conexión a la base de datos"""
-        return sqlite3.connect(self.db_path)
+        return sqlite3.connect(self.db_path, factory=factory)
+    
+    def _abrir(self, factory=sqlite3.Connection):
+        conn = self.get_connection(factory)
+        conexiones_db_abiertas.inc()
+        registrar_conexion()
+        return conn
+    
+    @staticmethod
+    def _cerrar(conn):
+        conn.close()
+        conexiones_db_abiertas.dec()
+    
+    def _medir(self, conn, query: str, params, inicio: float, filas: int, serie):
+        """Registrar duración y estadísticas de la sentencia (con su plan si fue lenta)"""
+        duracion = time.perf_counter() - inicio
+        serie.observar(duracion)
+        registrar_consulta(query, filas)
+        if estadisticas_sql.registrar(query, duracion, filas):
+            estadisticas_sql.registrar_lenta(conn, query, params, duracion)
     
     def execute_query(self, query: str, params: tuple = ()):
         """Ejecutar una consulta que no devuelve resultados"""
-        conn = self.get_connection()
+        inicio = time.perf_counter()
+        conn = self._abrir()
         cursor = conn.cursor()
         try:
             cursor.execute(query, params)
             conn.commit()
+            self._medir(conn, query, params, inicio, max(cursor.rowcount, 0), _duracion_execute)
             return cursor.lastrowid
         finally:
-            conn.close()
+            self._cerrar(conn)
     
     def fetch_one(self, query: str, params: tuple = ()):
         """Ejecutar una consulta que devuelve un resultado"""
-        conn = self.get_connection()
+        inicio = time.perf_counter()
+        conn = self._abrir()
         cursor = conn.cursor()
         try:
             cursor.execute(query, params)
-            return cursor.fetchone()
+            fila = cursor.fetchone()
+            self._medir(conn, query, params, inicio, 0 if fila is None else 1, _duracion_fetch_one)
+            return fila
         finally:
-            conn.close()
+            self._cerrar(conn)
     
     def fetch_all(self, query: str, params: tuple = ()):
         """Ejecutar una consulta que devuelve múltiples resultados"""
-        conn = self.get_connection()
+        inicio = time.perf_counter()
+        conn = self._abrir()
         cursor = conn.cursor()
         try:
             cursor.execute(query, params)
-            return cursor.fetchall()
+            filas = cursor.fetchall()
+            self._medir(conn, query, params, inicio, len(filas), _duracion_fetch_all)
+            return filas
+        finally:
+            self._cerrar(conn)
+
+    @contextmanager
+    def transaccion(self, inmediata: bool = False):
+        """
+        Conexión para varias sentencias (p. ej. executemany) confirmadas juntas.
+        Hace commit al salir del bloque y rollback si ocurre una excepción.
+        Con inmediata=True toma el bloqueo de escritura desde el inicio, para
+        que lo leído dentro de la transacción no cambie antes de escribir.
+        Cada sentencia se mide como las de execute_query/fetch_one/fetch_all.
+        """
+        inicio = time.perf_counter()
+        conn = self._abrir(ConexionMedida)
+        try:
+            if inmediata:
+                conn.execute("BEGIN IMMEDIATE")
+            conn._medir = self._medir
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
         finally:
-            conn.close()
+            _duracion_transaccion.observar(time.perf_counter() - inicio)
+            self._cerrar(conn)
+    
+    def iterar(self, query: str, params: tuple = (), tamaño_pagina: int = TAMAÑO_PAGINA_ITERACION):
+        """
+        Recorrer un resultado grande por páginas (keyset), sin cargarlo
+        completo en memoria ni mantener una lectura abierta mientras el
+        consumidor avanza: cada página es un fetch_all con su propia conexión,
+        cerrada antes de entregar las filas. Un cursor abierto durante toda una
+        descarga lenta conservaría el bloqueo SHARED e impediría escribir.
+
+        'query' termina con dos marcadores: la última clave entregada y el
+        tamaño de página (p. ej. "... WHERE id > ? ORDER BY id LIMIT ?"). La
+        clave es la primera columna, en orden ascendente; una página con menos
+        de tamaño_pagina claves distintas es la última.
+        """
+        ultima_clave = -1
+        while True:
+            filas = self.fetch_all(query, (*params, ultima_clave, tamaño_pagina))
+            if not filas:
+                return
+            yield from filas
+            if len({fila[0] for fila in filas}) < tamaño_pagina:
+                return
+            ultima_clave = filas[-1][0]
 
 # Instancia global de la base de datos
 db = DatabaseConnection()
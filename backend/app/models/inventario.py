@@ -20,29 +20,24 @@ class Inventario:
         self.cantidad = cantidad
         self.fecha_actualizacion = fecha_actualizacion or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    def actualizar_stock(self, producto: Producto, cantidad: int) -> bool:
-        """Actualizar stock de un producto"""
-        from app.database import db
+    def actualizar_stock(self, conn, producto: Producto, cantidad: int) -> None:
+        """
+        Sumar 'cantidad' al stock y registrar el movimiento usando la
+        transacción 'conn' de quien llama (se confirman o descartan juntos).
+        """
+        conn.execute("UPDATE producto SET stock_actual = stock_actual + ? WHERE id = ?", (cantidad, producto.id))
         
-        # Actualizar el stock del producto
-        nuevo_stock = producto.stock_actual + cantidad
-        query_producto = "UPDATE producto SET stock_actual = ? WHERE id = ?"
+        # Registrar el movimiento en inventario
+        query_inventario = """
+        INSERT INTO inventario (producto_id, cantidad, fecha_actualizacion)
+        VALUES (?, ?, ?)
+        """
+        conn.execute(query_inventario, (producto.id, cantidad, self.fecha_actualizacion))
         
-        try:
-            db.execute_query(query_producto, (nuevo_stock, producto.id))
-            
-            # Registrar el movimiento en inventario
-            query_inventario = """
-            INSERT INTO inventario (producto_id, cantidad, fecha_actualizacion)
-            VALUES (?, ?, ?)
-            """
-            db.execute_query(query_inventario, (producto.id, cantidad, self.fecha_actualizacion))
-            
-            # Actualizar el objeto producto
-            producto.stock_actual = nuevo_stock
-            return True
-        except Exception:
-            return False
+        # Actualizar el objeto producto
+        producto.stock_actual = conn.execute(
+            "SELECT stock_actual FROM producto WHERE id = ?", (producto.id,)
+        ).fetchone()[0]
     
     def verificar_disponibilidad(self, producto: Producto) -> bool:
         """Verificar si hay disponibilidad del producto"""
@@ -80,6 +75,11 @@ class Inventario:
             ))
         return productos
     
+    @staticmethod
+    def productos_stock_bajo_json() -> bytes:
+        """Productos con stock bajo como arreglo JSON de ProductoResponse"""
+        return Producto.listar_json(" WHERE stock_actual <= stock_minimo")
+    
     @staticmethod
     def obtener_historial_producto(producto_id: int):
         """Obtener historial de movimientos de un producto"""
@@ -5,6 +5,12 @@ Modelo de Producto
 from dataclasses import dataclass
 from typing import Optional
 
+# Columnas de ProductoResponse en su orden, para armar el JSON directo desde SQL
+COLUMNAS_RESPUESTA = ("nombre", "descripcion", "precio", "stock_actual", "stock_minimo", "proveedor_id", "id")
+SELECT_RESPUESTA = """
+SELECT nombre, COALESCE(descripcion, ''), precio, stock_actual, stock_minimo, proveedor_id, id FROM producto
+"""
+
 @dataclass
 class Producto:
     id: Optional[int]
@@ -81,6 +87,21 @@ class Producto:
             )
         return None
     
+    @staticmethod
+    def obtener_json(producto_id: int) -> Optional[bytes]:
+        """Producto como JSON de ProductoResponse, sin construir el objeto"""
+        from app.database import db
+        from app.utils.respuesta_json import codificar_json
+        resultado = db.fetch_one(SELECT_RESPUESTA + " WHERE id = ?", (producto_id,))
+        return codificar_json(dict(zip(COLUMNAS_RESPUESTA, resultado))) if resultado else None
+    
+    @staticmethod
+    def listar_json(condicion: str = "") -> bytes:
+        """Productos como arreglo JSON de ProductoResponse (condicion: cláusula WHERE opcional)"""
+        from app.database import db
+        from app.utils.respuesta_json import filas_a_json
+        return filas_a_json(COLUMNAS_RESPUESTA, db.fetch_all(SELECT_RESPUESTA + condicion))
+    
     @staticmethod
     def obtener_todos():
         """Obtener todos los productos"""
@@ -36,8 +36,8 @@ class Proveedor(Persona):
                 return False
         return False
     
-    def enviar_orden(self, productos: list) -> bool:
-        """Enviar orden de compra al proveedor"""
+    def enviar_orden(self, productos: list) -> Optional[int]:
+        """Enviar orden de compra al proveedor; devuelve el id de la orden creada"""
         from app.database import db
         from datetime import datetime
         
@@ -49,38 +49,43 @@ class Proveedor(Persona):
         fecha = datetime.now().strftime("%Y-%m-%d")
         
         try:
-            orden_id = db.execute_query(query_orden, (fecha, "pendiente", self.id, 1))  # 1 es la administradora
-            
-            # Agregar productos a la orden
-            for producto in productos:
-                producto_id = producto['producto_id']
+            # La orden y sus productos se guardan juntos o no se guardan
+            with db.transaccion() as conn:
+                orden_id = conn.execute(query_orden, (fecha, "pendiente", self.id, 1)).lastrowid  # 1 es la administradora
                 
-                # Si el producto_id es None, crear un producto temporal
-                if producto_id is None:
-                    # Crear un producto temporal con precio y stock básicos
-                    query_producto = """
-                    INSERT INTO producto (nombre, descripcion, precio, stock_actual, stock_minimo, proveedor_id)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """
-                    nombre_producto = producto.get('nombre', f'Producto_Orden_{orden_id}_{len([p for p in productos if p["producto_id"] is None]) + 1}')
-                    precio_base = producto.get('precio_unitario', 0)
-                    producto_id = db.execute_query(query_producto, (nombre_producto, 'Producto de orden de compra', precio_base, 0, 1, self.id))
+                # Agregar productos a la orden
+                lineas = []
+                for producto in productos:
+                    producto_id = producto['producto_id']
+                    
+                    # Si el producto_id es None, crear un producto temporal
+                    if producto_id is None:
+                        # Crear un producto temporal con precio y stock básicos
+                        query_producto = """
+                        INSERT INTO producto (nombre, descripcion, precio, stock_actual, stock_minimo, proveedor_id)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """
+                        nombre_producto = producto.get('nombre', f'Producto_Orden_{orden_id}_{len([p for p in productos if p["producto_id"] is None]) + 1}')
+                        precio_base = producto.get('precio_unitario', 0)
+                        producto_id = conn.execute(query_producto, (nombre_producto, 'Producto de orden de compra', precio_base, 0, 1, self.id)).lastrowid
+                        
+                        # NO necesitamos crear entrada en inventario porque el producto ya tiene stock_actual
                     
-                    # NO necesitamos crear entrada en inventario porque el producto ya tiene stock_actual
+                    lineas.append((orden_id, producto_id, producto['cantidad'], producto.get('precio_unitario')))
                 
                 query_orden_producto = """
                 INSERT INTO orden_producto (orden_id, producto_id, cantidad, precio_unitario)
                 VALUES (?, ?, ?, ?)
                 """
-                db.execute_query(query_orden_producto, (orden_id, producto_id, producto['cantidad'], producto.get('precio_unitario')))
+                conn.executemany(query_orden_producto, lineas)
             
-            return True
+            return orden_id
         except Exception as e:
             print(f"Error en enviar_orden: {e}")  # Para debugging
-            return False
+            return None
     
-    def enviar_factura(self, orden_id: int, total: float) -> bool:
-        """Enviar factura por una orden"""
+    def enviar_factura(self, orden_id: int, total: float) -> Optional[int]:
+        """Enviar factura por una orden; devuelve el id de la factura creada"""
         from app.database import db
         from datetime import datetime
         
@@ -91,10 +96,9 @@ class Proveedor(Persona):
         fecha = datetime.now().strftime("%Y-%m-%d")
         
         try:
-            db.execute_query(query, (fecha, total, "pendiente", orden_id, self.id))
-            return True
+            return db.execute_query(query, (fecha, total, "pendiente", orden_id, self.id))
         except Exception:
-            return False
+            return None
     
     @staticmethod
     def obtener_todos():
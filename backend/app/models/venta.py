@@ -6,6 +6,12 @@ from dataclasses import dataclass
 from typing import Optional, List
 from datetime import datetime
 
+# Columnas de VentaResponse en su orden, para armar el JSON directo desde SQL
+COLUMNAS_RESPUESTA = (
+    "id", "fecha", "total", "estado", "cliente_nombre", "cliente_email", "cliente_telefono",
+    "tipo_pago", "observaciones", "cliente_id", "administradora_id"
+)
+
 @dataclass
 class Venta:
     id: Optional[int]
@@ -126,6 +132,48 @@ class Venta:
         except Exception:
             return False
     
+    def registrar_con_productos(self, conn, productos: List[dict]) -> bool:
+        """
+        Insertar la venta, sus productos y el descuento de stock usando la
+        transacción 'conn' de quien llama (se confirman o descartan juntos).
+        Devuelve False sin escribir si algún producto no tiene stock suficiente.
+        """
+        ids = [item['producto_id'] for item in productos]
+        marcas = ",".join("?" * len(ids))
+        stock = dict(conn.execute(f"SELECT id, stock_actual FROM producto WHERE id IN ({marcas})", ids).fetchall())
+        if any(stock.get(item['producto_id'], 0) < item['cantidad'] for item in productos):
+            return False
+        self.id = conn.execute("""
+        INSERT INTO venta (fecha, total, estado, cliente_id, administradora_id,
+                          cliente_nombre, cliente_email, cliente_telefono, tipo_pago, observaciones)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            self.fecha, self.total, self.estado, self.cliente_id, self.administradora_id,
+            self.cliente_nombre, self.cliente_email, self.cliente_telefono,
+            self.tipo_pago, self.observaciones
+        )).lastrowid
+        conn.executemany(
+            "INSERT INTO venta_producto (venta_id, producto_id, cantidad, precio_unitario) VALUES (?, ?, ?, ?)",
+            [(self.id, item['producto_id'], item['cantidad'], item['precio_unitario']) for item in productos]
+        )
+        conn.executemany(
+            "UPDATE producto SET stock_actual = stock_actual - ? WHERE id = ?",
+            [(item['cantidad'], item['producto_id']) for item in productos]
+        )
+        return True
+    
+    @staticmethod
+    def listar_json() -> bytes:
+        """Todas las ventas como arreglo JSON de VentaResponse, sin construir objetos por fila"""
+        from app.database import db
+        from app.utils.respuesta_json import filas_a_json
+        query = """
+        SELECT id, fecha, total, estado, cliente_nombre, cliente_email, cliente_telefono,
+               tipo_pago, observaciones, cliente_id, administradora_id
+        FROM venta ORDER BY fecha DESC
+        """
+        return filas_a_json(COLUMNAS_RESPUESTA, db.fetch_all(query))
+    
     @staticmethod
     def obtener_todas():
         """Obtener todas las ventas"""
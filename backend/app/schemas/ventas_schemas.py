@@ -2,9 +2,10 @@
 Esquemas de validación para Ventas
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import date
+from datetime import date, datetime
+from uuid import UUID
 
 class ProductoVenta(BaseModel):
     producto_id: int
@@ -21,6 +22,27 @@ class VentaCreate(BaseModel):
     cliente_id: Optional[int] = None
     administradora_id: Optional[int] = 1  # Por defecto la administradora
 
+class VentaLoteCreate(VentaCreate):
+    uuid: UUID  # Generado por la caja; identifica la venta en reintentos
+    fecha: Optional[datetime] = None  # Momento real de la venta si se registró sin conexión
+
+class VentasLoteRequest(BaseModel):
+    ventas: List[VentaLoteCreate] = Field(..., max_length=1000)
+
+class ResultadoVentaLote(BaseModel):
+    uuid: str
+    estado: str  # 'registrada', 'duplicada' o 'rechazada'
+    venta_id: Optional[int] = None
+    mensaje: str
+
+class VentasLoteResponse(BaseModel):
+    exito: bool
+    mensaje: str
+    registradas: int
+    duplicadas: int
+    rechazadas: int
+    resultados: List[ResultadoVentaLote]
+
 class VentaUpdate(BaseModel):
     cliente_nombre: Optional[str] = None
     cliente_email: Optional[str] = None  
@@ -0,0 +1,226 @@
+"""
+Catálogo de Respaldos
+Sistema de Gestión Papelería Dohko
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import hashlib
+from datetime import datetime
+
+# Nombre del archivo del catálogo dentro de la carpeta de respaldos.
+# No termina en '.db' para que nunca se confunda con un respaldo.
+NOMBRE_CATALOGO = ".catalogo_respaldos.sqlite"
+
+PATRON_FECHA_RESPALDO = re.compile(r'(\d{4}-\d{2}-\d{2})_(\d{2}-\d{2}-\d{2})')
+
+# Columnas agregadas después de la primera versión del catálogo
+COLUMNAS_VERIFICACION = [
+    ("conteos", "TEXT"),
+    ("verificacion_estado", "TEXT NOT NULL DEFAULT 'pendiente'"),
+    ("verificacion_fecha", "TEXT"),
+    ("verificacion_detalle", "TEXT"),
+]
+
+COLUMNAS_LISTADO = (
+    "nombre, tamaño_bytes, checksum, tipo, fecha_creacion, fecha_registro, conteos, "
+    "verificacion_estado, verificacion_fecha, verificacion_detalle"
+)
+
+def calcular_checksum(ruta_archivo: str, tamaño_bloque: int = 1024 * 1024) -> str:
+    """Calcular el SHA-256 de un archivo leyendo por bloques"""
+    sha = hashlib.sha256()
+    with open(ruta_archivo, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(tamaño_bloque), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+def fecha_desde_nombre(nombre_archivo: str, ruta_archivo: str) -> str:
+    """Extraer la fecha del nombre del respaldo (o usar la fecha de modificación)"""
+    match = PATRON_FECHA_RESPALDO.search(nombre_archivo)
+    if match:
+        fecha_completa = f"{match.group(1)} {match.group(2).replace('-', ':')}"
+        try:
+            datetime.strptime(fecha_completa, "%Y-%m-%d %H:%M:%S")
+            return fecha_completa
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(ruta_archivo)).strftime("%Y-%m-%d %H:%M:%S")
+
+class BackupCatalog:
+    """Índice persistente de los respaldos almacenados en disco"""
+
+    def __init__(self, ruta_respaldos: str):
+        self.ruta_respaldos = ruta_respaldos
+        self.ruta_catalogo = os.path.join(ruta_respaldos, NOMBRE_CATALOGO)
+        self._lock = threading.Lock()
+        self._inicializado = False
+
+    def _conectar(self):
+        """Abrir conexión al catálogo creando la tabla si hace falta"""
+        if not os.path.exists(self.ruta_respaldos):
+            os.makedirs(self.ruta_respaldos)
+
+        conn = sqlite3.connect(self.ruta_catalogo, timeout=10)
+        if not self._inicializado:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS respaldo (
+                nombre TEXT PRIMARY KEY,
+                tamaño_bytes INTEGER NOT NULL,
+                checksum TEXT,
+                tipo TEXT NOT NULL DEFAULT 'manual',
+                fecha_creacion TEXT NOT NULL,
+                fecha_registro TEXT NOT NULL
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respaldo_fecha ON respaldo (fecha_creacion)")
+            existentes = {fila[1] for fila in conn.execute("PRAGMA table_info(respaldo)")}
+            for columna, tipo in COLUMNAS_VERIFICACION:
+                if columna not in existentes:
+                    conn.execute(f"ALTER TABLE respaldo ADD COLUMN {columna} {tipo}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respaldo_verificacion ON respaldo (verificacion_estado)")
+            conn.commit()
+            self._inicializado = True
+        return conn
+
+    def registrar(self, nombre: str, tamaño_bytes: int, checksum: str, tipo: str, fecha_creacion: str,
+                  conteos: dict = None):
+        """Registrar (o reemplazar) un respaldo en el catálogo; queda pendiente de verificación"""
+        fecha_registro = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.execute("""
+                INSERT OR REPLACE INTO respaldo (nombre, tamaño_bytes, checksum, tipo, fecha_creacion, fecha_registro,
+                                                conteos, verificacion_estado)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'pendiente')
+                """, (nombre, tamaño_bytes, checksum, tipo, fecha_creacion, fecha_registro,
+                      json.dumps(conteos) if conteos is not None else None))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def eliminar(self, nombres: list):
+        """Quitar uno o varios respaldos del catálogo"""
+        if not nombres:
+            return
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.executemany("DELETE FROM respaldo WHERE nombre = ?", [(n,) for n in nombres])
+                conn.commit()
+            finally:
+                conn.close()
+
+    def listar(self, anteriores_a: str = None):
+        """Obtener los respaldos registrados, del más reciente al más antiguo"""
+        query = f"SELECT {COLUMNAS_LISTADO} FROM respaldo"
+        params = ()
+        if anteriores_a:
+            query += " WHERE fecha_creacion < ?"
+            params = (anteriores_a,)
+        query += " ORDER BY fecha_creacion DESC"
+
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.row_factory = sqlite3.Row
+                return [dict(fila) for fila in conn.execute(query, params).fetchall()]
+            finally:
+                conn.close()
+
+    def listar_pendientes_verificacion(self):
+        """Obtener los respaldos que aún no se han verificado"""
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.row_factory = sqlite3.Row
+                filas = conn.execute(
+                    f"SELECT {COLUMNAS_LISTADO} FROM respaldo WHERE verificacion_estado = 'pendiente' ORDER BY fecha_creacion DESC"
+                ).fetchall()
+                return [dict(fila) for fila in filas]
+            finally:
+                conn.close()
+
+    def actualizar_verificacion(self, nombre: str, estado: str, detalle: dict):
+        """Guardar el resultado de la verificación de integridad de un respaldo"""
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.execute("""
+                UPDATE respaldo SET verificacion_estado = ?, verificacion_fecha = ?, verificacion_detalle = ?
+                WHERE nombre = ?
+                """, (estado, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), json.dumps(detalle, ensure_ascii=False), nombre))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def resumen_verificacion(self):
+        """Contar respaldos por estado de verificación"""
+        with self._lock:
+            conn = self._conectar()
+            try:
+                return dict(conn.execute(
+                    "SELECT verificacion_estado, COUNT(*) FROM respaldo GROUP BY verificacion_estado"
+                ).fetchall())
+            finally:
+                conn.close()
+
+    def obtener(self, nombre: str):
+        """Obtener un respaldo del catálogo por nombre"""
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.row_factory = sqlite3.Row
+                fila = conn.execute("SELECT * FROM respaldo WHERE nombre = ?", (nombre,)).fetchone()
+                return dict(fila) if fila else None
+            finally:
+                conn.close()
+
+    def esta_vacio(self) -> bool:
+        """Indicar si el catálogo todavía no tiene respaldos registrados"""
+        with self._lock:
+            conn = self._conectar()
+            try:
+                return conn.execute("SELECT 1 FROM respaldo LIMIT 1").fetchone() is None
+            finally:
+                conn.close()
+
+    def reconciliar(self, calcular_checksums: bool = True):
+        """
+        Sincronizar el catálogo con el contenido real de la carpeta.
+        Es la única operación que recorre el directorio.
+        """
+        if not os.path.exists(self.ruta_respaldos):
+            return {"agregados": 0, "eliminados": 0, "actualizados": 0}
+
+        registrados = {r["nombre"]: r for r in self.listar()}
+        en_disco = set()
+        agregados = actualizados = 0
+
+        for archivo in os.listdir(self.ruta_respaldos):
+            if not archivo.endswith('.db'):
+                continue
+            en_disco.add(archivo)
+            ruta_archivo = os.path.join(self.ruta_respaldos, archivo)
+            tamaño = os.path.getsize(ruta_archivo)
+            registro = registrados.get(archivo)
+
+            if registro and registro["tamaño_bytes"] == tamaño:
+                continue
+
+            checksum = calcular_checksum(ruta_archivo) if calcular_checksums else None
+            tipo = registro["tipo"] if registro else "desconocido"
+            self.registrar(archivo, tamaño, checksum, tipo, fecha_desde_nombre(archivo, ruta_archivo))
+            if registro:
+                actualizados += 1
+            else:
+                agregados += 1
+
+        faltantes = [nombre for nombre in registrados if nombre not in en_disco]
+        self.eliminar(faltantes)
+
+        return {"agregados": agregados, "eliminados": len(faltantes), "actualizados": actualizados}
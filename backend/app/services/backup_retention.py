@@ -0,0 +1,74 @@
+"""
+Política de Retención de Respaldos (Abuelo-Padre-Hijo)
+Sistema de Gestión Papelería Dohko
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+@dataclass
+class PoliticaRetencion:
+    """Cantidad de periodos a conservar en cada nivel"""
+    horarios: int = 24
+    diarios: int = 7
+    semanales: int = 4
+    mensuales: int = 12
+
+    def __post_init__(self):
+        negativos = [nombre for nombre, valor in vars(self).items() if valor < 0]
+        if negativos:
+            raise ValueError(f"La política de retención no admite valores negativos: {', '.join(negativos)}")
+
+def _periodo_horario(fecha: datetime):
+    return (fecha.year, fecha.month, fecha.day, fecha.hour)
+
+def _periodo_diario(fecha: datetime):
+    return (fecha.year, fecha.month, fecha.day)
+
+def _periodo_semanal(fecha: datetime):
+    anio, semana, _ = fecha.isocalendar()
+    return (anio, semana)
+
+def _periodo_mensual(fecha: datetime):
+    return (fecha.year, fecha.month)
+
+NIVELES = [
+    ("horario", "horarios", _periodo_horario),
+    ("diario", "diarios", _periodo_diario),
+    ("semanal", "semanales", _periodo_semanal),
+    ("mensual", "mensuales", _periodo_mensual),
+]
+
+def planificar_retencion(respaldos: list, politica: PoliticaRetencion):
+    """
+    Decidir qué respaldos conservar y cuáles eliminar.
+    En cada nivel se conserva el respaldo más reciente de cada uno de los
+    últimos N periodos; un respaldo se mantiene si algún nivel lo reclama.
+    Devuelve (conservar, eliminar), cada respaldo con sus motivos.
+    """
+    ordenados = sorted(respaldos, key=lambda r: r["fecha_creacion"], reverse=True)
+    fechas = [datetime.strptime(r["fecha_creacion"], "%Y-%m-%d %H:%M:%S") for r in ordenados]
+    motivos = [[] for _ in ordenados]
+
+    for etiqueta, atributo, periodo_de in NIVELES:
+        limite = getattr(politica, atributo)
+        vistos = set()
+        for indice, fecha in enumerate(fechas):
+            if len(vistos) >= limite:
+                break
+            periodo = periodo_de(fecha)
+            if periodo not in vistos:
+                vistos.add(periodo)
+                motivos[indice].append(etiqueta)
+
+    # El respaldo más reciente nunca se elimina
+    if ordenados and not motivos[0]:
+        motivos[0].append("mas_reciente")
+
+    conservar, eliminar = [], []
+    for respaldo, razones in zip(ordenados, motivos):
+        if razones:
+            conservar.append({**respaldo, "motivos": razones})
+        else:
+            eliminar.append(respaldo)
+    return conservar, eliminar
@@ -3,31 +3,36 @@ Programador de Respaldos Mensuales
 Sistema de Gestión Papelería Dohko
 """
 
-import schedule
-import time
-import threading
 from datetime import datetime
 from app.services.backup_service import backup_service
+from app.services.job_scheduler import programador_tareas
+
+# Día 1 de cada mes a las 2:00 AM
+CRON_RESPALDO_MENSUAL = "0 2 1 * *"
+# Día 1 de cada trimestre a las 3:00 AM
+CRON_LIMPIEZA_TRIMESTRAL = "0 3 1 */3 *"
+# Verificación de integridad de respaldos nuevos, cada hora
+CRON_VERIFICACION = "20 * * * *"
 
 class BackupScheduler:
     """Programador para ejecutar respaldos automáticos mensuales"""
     
     def __init__(self):
         self.ejecutando = False
-        self.hilo_programador = None
+        self.programador = programador_tareas
     
     def ejecutar_respaldo_programado(self):
         """Ejecutar respaldo programado con logging"""
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Iniciando respaldo automático mensual...")
         
         # Realizar respaldo
-        resultado = backup_service.realizar_respaldo()
+        resultado = backup_service.realizar_respaldo(tipo="programado")
         
         if resultado["exito"]:
             print(f"✅ Respaldo exitoso: {resultado['archivo']} ({resultado['tamaño']})")
             
-            # Limpiar respaldos antiguos (mantener respaldos de 6 meses)
-            limpieza = backup_service.limpiar_respaldos_antiguos(180)
+            # Aplicar la política de retención abuelo-padre-hijo
+            limpieza = backup_service.aplicar_retencion()
             if limpieza["exito"]:
                 print(f"🧹 {limpieza['mensaje']}")
         else:
@@ -39,36 +44,28 @@ class BackupScheduler:
             print("⚠️ El programador ya está ejecutándose.")
             return
         
-        # Programar respaldo cada 30 días a las 2:00 AM (simulando mensual)
-        schedule.every(30).days.at("02:00").do(self.ejecutar_respaldo_programado)
-        
-        # También programar una limpieza cada 90 días (3 meses)
-        schedule.every(90).days.at("03:00").do(
-            lambda: backup_service.limpiar_respaldos_antiguos(180)
+        self.programador.agregar_tarea("respaldo_mensual", CRON_RESPALDO_MENSUAL, self.ejecutar_respaldo_programado)
+        self.programador.agregar_tarea(
+            "limpieza_respaldos",
+            CRON_LIMPIEZA_TRIMESTRAL,
+            lambda: backup_service.aplicar_retencion()
         )
-        
-        # Para pruebas: respaldo cada 5 minutos (comentar en producción)
-        #schedule.every(1).minutes.do(self.ejecutar_respaldo_programado)
+        self.programador.agregar_tarea(
+            "verificacion_respaldos",
+            CRON_VERIFICACION,
+            backup_service.verificador.verificar_pendientes
+        )
+        self.programador.iniciar()
         
         self.ejecutando = True
         print("🕐 Programador de respaldos iniciado.")
-        print("📅 Respaldos programados: Cada 30 días a las 2:00 AM")
-        print("🧹 Limpieza automática: Cada 90 días a las 3:00 AM")
-        
-        # Ejecutar el programador en un hilo separado
-        self.hilo_programador = threading.Thread(target=self._ejecutar_bucle, daemon=True)
-        self.hilo_programador.start()
-    
-    def _ejecutar_bucle(self):
-        """Bucle principal del programador"""
-        while self.ejecutando:
-            schedule.run_pending()
-            time.sleep(60)  # Verificar cada minuto
+        print(f"📅 Respaldos programados: '{CRON_RESPALDO_MENSUAL}' (día 1 de cada mes, 2:00 AM)")
+        print(f"🧹 Limpieza automática: '{CRON_LIMPIEZA_TRIMESTRAL}' (día 1 de cada trimestre, 3:00 AM)")
     
     def detener_programador(self):
         """Detener el programador de respaldos"""
         self.ejecutando = False
-        schedule.clear()
+        self.programador.detener()
         print("🛑 Programador de respaldos detenido.")
     
     def respaldo_manual(self):
@@ -85,9 +82,14 @@ class BackupScheduler:
     
     def estado_programador(self):
         """Obtener estado del programador"""
+        estado = self.programador.estado()
         return {
             "ejecutando": self.ejecutando,
-            "proximas_ejecuciones": [str(job) for job in schedule.jobs],
+            "es_lider": estado["es_lider"],
+            "proximas_ejecuciones": [
+                f"{t['nombre']}: {t['proxima_ejecucion']}" for t in estado["tareas"]
+            ],
+            "tareas": estado["tareas"],
             "fecha_actual": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
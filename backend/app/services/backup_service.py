@@ -5,7 +5,14 @@ Sistema de Gestión Papelería Dohko
 
 import os
 import shutil
+import json
+import hashlib
+import sqlite3
 from datetime import datetime
+from app.database import db
+from app.services.backup_catalog import BackupCatalog
+from app.services.backup_retention import PoliticaRetencion, planificar_retencion
+from app.services.backup_verification import BackupVerifier, contar_filas
 
 class BackupService:
     """Servicio para gestionar respaldos automáticos de la base de datos"""
@@ -17,15 +24,39 @@ class BackupService:
         self.backend_root = os.path.dirname(self.app_dir)  # backend
         self.project_root = os.path.dirname(self.backend_root)  # pro
         
-        self.ruta_db = os.path.join(self.project_root, "database", "papeleria_dohko.db")
-        self.ruta_respaldos = os.path.join(self.project_root, "respaldos")
+        self.ruta_db = os.path.abspath(db.db_path)
+        self.ruta_respaldos = os.environ.get("DOHKO_RESPALDOS_DIR") or os.path.join(self.project_root, "respaldos")
         
         print(f"🔍 DEBUG - Rutas configuradas:")
         print(f"   - Base de datos: {self.ruta_db}")
         print(f"   - Respaldos: {self.ruta_respaldos}")
         print(f"   - DB existe: {os.path.exists(self.ruta_db)}")
+        
+        self.catalogo = BackupCatalog(self.ruta_respaldos)
+        self._catalogo_cargado = False
+        self.verificador = BackupVerifier(self.catalogo, self.ruta_respaldos)
+    
+    def _asegurar_catalogo(self):
+        """Poblar el catálogo desde disco la primera vez que se usa (migración)"""
+        if self._catalogo_cargado:
+            return
+        if self.catalogo.esta_vacio():
+            resultado = self.catalogo.reconciliar()
+            if resultado["agregados"]:
+                print(f"📇 Catálogo de respaldos inicializado con {resultado['agregados']} archivos existentes")
+        self._catalogo_cargado = True
+    
+    def _copiar_con_checksum(self, origen: str, destino: str, tamaño_bloque: int = 1024 * 1024) -> str:
+        """Copiar un archivo calculando su SHA-256 en la misma pasada"""
+        sha = hashlib.sha256()
+        with open(origen, "rb") as archivo_origen, open(destino, "wb") as archivo_destino:
+            for bloque in iter(lambda: archivo_origen.read(tamaño_bloque), b""):
+                sha.update(bloque)
+                archivo_destino.write(bloque)
+        shutil.copystat(origen, destino)
+        return sha.hexdigest()
     
-    def realizar_respaldo(self):
+    def realizar_respaldo(self, tipo: str = "manual"):
         """Crear respaldo de la base de datos con timestamp"""
         try:
             # Crear carpeta de respaldos si no existe
@@ -36,104 +67,170 @@ class BackupService:
             if not os.path.exists(self.ruta_db):
                 return {"exito": False, "mensaje": "Base de datos no encontrada"}
             
+            self._asegurar_catalogo()
+            
             # Generar nombre del archivo de respaldo
-            fecha_hora = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            ahora = datetime.now()
+            fecha_hora = ahora.strftime("%Y-%m-%d_%H-%M-%S")
             nombre_respaldo = f"respaldo_papeleria_dohko_{fecha_hora}.db"
             ruta_respaldo_completa = os.path.join(self.ruta_respaldos, nombre_respaldo)
             
-            # Realizar la copia de seguridad
-            shutil.copy2(self.ruta_db, ruta_respaldo_completa)
+            # Copia y conteos dentro de una transacción de lectura sobre la base:
+            # mientras dura ninguna escritura se confirma, así que el archivo es
+            # consistente y los conteos de la base original sirven para
+            # verificar después que la copia quedó completa
+            conn = sqlite3.connect(self.ruta_db)
+            try:
+                conn.execute("BEGIN")
+                conteos = contar_filas(conn)
+                checksum = self._copiar_con_checksum(self.ruta_db, ruta_respaldo_completa)
+            finally:
+                conn.close()
             
             # Obtener tamaño del archivo
             tamaño = os.path.getsize(ruta_respaldo_completa)
             tamaño_kb = round(tamaño / 1024, 2)
             
+            # Registrar en el catálogo con los conteos de filas para la verificación posterior
+            fecha = ahora.strftime("%Y-%m-%d %H:%M:%S")
+            self.catalogo.registrar(nombre_respaldo, tamaño, checksum, tipo, fecha, conteos)
+            
             return {
                 "exito": True, 
                 "mensaje": f"Respaldo realizado exitosamente: {nombre_respaldo}",
                 "archivo": nombre_respaldo,
                 "tamaño": f"{tamaño_kb} KB",
-                "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                "checksum": checksum,
+                "tipo": tipo,
+                "fecha": fecha
             }
             
         except Exception as e:
             return {"exito": False, "mensaje": f"Error al realizar respaldo: {str(e)}"}
     
     def listar_respaldos(self):
-        """Listar todos los respaldos disponibles"""
+        """Listar todos los respaldos disponibles (desde el catálogo, sin recorrer la carpeta)"""
         try:
-            if not os.path.exists(self.ruta_respaldos):
-                return {"exito": True, "respaldos": []}
-            
-            archivos = []
-            for archivo in os.listdir(self.ruta_respaldos):
-                if archivo.endswith('.db'):
-                    ruta_archivo = os.path.join(self.ruta_respaldos, archivo)
-                    tamaño = os.path.getsize(ruta_archivo)
-                    
-                    # Extraer fecha del nombre del archivo (formato: respaldo_papeleria_dohko_2025-07-29_02-56-58.db)
-                    try:
-                        # Buscar el patrón de fecha en el nombre: YYYY-MM-DD_HH-MM-SS
-                        import re
-                        patron = r'(\d{4}-\d{2}-\d{2})_(\d{2}-\d{2}-\d{2})'
-                        match = re.search(patron, archivo)
-                        
-                        if match:
-                            fecha_str = match.group(1)  # 2025-07-29
-                            hora_str = match.group(2).replace('-', ':')  # 02:56:58
-                            fecha_completa = f"{fecha_str} {hora_str}"
-                            
-                            # Validar que se puede parsear la fecha
-                            datetime.strptime(fecha_completa, "%Y-%m-%d %H:%M:%S")
-                            fecha_formateada = fecha_completa
-                        else:
-                            # Si no se puede extraer del nombre, usar fecha de modificación
-                            fecha_modificacion = os.path.getmtime(ruta_archivo)
-                            fecha_formateada = datetime.fromtimestamp(fecha_modificacion).strftime("%Y-%m-%d %H:%M:%S")
-                    except:
-                        # En caso de error, usar fecha de modificación como fallback
-                        fecha_modificacion = os.path.getmtime(ruta_archivo)
-                        fecha_formateada = datetime.fromtimestamp(fecha_modificacion).strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    archivos.append({
-                        "nombre": archivo,
-                        "tamaño": f"{round(tamaño / 1024, 2)} KB",
-                        "fecha": fecha_formateada
-                    })
-                
-            # Ordenar por fecha (más reciente primero)
-            archivos.sort(key=lambda x: x['fecha'], reverse=True)
+            self._asegurar_catalogo()
+            
+            archivos = [
+                {
+                    "nombre": respaldo["nombre"],
+                    "tamaño": f"{round(respaldo['tamaño_bytes'] / 1024, 2)} KB",
+                    "tamaño_bytes": respaldo["tamaño_bytes"],
+                    "fecha": respaldo["fecha_creacion"],
+                    "tipo": respaldo["tipo"],
+                    "checksum": respaldo["checksum"],
+                    "verificacion": {
+                        "estado": respaldo["verificacion_estado"],
+                        "fecha": respaldo["verificacion_fecha"],
+                        "detalle": json.loads(respaldo["verificacion_detalle"]) if respaldo["verificacion_detalle"] else None
+                    }
+                }
+                for respaldo in self.catalogo.listar()
+            ]
             
             return {"exito": True, "respaldos": archivos}
             
         except Exception as e:
             return {"exito": False, "mensaje": f"Error al listar respaldos: {str(e)}"}
     
+    def ruta_respaldo(self, nombre: str):
+        """Ruta en disco de un respaldo del catálogo (None si no existe o el nombre no es válido)"""
+        if not nombre or os.path.basename(nombre) != nombre:
+            return None
+        self._asegurar_catalogo()
+        if not self.catalogo.obtener(nombre):
+            return None
+        ruta_archivo = os.path.join(self.ruta_respaldos, nombre)
+        return ruta_archivo if os.path.isfile(ruta_archivo) else None
+    
+    def resumen_verificacion(self):
+        """Resumen de la verificación de integridad de los respaldos"""
+        conteo = self.catalogo.resumen_verificacion()
+        return {
+            "correctos": conteo.get("ok", 0),
+            "fallidos": conteo.get("fallido", 0),
+            "pendientes": conteo.get("pendiente", 0),
+            "en_ejecucion": self.verificador.en_ejecucion
+        }
+    
+    def reconciliar_catalogo(self):
+        """Sincronizar el catálogo con los archivos presentes en la carpeta de respaldos"""
+        try:
+            resultado = self.catalogo.reconciliar()
+            self._catalogo_cargado = True
+            return {
+                "exito": True,
+                "mensaje": (f"Catálogo reconciliado: {resultado['agregados']} agregados, "
+                            f"{resultado['actualizados']} actualizados, {resultado['eliminados']} eliminados"),
+                **resultado
+            }
+        except Exception as e:
+            return {"exito": False, "mensaje": f"Error al reconciliar catálogo: {str(e)}"}
+    
     def limpiar_respaldos_antiguos(self, dias_antiguedad=90):
         """Eliminar respaldos más antiguos que el número de días especificado"""
         try:
-            if not os.path.exists(self.ruta_respaldos):
-                return {"exito": True, "mensaje": "No hay respaldos para limpiar"}
+            self._asegurar_catalogo()
             
-            eliminados = 0
-            fecha_limite = datetime.now().timestamp() - (dias_antiguedad * 24 * 60 * 60)
+            fecha_limite = datetime.fromtimestamp(
+                datetime.now().timestamp() - (dias_antiguedad * 24 * 60 * 60)
+            ).strftime("%Y-%m-%d %H:%M:%S")
             
-            for archivo in os.listdir(self.ruta_respaldos):
-                if archivo.endswith('.db'):
-                    ruta_archivo = os.path.join(self.ruta_respaldos, archivo)
-                    fecha_archivo = os.path.getmtime(ruta_archivo)
-                    
-                    if fecha_archivo < fecha_limite:
-                        os.remove(ruta_archivo)
-                        eliminados += 1
+            eliminados = []
+            for respaldo in self.catalogo.listar(anteriores_a=fecha_limite):
+                ruta_archivo = os.path.join(self.ruta_respaldos, respaldo["nombre"])
+                if os.path.exists(ruta_archivo):
+                    os.remove(ruta_archivo)
+                eliminados.append(respaldo["nombre"])
+            
+            self.catalogo.eliminar(eliminados)
             
             return {
                 "exito": True, 
-                "mensaje": f"Limpieza completada. {eliminados} respaldos antiguos eliminados."
+                "mensaje": f"Limpieza completada. {len(eliminados)} respaldos antiguos eliminados.",
+                "eliminados": len(eliminados)
             }
             
         except Exception as e:
             return {"exito": False, "mensaje": f"Error al limpiar respaldos: {str(e)}"}
 
+    def aplicar_retencion(self, politica: PoliticaRetencion = None, simulacion: bool = False, tamaño_lote: int = 100):
+        """Aplicar la política de retención abuelo-padre-hijo sobre el catálogo"""
+        try:
+            self._asegurar_catalogo()
+            politica = politica or PoliticaRetencion()
+            conservar, eliminar = planificar_retencion(self.catalogo.listar(), politica)
+            bytes_liberados = sum(r["tamaño_bytes"] for r in eliminar)
+            
+            if not simulacion:
+                # Eliminar por lotes: primero los archivos, luego una sola operación en el catálogo
+                for inicio in range(0, len(eliminar), tamaño_lote):
+                    lote = [r["nombre"] for r in eliminar[inicio:inicio + tamaño_lote]]
+                    for nombre in lote:
+                        ruta_archivo = os.path.join(self.ruta_respaldos, nombre)
+                        if os.path.exists(ruta_archivo):
+                            os.remove(ruta_archivo)
+                    self.catalogo.eliminar(lote)
+            
+            titulo, accion = ("Retención simulada", "se eliminarían") if simulacion else ("Retención aplicada", "eliminados")
+            return {
+                "exito": True,
+                "simulacion": simulacion,
+                "mensaje": (f"{titulo}: {len(conservar)} conservados, "
+                            f"{len(eliminar)} {accion} ({round(bytes_liberados / 1024, 2)} KB)"),
+                "politica": vars(politica),
+                "conservar": [
+                    {"nombre": r["nombre"], "fecha": r["fecha_creacion"], "motivos": r["motivos"]}
+                    for r in conservar
+                ],
+                "eliminar": [{"nombre": r["nombre"], "fecha": r["fecha_creacion"]} for r in eliminar],
+                "bytes_liberados": bytes_liberados
+            }
+            
+        except Exception as e:
+            return {"exito": False, "mensaje": f"Error al aplicar retención: {str(e)}"}
+
 # Instancia única del servicio
 backup_service = BackupService()
@@ -0,0 +1,149 @@
+"""
+Verificación de Integridad de Respaldos
+Sistema de Gestión Papelería Dohko
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Prioridad reducida para los procesos verificadores (no competir con el punto de venta)
+NICE_VERIFICADOR = 10
+
+# Procesos nuevos en lugar de fork: el servidor tiene hilos (programador,
+# replicación, cola de tareas) y un hijo creado con fork podría heredar uno
+# de sus locks tomado y quedar bloqueado para siempre. Con spawn el hijo
+# importa el módulo principal: main.py solo arranca uvicorn bajo __main__.
+CONTEXTO_PROCESOS = multiprocessing.get_context("spawn")
+
+def contar_filas(conn) -> dict:
+    """Contar las filas de cada tabla de usuario de una base SQLite"""
+    tablas = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    return {tabla: conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0] for tabla in tablas}
+
+def _inicializar_verificador():
+    """Bajar la prioridad del proceso verificador cuando el sistema lo permite"""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(NICE_VERIFICADOR)
+        except OSError:
+            pass
+
+def verificar_archivo(ruta_archivo: str, conteos_esperados: dict = None) -> dict:
+    """
+    Ejecutar quick_check, integrity_check y comparar conteos de filas.
+    Se ejecuta dentro de un proceso del pool, por eso es una función de módulo.
+    """
+    detalle = {"errores": []}
+    try:
+        conn = sqlite3.connect(f"file:{ruta_archivo}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return {"estado": "fallido", "detalle": {"errores": [f"No se pudo abrir: {e}"]}}
+
+    try:
+        quick_check = [fila[0] for fila in conn.execute("PRAGMA quick_check")]
+        detalle["quick_check"] = quick_check[0] if quick_check == ["ok"] else quick_check[:20]
+        if quick_check != ["ok"]:
+            detalle["errores"].append("quick_check reportó problemas")
+
+        integrity_check = [fila[0] for fila in conn.execute("PRAGMA integrity_check")]
+        detalle["integrity_check"] = integrity_check[0] if integrity_check == ["ok"] else integrity_check[:20]
+        if integrity_check != ["ok"]:
+            detalle["errores"].append("integrity_check reportó problemas")
+
+        conteos = contar_filas(conn)
+        detalle["conteos"] = conteos
+        if conteos_esperados is not None:
+            diferencias = {
+                tabla: {"esperado": esperado, "encontrado": conteos.get(tabla)}
+                for tabla, esperado in conteos_esperados.items()
+                if conteos.get(tabla) != esperado
+            }
+            if diferencias:
+                detalle["diferencias_conteo"] = diferencias
+                detalle["errores"].append("Los conteos de filas no coinciden con el catálogo")
+    except sqlite3.DatabaseError as e:
+        detalle["errores"].append(f"Archivo dañado: {e}")
+    finally:
+        conn.close()
+
+    return {"estado": "fallido" if detalle["errores"] else "ok", "detalle": detalle}
+
+class BackupVerifier:
+    """Verifica en segundo plano los respaldos pendientes del catálogo"""
+
+    def __init__(self, catalogo, ruta_respaldos: str, max_procesos: int = 1, pausa_segundos: float = 1.0):
+        self.catalogo = catalogo
+        self.ruta_respaldos = ruta_respaldos
+        self.max_procesos = max_procesos
+        self.pausa_segundos = pausa_segundos
+        self._lock = threading.Lock()
+        self.en_ejecucion = False
+
+    def verificar_pendientes(self):
+        """Verificar todos los respaldos pendientes con un pool de procesos limitado"""
+        if not self._lock.acquire(blocking=False):
+            return {"exito": False, "mensaje": "Ya hay una verificación en curso"}
+
+        self.en_ejecucion = True
+        verificados = fallidos = 0
+        try:
+            pendientes = self.catalogo.listar_pendientes_verificacion()
+            if not pendientes:
+                return {"exito": True, "mensaje": "No hay respaldos pendientes de verificación",
+                        "verificados": 0, "fallidos": 0}
+
+            with ProcessPoolExecutor(
+                max_workers=self.max_procesos, mp_context=CONTEXTO_PROCESOS, initializer=_inicializar_verificador
+            ) as pool:
+                en_curso = {}
+                cola = list(pendientes)
+                while cola or en_curso:
+                    # Nunca más trabajos en vuelo que procesos: limita la E/S simultánea
+                    while cola and len(en_curso) < self.max_procesos:
+                        respaldo = cola.pop(0)
+                        ruta = os.path.join(self.ruta_respaldos, respaldo["nombre"])
+                        conteos = json.loads(respaldo["conteos"]) if respaldo.get("conteos") else None
+                        en_curso[pool.submit(verificar_archivo, ruta, conteos)] = respaldo["nombre"]
+
+                    terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                    for futuro in terminados:
+                        nombre = en_curso.pop(futuro)
+                        try:
+                            resultado = futuro.result()
+                        except Exception as e:
+                            resultado = {"estado": "fallido", "detalle": {"errores": [str(e)]}}
+                        self.catalogo.actualizar_verificacion(nombre, resultado["estado"], resultado["detalle"])
+                        if resultado["estado"] == "ok":
+                            verificados += 1
+                        else:
+                            fallidos += 1
+                            print(f"⚠️ Respaldo con problemas de integridad: {nombre}")
+
+                    if cola and self.pausa_segundos:
+                        time.sleep(self.pausa_segundos)
+
+            return {
+                "exito": True,
+                "mensaje": f"Verificación completada: {verificados} correctos, {fallidos} con problemas",
+                "verificados": verificados,
+                "fallidos": fallidos
+            }
+        except Exception as e:
+            return {"exito": False, "mensaje": f"Error al verificar respaldos: {str(e)}"}
+        finally:
+            self.en_ejecucion = False
+            self._lock.release()
+
+    def verificar_en_segundo_plano(self):
+        """Lanzar la verificación en un hilo sin bloquear al llamador"""
+        if self.en_ejecucion:
+            return False
+        threading.Thread(target=self.verificar_pendientes, name="verificacion-respaldos", daemon=True).start()
+        return True
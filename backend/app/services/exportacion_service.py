@@ -0,0 +1,184 @@
+"""
+Servicio de Exportación
+Genera exportaciones CSV/NDJSON en streaming para contabilidad
+Sistema de Gestión Papelería Dohko
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterator, Optional
+from app.database import db
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Se acumula texto hasta este tamaño antes de entregarlo al cliente
+TAMAÑO_BLOQUE = 64 * 1024
+
+# Cada exportación es una consulta ordenada por id que se lee por páginas de
+# registros de 'tabla' (ver db.iterar). Las columnas de 'lineas' son el
+# detalle (productos) que en NDJSON se agrupa dentro de su documento.
+EXPORTACIONES = {
+    "ventas": {
+        "consulta": """
+            SELECT v.id, v.fecha, v.total, v.estado, v.tipo_pago, v.cliente_id, v.cliente_nombre,
+                   v.cliente_email, v.administradora_id,
+                   vp.producto_id, p.nombre, vp.cantidad, vp.precio_unitario
+            FROM venta v
+            LEFT JOIN venta_producto vp ON vp.venta_id = v.id
+            LEFT JOIN producto p ON p.id = vp.producto_id
+        """,
+        "tabla": "venta v",
+        "clave": "v.id",
+        "columna_fecha": "v.fecha",
+        "orden": "v.id, vp.producto_id",
+        "columnas": ["id", "fecha", "total", "estado", "tipo_pago", "cliente_id", "cliente_nombre",
+                     "cliente_email", "administradora_id"],
+        "lineas": ["producto_id", "producto_nombre", "cantidad", "precio_unitario"],
+    },
+    "inventario": {
+        "consulta": """
+            SELECT i.id, i.fecha_actualizacion, i.producto_id, p.nombre, i.cantidad
+            FROM inventario i
+            LEFT JOIN producto p ON p.id = i.producto_id
+        """,
+        "tabla": "inventario i",
+        "clave": "i.id",
+        "columna_fecha": "i.fecha_actualizacion",
+        "orden": "i.id",
+        "columnas": ["id", "fecha", "producto_id", "producto_nombre", "cantidad"],
+        "lineas": [],
+    },
+    "ordenes": {
+        "consulta": """
+            SELECT o.id, o.fecha, o.estado, o.proveedor_id, pr.nombre_empresa, o.administradora_id,
+                   op.producto_id, p.nombre, op.cantidad, op.precio_unitario
+            FROM orden o
+            LEFT JOIN proveedor pr ON pr.id = o.proveedor_id
+            LEFT JOIN orden_producto op ON op.orden_id = o.id
+            LEFT JOIN producto p ON p.id = op.producto_id
+        """,
+        "tabla": "orden o",
+        "clave": "o.id",
+        "columna_fecha": "o.fecha",
+        "orden": "o.id, op.producto_id",
+        "columnas": ["id", "fecha", "estado", "proveedor_id", "proveedor_empresa", "administradora_id"],
+        "lineas": ["producto_id", "producto_nombre", "cantidad", "precio_unitario"],
+    },
+    "facturas": {
+        "consulta": """
+            SELECT f.id, f.fecha, f.total, f.estado, f.orden_id, f.proveedor_id, pr.nombre_empresa
+            FROM factura f
+            LEFT JOIN proveedor pr ON pr.id = f.proveedor_id
+        """,
+        "tabla": "factura f",
+        "clave": "f.id",
+        "columna_fecha": "f.fecha",
+        "orden": "f.id",
+        "columnas": ["id", "fecha", "total", "estado", "orden_id", "proveedor_id", "proveedor_empresa"],
+        "lineas": [],
+    },
+}
+
+class ExportacionService:
+
+    def validar(self, nombre: str, formato: str, desde: Optional[date], hasta: Optional[date]):
+        """Comprobar los parámetros antes de empezar a enviar la respuesta"""
+        if nombre not in EXPORTACIONES:
+            raise ValueError(f"Exportación desconocida: {nombre}")
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato}. Use {', '.join(FORMATOS)}")
+        if desde and hasta and desde > hasta:
+            raise ValueError("La fecha 'desde' no puede ser posterior a 'hasta'")
+
+    def nombre_archivo(self, nombre: str, formato: str, desde: Optional[date], hasta: Optional[date]) -> str:
+        rango = f"_{desde or 'inicio'}_{hasta or 'hoy'}" if desde or hasta else ""
+        return f"{nombre}{rango}.{formato}"
+
+    def _filas(self, definicion: dict, desde: Optional[date], hasta: Optional[date]) -> Iterator[tuple]:
+        condiciones = []
+        params = []
+        if desde:
+            condiciones.append(f"{definicion['columna_fecha']} >= ?")
+            params.append(desde.isoformat())
+        if hasta:
+            # Las fechas guardadas pueden incluir hora: incluir todo el día final
+            condiciones.append(f"{definicion['columna_fecha']} < date(?, '+1 day')")
+            params.append(hasta.isoformat())
+        clave = definicion["clave"]
+        condiciones.append(f"{clave} > ?")
+        # La página se arma por registros y no por filas del JOIN, para no
+        # partir un documento con su detalle entre dos páginas
+        query = (
+            f"{definicion['consulta']} WHERE {clave} IN ("
+            f"SELECT {clave} FROM {definicion['tabla']} WHERE {' AND '.join(condiciones)} "
+            f"ORDER BY {clave} LIMIT ?) ORDER BY {definicion['orden']}"
+        )
+        return db.iterar(query, tuple(params))
+
+    def exportar(self, nombre: str, formato: str, desde: Optional[date] = None,
+                 hasta: Optional[date] = None) -> Iterator[str]:
+        """Generador de bloques de texto con la exportación completa"""
+        self.validar(nombre, formato, desde, hasta)
+        definicion = EXPORTACIONES[nombre]
+        filas = self._filas(definicion, desde, hasta)
+        if formato == "csv":
+            return self._csv(definicion, filas)
+        return self._ndjson(definicion, filas)
+
+    def _csv(self, definicion: dict, filas: Iterator[tuple]) -> Iterator[str]:
+        """Una fila por línea de detalle (o por registro si no tiene detalle)"""
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(definicion["columnas"] + definicion["lineas"])
+        for fila in filas:
+            escritor.writerow(fila)
+            if buffer.tell() >= TAMAÑO_BLOQUE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def _ndjson(self, definicion: dict, filas: Iterator[tuple]) -> Iterator[str]:
+        """Un documento JSON por registro, con su detalle agrupado en 'productos'"""
+        columnas = definicion["columnas"]
+        lineas = definicion["lineas"]
+        n = len(columnas)
+        partes = []
+        tamaño = 0
+        actual = None
+
+        def serializar(documento):
+            return json.dumps(documento, ensure_ascii=False, default=str) + "\n"
+
+        for fila in filas:
+            if not lineas:
+                texto = serializar(dict(zip(columnas, fila)))
+            else:
+                # Las filas llegan ordenadas por id: el documento termina cuando cambia
+                texto = ""
+                if actual is None or actual["id"] != fila[0]:
+                    if actual is not None:
+                        texto = serializar(actual)
+                    actual = dict(zip(columnas, fila[:n]))
+                    actual["productos"] = []
+                if fila[n] is not None:
+                    actual["productos"].append(dict(zip(lineas, fila[n:])))
+                if not texto:
+                    continue
+            partes.append(texto)
+            tamaño += len(texto)
+            if tamaño >= TAMAÑO_BLOQUE:
+                yield "".join(partes)
+                partes = []
+                tamaño = 0
+        if actual is not None:
+            partes.append(serializar(actual))
+        yield "".join(partes)
+
+# Instancia global del servicio
+exportacion_service = ExportacionService()
@@ -0,0 +1,320 @@
+"""
+Servicio de Importación de Productos
+Carga masiva del catálogo (listas de precios de proveedores) desde CSV o JSON
+Sistema de Gestión Papelería Dohko
+"""
+
+import csv
+import io
+import json
+import time
+from typing import BinaryIO, Iterator, Optional
+from app.database import db
+from app.utils.eventos import difusor_eventos
+
+FORMATOS_IMPORTACION = ("csv", "json")
+
+# Filas validadas y escritas (executemany) por lote
+TAMAÑO_LOTE = 1000
+# El reporte incluye como máximo este número de filas con error
+MAX_ERRORES_REPORTE = 1000
+TAMAÑO_LECTURA = 64 * 1024
+
+COLUMNAS_INSERT = "nombre, descripcion, precio, stock_actual, stock_minimo, proveedor_id, sku"
+
+class ErrorImportacion(ValueError):
+    """El archivo no se puede leer (formato o codificación inválidos)"""
+
+def _texto(archivo: BinaryIO) -> io.TextIOWrapper:
+    # utf-8-sig descarta el BOM que agrega Excel al guardar CSV
+    return io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+
+def leer_csv(archivo: BinaryIO) -> Iterator[dict]:
+    """Filas de un CSV con encabezado; acepta ',' o ';' como separador"""
+    texto = _texto(archivo)
+    encabezado = texto.readline()
+    if not encabezado.strip():
+        return
+    separador = ";" if encabezado.count(";") > encabezado.count(",") else ","
+    columnas = [c.strip().lower() for c in next(csv.reader([encabezado], delimiter=separador))]
+    for valores in csv.reader(texto, delimiter=separador):
+        if not any(v.strip() for v in valores):
+            continue
+        yield dict(zip(columnas, valores))
+
+def leer_json(archivo: BinaryIO) -> Iterator[dict]:
+    """
+    Objetos de un arreglo JSON o de un archivo NDJSON (uno por línea),
+    decodificados de a uno sin cargar el archivo completo.
+    """
+    texto = _texto(archivo)
+    decodificador = json.JSONDecoder()
+    buffer = ""
+    posicion = 0
+    fin_archivo = False
+    while True:
+        # Saltar separadores entre objetos
+        while posicion < len(buffer) and buffer[posicion] in " \t\r\n,[]":
+            posicion += 1
+        if posicion >= len(buffer):
+            if fin_archivo:
+                return
+            buffer = texto.read(TAMAÑO_LECTURA)
+            posicion = 0
+            fin_archivo = not buffer
+            continue
+        try:
+            objeto, fin = decodificador.raw_decode(buffer, posicion)
+        except json.JSONDecodeError as e:
+            if fin_archivo:
+                raise ErrorImportacion(f"JSON inválido: {e.msg}")
+            # El objeto está cortado al final del bloque: leer más
+            leido = texto.read(TAMAÑO_LECTURA)
+            buffer = buffer[posicion:] + leido
+            posicion = 0
+            fin_archivo = not leido
+            continue
+        posicion = fin
+        if not isinstance(objeto, dict):
+            raise ErrorImportacion("Cada elemento del JSON debe ser un objeto")
+        yield objeto
+
+class ImportacionProductosService:
+
+    def __init__(self):
+        self._esquema_listo = False
+
+    def asegurar_esquema(self):
+        """Agregar la columna sku (única cuando existe) a bases creadas antes de la importación"""
+        if self._esquema_listo:
+            return
+        with db.transaccion() as conn:
+            columnas = [fila[1] for fila in conn.execute("PRAGMA table_info(producto)")]
+            if "sku" not in columnas:
+                conn.execute("ALTER TABLE producto ADD COLUMN sku TEXT")
+                print("📦 Columna sku agregada a producto")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_producto_sku ON producto (sku) WHERE sku IS NOT NULL")
+        self._esquema_listo = True
+
+    @staticmethod
+    def _entero(valor, campo: str, errores: list) -> Optional[int]:
+        if valor is None or str(valor).strip() == "":
+            return None
+        try:
+            numero = float(str(valor).strip())
+            if numero != int(numero):
+                raise ValueError
+            numero = int(numero)
+        except (TypeError, ValueError):
+            errores.append(f"{campo}: debe ser un número entero")
+            return None
+        if numero < 0:
+            errores.append(f"{campo}: no puede ser negativo")
+        return numero
+
+    def _validar(self, fila: dict, proveedores: set):
+        """Normalizar una fila; devuelve (datos, errores)"""
+        errores = []
+        nombre = str(fila.get("nombre") or "").strip()
+        if not nombre:
+            errores.append("nombre: es obligatorio")
+        sku = str(fila.get("sku") or "").strip() or None
+        descripcion = fila.get("descripcion")
+        descripcion = (str(descripcion).strip() or None) if descripcion is not None else None
+
+        precio = None
+        texto_precio = str(fila.get("precio") if fila.get("precio") is not None else "").strip()
+        if not texto_precio:
+            errores.append("precio: es obligatorio")
+        else:
+            try:
+                # Admite coma decimal (1,50) de hojas de cálculo en español
+                precio = float(texto_precio.replace(",", ".") if "." not in texto_precio else texto_precio)
+                if precio < 0:
+                    errores.append("precio: no puede ser negativo")
+            except ValueError:
+                errores.append("precio: debe ser un número")
+
+        stock_actual = self._entero(fila.get("stock_actual"), "stock_actual", errores)
+        stock_minimo = self._entero(fila.get("stock_minimo"), "stock_minimo", errores)
+        proveedor_id = self._entero(fila.get("proveedor_id"), "proveedor_id", errores)
+        if proveedor_id is not None and proveedor_id not in proveedores:
+            errores.append(f"proveedor_id: el proveedor {proveedor_id} no existe")
+
+        datos = {
+            "nombre": nombre, "sku": sku, "descripcion": descripcion, "precio": precio,
+            "stock_actual": stock_actual, "stock_minimo": stock_minimo, "proveedor_id": proveedor_id,
+        }
+        return datos, errores
+
+    @staticmethod
+    def _combinar(anterior: dict, datos: dict) -> dict:
+        """Fila que repite un producto del mismo archivo: sus valores no vacíos prevalecen, como al actualizar"""
+        return {campo: valor if valor is not None else anterior[campo] for campo, valor in datos.items()}
+
+    def importar(self, filas: Iterator[dict], solo_validar: bool = False) -> dict:
+        """
+        Insertar o actualizar productos en una sola transacción. Cada fila se
+        busca por sku (si lo trae) y si no por nombre. En productos existentes,
+        las columnas vacías o ausentes conservan su valor actual. Una fila que
+        repite un producto ya visto en el archivo se combina con las anteriores
+        con la misma regla (y se cuenta en 'combinadas'), sin importar en qué
+        lote caiga.
+        """
+        self.asegurar_esquema()
+        inicio = time.perf_counter()
+        resumen = {"procesadas": 0, "insertadas": 0, "actualizadas": 0, "combinadas": 0, "con_errores": 0}
+        errores = []
+
+        # Bloqueo de escritura desde el inicio: el catálogo leído no puede cambiar
+        # antes de insertar (otro alta con el mismo nombre o SKU quedaría duplicada
+        # o haría fallar todo el archivo por UNIQUE(sku))
+        with db.transaccion(inmediata=True) as conn:
+            por_sku = {}
+            por_nombre = {}
+            sku_de_producto = {}
+            # Productos ya tocados por esta importación
+            vistos = set()
+            # Productos nuevos del lote, con id provisional negativo hasta insertarlos
+            pendientes = {}
+            claves_provisionales = []
+
+            def indexar(consulta: str, params: tuple = ()) -> list:
+                ids = []
+                for producto_id, nombre, sku in conn.execute(consulta, params):
+                    por_nombre.setdefault(nombre.strip().lower(), producto_id)
+                    sku_de_producto[producto_id] = sku
+                    if sku:
+                        por_sku[sku] = producto_id
+                    ids.append(producto_id)
+                return ids
+
+            indexar("SELECT id, nombre, sku FROM producto ORDER BY id")
+            proveedores = {fila[0] for fila in conn.execute("SELECT id FROM proveedor")}
+
+            def buscar(datos: dict) -> Optional[int]:
+                producto_id = por_sku.get(datos["sku"]) if datos["sku"] else None
+                if producto_id is None:
+                    candidato = por_nombre.get(datos["nombre"].lower())
+                    # Por nombre solo si no contradice un sku ya asignado
+                    if candidato and (not datos["sku"] or not sku_de_producto.get(candidato)):
+                        producto_id = candidato
+                return producto_id
+
+            def escribir(lote: list):
+                actualizaciones = {}
+                for datos in lote:
+                    producto_id = buscar(datos)
+                    if producto_id is None:
+                        producto_id = -(len(pendientes) + 1)
+                        resumen["insertadas"] += 1
+                    elif producto_id in vistos:
+                        resumen["combinadas"] += 1
+                    else:
+                        resumen["actualizadas"] += 1
+                    vistos.add(producto_id)
+
+                    if datos["sku"]:
+                        por_sku[datos["sku"]] = producto_id
+                        sku_de_producto[producto_id] = datos["sku"]
+                        claves_provisionales.append((por_sku, datos["sku"]))
+                    clave_nombre = datos["nombre"].lower()
+                    if clave_nombre not in por_nombre:
+                        por_nombre[clave_nombre] = producto_id
+                        claves_provisionales.append((por_nombre, clave_nombre))
+
+                    destino = pendientes if producto_id < 0 else actualizaciones
+                    anterior = destino.get(producto_id)
+                    destino[producto_id] = self._combinar(anterior, datos) if anterior else datos
+
+                if actualizaciones:
+                    conn.executemany("""
+                        UPDATE producto
+                        SET nombre = ?, descripcion = COALESCE(?, descripcion), precio = ?,
+                            stock_actual = COALESCE(?, stock_actual), stock_minimo = COALESCE(?, stock_minimo),
+                            proveedor_id = COALESCE(?, proveedor_id), sku = COALESCE(?, sku)
+                        WHERE id = ?
+                    """, [
+                        (d["nombre"], d["descripcion"], d["precio"], d["stock_actual"], d["stock_minimo"],
+                         d["proveedor_id"], d["sku"], producto_id)
+                        for producto_id, d in actualizaciones.items()
+                    ])
+                if pendientes:
+                    (ultimo_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM producto").fetchone()
+                    conn.executemany(f"INSERT INTO producto ({COLUMNAS_INSERT}) VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                        (d["nombre"], d["descripcion"] or "", d["precio"], d["stock_actual"] or 0,
+                         d["stock_minimo"] or 0, d["proveedor_id"], d["sku"])
+                        for d in pendientes.values()
+                    ])
+                    # Los lotes siguientes deben ver los productos recién creados con su id real
+                    for indice, clave in claves_provisionales:
+                        if indice.get(clave, 0) < 0:
+                            del indice[clave]
+                    for producto_id in pendientes:
+                        sku_de_producto.pop(producto_id, None)
+                        vistos.discard(producto_id)
+                    vistos.update(indexar("SELECT id, nombre, sku FROM producto WHERE id > ? ORDER BY id", (ultimo_id,)))
+                    pendientes.clear()
+                claves_provisionales.clear()
+
+            lote = []
+            for numero, fila in enumerate(filas, start=1):
+                resumen["procesadas"] += 1
+                datos, errores_fila = self._validar(fila, proveedores)
+                if errores_fila:
+                    resumen["con_errores"] += 1
+                    if len(errores) < MAX_ERRORES_REPORTE:
+                        errores.append({"fila": numero, "clave": datos["sku"] or datos["nombre"], "errores": errores_fila})
+                    continue
+                lote.append(datos)
+                if len(lote) >= TAMAÑO_LOTE:
+                    escribir(lote)
+                    lote = []
+            if lote:
+                escribir(lote)
+
+            if solo_validar:
+                conn.rollback()
+
+        segundos = time.perf_counter() - inicio
+        validas = resumen["procesadas"] - resumen["con_errores"]
+        accion = "validadas (sin guardar)" if solo_validar else "importadas"
+        print(f"📥 Importación de productos: {validas}/{resumen['procesadas']} filas {accion} en {segundos:.2f}s")
+        if not solo_validar and validas:
+            # Demasiados cambios para un evento por producto: los clientes recargan la lista
+            difusor_eventos.publicar("productos_importados", {
+                "insertadas": resumen["insertadas"], "actualizadas": resumen["actualizadas"]
+            })
+        return {
+            "exito": True,
+            "mensaje": f"{validas} de {resumen['procesadas']} filas {accion}",
+            "solo_validar": solo_validar,
+            **resumen,
+            "segundos": round(segundos, 3),
+            "errores": errores,
+            "errores_omitidos": resumen["con_errores"] - len(errores),
+        }
+
+    def importar_archivo(self, archivo: BinaryIO, formato: str, solo_validar: bool = False) -> dict:
+        """Importar desde un archivo binario abierto (subida HTTP o CLI)"""
+        if formato not in FORMATOS_IMPORTACION:
+            raise ErrorImportacion(f"Formato no soportado: {formato}. Use {', '.join(FORMATOS_IMPORTACION)}")
+        lector = leer_csv if formato == "csv" else leer_json
+        try:
+            return self.importar(lector(archivo), solo_validar)
+        except UnicodeDecodeError:
+            raise ErrorImportacion("El archivo debe estar codificado en UTF-8")
+        except csv.Error as e:
+            raise ErrorImportacion(f"CSV inválido: {e}")
+
+def formato_por_nombre(nombre_archivo: Optional[str]) -> Optional[str]:
+    """Deducir el formato a partir de la extensión (.csv, .json, .ndjson, .jsonl)"""
+    extension = (nombre_archivo or "").rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("json", "ndjson", "jsonl"):
+        return "json"
+    return None
+
+# Instancia global del servicio
+importacion_service = ImportacionProductosService()
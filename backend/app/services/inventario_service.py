@@ -3,8 +3,12 @@ Servicio de Inventario
 Contiene la lógica de negocio para gestión de inventario
 """
 
+from datetime import datetime
 from app.models.producto import Producto
 from app.models.inventario import Inventario
+from app.database import db
+from app.services.tareas_service import cola_tareas
+from app.utils.eventos import difusor_eventos, publicar_stock
 
 class InventarioService:
     
@@ -16,17 +20,24 @@ class InventarioService:
         
         inventario = Inventario(producto_id=producto_id, cantidad=cantidad)
         
-        if inventario.actualizar_stock(producto, cantidad):
-            # Verificar si necesita generar alerta
-            inventario.generar_alerta(producto)
-            
-            return {
-                "exito": True,
-                "mensaje": "Stock actualizado exitosamente",
-                "nuevo_stock": producto.stock_actual
-            }
-        else:
+        try:
+            # Stock, movimiento y tareas en una sola transacción: la alerta no
+            # se pierde aunque el proceso termine justo después del cambio
+            cola_tareas.asegurar_esquema()
+            with db.transaccion(inmediata=True) as conn:
+                inventario.actualizar_stock(conn, producto, cantidad)
+                # La alerta de stock bajo se genera en segundo plano
+                cola_tareas.encolar([("alertas_stock", {"producto_ids": [producto_id]}), ("invalidar_cache", None)], conn=conn)
+        except Exception as e:
+            print(f"Error al actualizar stock: {e}")
             return {"exito": False, "mensaje": "Error al actualizar el stock"}
+        
+        publicar_stock([producto_id])
+        return {
+            "exito": True,
+            "mensaje": "Stock actualizado exitosamente",
+            "nuevo_stock": producto.stock_actual
+        }
     
     def verificar_disponibilidad(self, producto_id: int):
         """Verificar disponibilidad de un producto"""
@@ -54,5 +65,28 @@ class InventarioService:
         if producto and producto.generar_alerta_stock_bajo():
             inventario = Inventario(producto_id=producto_id, cantidad=0)
             inventario.generar_alerta(producto)
+            _publicar_alerta(producto)
             return {"mensaje": f"Alerta generada para {producto.nombre}"}
         return {"mensaje": "No se requiere alerta para este producto"}
+
+def _publicar_alerta(producto: Producto):
+    difusor_eventos.publicar("alerta_creada", {
+        "tipo": "stock_bajo", "producto_id": producto.id, "nombre": producto.nombre,
+        "stock_actual": producto.stock_actual, "stock_minimo": producto.stock_minimo
+    })
+
+def _tarea_alertas_stock(datos: dict):
+    """Generar alertas de stock bajo, como máximo una por producto y día"""
+    hoy = datetime.now().strftime("%Y-%m-%d")
+    for producto_id in datos.get("producto_ids", []):
+        producto = Producto.obtener_por_id(producto_id)
+        if not producto or not producto.generar_alerta_stock_bajo():
+            continue
+        if db.fetch_one(
+            "SELECT 1 FROM alerta WHERE producto_id = ? AND tipo = 'stock_bajo' AND fecha = ?", (producto_id, hoy)
+        ):
+            continue
+        Inventario(producto_id=producto_id, cantidad=0).generar_alerta(producto)
+        _publicar_alerta(producto)
+
+cola_tareas.registrar_manejador("alertas_stock", _tarea_alertas_stock)
@@ -0,0 +1,342 @@
+"""
+Programador de Tareas con Expresiones Cron
+Sistema de Gestión Papelería Dohko
+"""
+
+import os
+import json
+import threading
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ALIAS_CRON = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+}
+
+# Tiempo máximo que el hilo duerme sin revisar el reloj (tolera cambios de hora del sistema)
+ESPERA_MAXIMA_SEGUNDOS = 3600
+# Cada cuánto un proceso seguidor intenta convertirse en líder
+INTERVALO_ELECCION_SEGUNDOS = 30
+
+class ExpresionCron:
+    """Expresión cron de 5 campos: minuto hora día-del-mes mes día-de-la-semana"""
+
+    RANGOS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expresion: str):
+        self.expresion = expresion
+        campos = ALIAS_CRON.get(expresion.strip(), expresion).split()
+        if len(campos) != 5:
+            raise ValueError(f"Expresión cron inválida (se esperan 5 campos): {expresion}")
+
+        conjuntos = [self._parsear_campo(c, minimo, maximo) for c, (minimo, maximo) in zip(campos, self.RANGOS)]
+        self.minutos, self.horas, self.dias_mes, self.meses, dias_semana = conjuntos
+        # 0 y 7 representan el domingo
+        self.dias_semana = {d % 7 for d in dias_semana}
+        self.dia_mes_libre = campos[2] == "*"
+        self.dia_semana_libre = campos[4] == "*"
+
+    @staticmethod
+    def _parsear_campo(campo: str, minimo: int, maximo: int) -> set:
+        valores = set()
+        for parte in campo.split(","):
+            paso = 1
+            if "/" in parte:
+                parte, paso_str = parte.split("/", 1)
+                paso = int(paso_str)
+                if paso <= 0:
+                    raise ValueError(f"Paso inválido en campo cron: {campo}")
+            if parte == "*":
+                inicio, fin = minimo, maximo
+            elif "-" in parte:
+                inicio_str, fin_str = parte.split("-", 1)
+                inicio, fin = int(inicio_str), int(fin_str)
+            else:
+                inicio = int(parte)
+                fin = maximo if paso > 1 else inicio
+            if inicio < minimo or fin > maximo or inicio > fin:
+                raise ValueError(f"Valor fuera de rango en campo cron: {campo}")
+            valores.update(range(inicio, fin + 1, paso))
+        return valores
+
+    def _coincide_dia(self, fecha: datetime) -> bool:
+        en_mes = fecha.day in self.dias_mes
+        en_semana = (fecha.weekday() + 1) % 7 in self.dias_semana
+        # Semántica cron: si ambos campos están restringidos basta con que coincida uno
+        if not self.dia_mes_libre and not self.dia_semana_libre:
+            return en_mes or en_semana
+        return en_mes and en_semana
+
+    def siguiente(self, desde: datetime) -> datetime:
+        """Calcular la próxima fecha (estrictamente posterior a 'desde') que cumple la expresión"""
+        fecha = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = desde + timedelta(days=366 * 5)
+
+        while fecha <= limite:
+            if fecha.month not in self.meses:
+                anio, mes = (fecha.year + 1, 1) if fecha.month == 12 else (fecha.year, fecha.month + 1)
+                fecha = datetime(anio, mes, 1)
+                continue
+            if not self._coincide_dia(fecha):
+                fecha = datetime(fecha.year, fecha.month, fecha.day) + timedelta(days=1)
+                continue
+            if fecha.hour not in self.horas:
+                fecha = fecha.replace(minute=0) + timedelta(hours=1)
+                continue
+            if fecha.minute not in self.minutos:
+                fecha += timedelta(minutes=1)
+                continue
+            return fecha
+
+        raise ValueError(f"La expresión cron no produce fechas: {self.expresion}")
+
+class BloqueoArchivo:
+    """Bloqueo exclusivo entre procesos basado en un archivo"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._archivo = None
+
+    def adquirir(self) -> bool:
+        """Intentar tomar el bloqueo sin esperar"""
+        if self._archivo:
+            return True
+        archivo = open(self.ruta, "a+")
+        try:
+            if fcntl:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            archivo.close()
+            return False
+        archivo.seek(0)
+        archivo.truncate()
+        archivo.write(str(os.getpid()))
+        archivo.flush()
+        self._archivo = archivo
+        return True
+
+    def liberar(self):
+        """Soltar el bloqueo si se tiene"""
+        if not self._archivo:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._archivo.fileno(), fcntl.LOCK_UN)
+            else:
+                self._archivo.seek(0)
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._archivo.close()
+            self._archivo = None
+
+    @property
+    def adquirido(self) -> bool:
+        return self._archivo is not None
+
+@dataclass
+class Tarea:
+    nombre: str
+    expresion: ExpresionCron
+    funcion: Callable
+    recuperar_perdidas: bool = True
+    ultima_ejecucion: Optional[datetime] = None
+    # Momento desde el que se cuenta si la tarea nunca se ha ejecutado
+    referencia: Optional[datetime] = None
+    proxima_ejecucion: Optional[datetime] = None
+    ultimo_error: Optional[str] = None
+    ejecuciones: int = field(default=0)
+
+class ProgramadorTareas:
+    """
+    Programador que duerme hasta la próxima tarea pendiente.
+    Solo el proceso que obtiene el bloqueo de archivo (líder) ejecuta tareas,
+    así varios workers de uvicorn no duplican el trabajo.
+    """
+
+    def __init__(self, ruta_estado: str, ruta_bloqueo: str):
+        self.ruta_estado = ruta_estado
+        self.bloqueo = BloqueoArchivo(ruta_bloqueo)
+        self.tareas = {}
+        self.ejecutando = False
+        self.hilo = None
+        self._evento = threading.Event()
+        self._lock = threading.RLock()
+        self._estado_guardado = {}
+
+    def agregar_tarea(self, nombre: str, expresion: str, funcion: Callable, recuperar_perdidas: bool = True):
+        """Registrar (o reemplazar) una tarea programada"""
+        with self._lock:
+            tarea = Tarea(nombre, ExpresionCron(expresion), funcion, recuperar_perdidas, referencia=datetime.now())
+            anterior = self.tareas.get(nombre)
+            if anterior:
+                tarea.ultima_ejecucion = anterior.ultima_ejecucion
+                tarea.referencia = anterior.referencia
+            elif nombre in self._estado_guardado:
+                self._aplicar_estado(tarea, self._estado_guardado[nombre])
+            self.tareas[nombre] = tarea
+            self._calcular_proxima(tarea, datetime.now())
+        self._evento.set()
+
+    def quitar_tarea(self, nombre: str):
+        """Eliminar una tarea registrada"""
+        with self._lock:
+            self.tareas.pop(nombre, None)
+        self._evento.set()
+
+    def iniciar(self):
+        """Arrancar el hilo del programador (idempotente)"""
+        if self.ejecutando:
+            return
+        self.ejecutando = True
+        self._evento.clear()
+        self.hilo = threading.Thread(target=self._ejecutar_bucle, name="programador-tareas", daemon=True)
+        self.hilo.start()
+
+    def detener(self):
+        """Detener el programador y liberar el liderazgo"""
+        self.ejecutando = False
+        self._evento.set()
+        if self.hilo and self.hilo is not threading.current_thread():
+            self.hilo.join(timeout=5)
+        self.bloqueo.liberar()
+
+    def _calcular_proxima(self, tarea: Tarea, ahora: datetime):
+        base = tarea.ultima_ejecucion or tarea.referencia or ahora
+        tarea.proxima_ejecucion = tarea.expresion.siguiente(base)
+        # Si la próxima ya pasó y no se recuperan ejecuciones perdidas, saltar a la siguiente futura
+        if tarea.proxima_ejecucion <= ahora and not tarea.recuperar_perdidas:
+            tarea.proxima_ejecucion = tarea.expresion.siguiente(ahora)
+
+    @staticmethod
+    def _aplicar_estado(tarea: Tarea, datos: dict):
+        if datos.get("ultima_ejecucion"):
+            tarea.ultima_ejecucion = datetime.fromisoformat(datos["ultima_ejecucion"])
+        if datos.get("referencia"):
+            tarea.referencia = datetime.fromisoformat(datos["referencia"])
+
+    def _cargar_estado(self):
+        if not os.path.exists(self.ruta_estado):
+            return
+        try:
+            with open(self.ruta_estado, "r", encoding="utf-8") as archivo:
+                estado = json.load(archivo)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo leer el estado del programador: {e}")
+            return
+
+        ahora = datetime.now()
+        with self._lock:
+            # Se conserva para las tareas que se registren más tarde
+            self._estado_guardado = estado
+            for nombre, datos in estado.items():
+                tarea = self.tareas.get(nombre)
+                if tarea:
+                    self._aplicar_estado(tarea, datos)
+                    self._calcular_proxima(tarea, ahora)
+
+    def _guardar_estado(self):
+        with self._lock:
+            estado = dict(self._estado_guardado)
+            estado.update({
+                nombre: {
+                    "ultima_ejecucion": t.ultima_ejecucion.isoformat() if t.ultima_ejecucion else None,
+                    "referencia": t.referencia.isoformat() if t.referencia else None
+                }
+                for nombre, t in self.tareas.items()
+            })
+            self._estado_guardado = estado
+        temporal = f"{self.ruta_estado}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(estado, archivo, indent=2)
+        os.replace(temporal, self.ruta_estado)
+
+    def _ejecutar_tarea(self, tarea: Tarea):
+        inicio = datetime.now()
+        print(f"⏰ [{inicio.strftime('%Y-%m-%d %H:%M:%S')}] Ejecutando tarea programada: {tarea.nombre}")
+        try:
+            tarea.funcion()
+            tarea.ultimo_error = None
+        except Exception as e:
+            tarea.ultimo_error = str(e)
+            print(f"❌ Error en tarea {tarea.nombre}: {e}")
+            traceback.print_exc()
+        tarea.ejecuciones += 1
+        tarea.ultima_ejecucion = inicio
+        self._calcular_proxima(tarea, datetime.now())
+        self._guardar_estado()
+
+    def _ejecutar_bucle(self):
+        """Esperar el liderazgo y luego dormir hasta la próxima tarea"""
+        while self.ejecutando and not self.bloqueo.adquirir():
+            self._evento.wait(INTERVALO_ELECCION_SEGUNDOS)
+            self._evento.clear()
+        if not self.ejecutando:
+            return
+
+        print(f"👑 Proceso {os.getpid()} elegido líder del programador de tareas")
+        self._cargar_estado()
+        self._guardar_estado()
+
+        while self.ejecutando:
+            ahora = datetime.now()
+            with self._lock:
+                pendientes = [t for t in self.tareas.values() if t.proxima_ejecucion and t.proxima_ejecucion <= ahora]
+                proximas = [t.proxima_ejecucion for t in self.tareas.values() if t.proxima_ejecucion]
+
+            for tarea in pendientes:
+                if not self.ejecutando:
+                    return
+                self._ejecutar_tarea(tarea)
+
+            if pendientes:
+                continue
+
+            espera = ESPERA_MAXIMA_SEGUNDOS
+            if proximas:
+                espera = min(espera, max(0.0, (min(proximas) - datetime.now()).total_seconds()))
+            self._evento.wait(espera)
+            self._evento.clear()
+
+    def estado(self):
+        """Obtener el estado de las tareas registradas"""
+        with self._lock:
+            tareas = [
+                {
+                    "nombre": t.nombre,
+                    "expresion": t.expresion.expresion,
+                    "ultima_ejecucion": t.ultima_ejecucion.strftime("%Y-%m-%d %H:%M:%S") if t.ultima_ejecucion else None,
+                    "proxima_ejecucion": t.proxima_ejecucion.strftime("%Y-%m-%d %H:%M:%S") if t.proxima_ejecucion else None,
+                    "ejecuciones": t.ejecuciones,
+                    "ultimo_error": t.ultimo_error
+                }
+                for t in sorted(self.tareas.values(), key=lambda t: t.proxima_ejecucion or datetime.max)
+            ]
+        return {
+            "ejecutando": self.ejecutando,
+            "es_lider": self.bloqueo.adquirido,
+            "pid": os.getpid(),
+            "tareas": tareas
+        }
+
+_ruta_database = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'database')
+
+# Instancia única del programador, compartida por respaldos y tareas de mantenimiento
+programador_tareas = ProgramadorTareas(
+    ruta_estado=os.path.normpath(os.path.join(_ruta_database, "programador_estado.json")),
+    ruta_bloqueo=os.path.normpath(os.path.join(_ruta_database, "programador.lock"))
+)
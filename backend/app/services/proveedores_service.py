@@ -24,12 +24,8 @@ class ProveedoresService:
             } for p in orden_data.productos
         ]
         
-        if proveedor.enviar_orden(productos_data):
-            # Obtener el ID de la orden recién creada
-            query = "SELECT id FROM orden WHERE proveedor_id = ? ORDER BY fecha DESC LIMIT 1"
-            resultado = db.fetch_one(query, (proveedor.id,))
-            orden_id = resultado[0] if resultado else None
-            
+        orden_id = proveedor.enviar_orden(productos_data)
+        if orden_id:
             return {
                 "exito": True,
                 "orden_id": orden_id,
@@ -49,22 +45,22 @@ class ProveedoresService:
         """
         resultados = db.fetch_all(query)
         
+        # Productos de todas las órdenes en una sola consulta
+        query_productos = """
+        SELECT op.*, p.nombre, p.descripcion
+        FROM orden_producto op
+        JOIN producto p ON op.producto_id = p.id
+        ORDER BY op.orden_id, op.producto_id
+        """
+        productos_por_orden = {}
+        for prod in db.fetch_all(query_productos):
+            productos_por_orden.setdefault(prod[0], []).append(prod)
+        
         ordenes = []
         for resultado in resultados:
-            orden_id = resultado[0]
-            
-            # Obtener productos de esta orden
-            query_productos = """
-            SELECT op.*, p.nombre, p.descripcion
-            FROM orden_producto op
-            JOIN producto p ON op.producto_id = p.id
-            WHERE op.orden_id = ?
-            """
-            productos_resultado = db.fetch_all(query_productos, (orden_id,))
-            
             productos = []
             total = 0
-            for prod in productos_resultado:
+            for prod in productos_por_orden.get(resultado[0], []):
                 producto_info = {
                     "id": prod[1],  # producto_id
                     "nombre": prod[4],  # nombre
@@ -102,12 +98,8 @@ class ProveedoresService:
         if not proveedor:
             return {"exito": False, "mensaje": "Proveedor no encontrado"}
         
-        if proveedor.enviar_factura(factura_data.orden_id, factura_data.total):
-            # Obtener el ID de la factura recién creada
-            query = "SELECT id FROM factura WHERE orden_id = ? ORDER BY fecha DESC LIMIT 1"
-            resultado = db.fetch_one(query, (factura_data.orden_id,))
-            factura_id = resultado[0] if resultado else None
-            
+        factura_id = proveedor.enviar_factura(factura_data.orden_id, factura_data.total)
+        if factura_id:
             return {
                 "exito": True,
                 "factura_id": factura_id,
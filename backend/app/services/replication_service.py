@@ -0,0 +1,506 @@
+"""
+Servicio de Replicación Continua a un Standby Local
+Sistema de Gestión Papelería Dohko
+
+Cada cambio confirmado en la base principal queda en la tabla
+registro_cambios (mediante triggers). Un hilo envía esos cambios cada
+pocos segundos a una copia standby y los conserva allí para poder
+reconstruir la base a cualquier instante desde la copia base.
+
+Uso por consola (con el servidor detenido para promover):
+    python -m app.services.replication_service estado
+    python -m app.services.replication_service restaurar "2025-07-29 10:30:00"
+    python -m app.services.replication_service promover [archivo_restaurado.db]
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from app.database import db
+from app.services.job_scheduler import BloqueoArchivo, programador_tareas
+
+TABLA_REGISTRO = "registro_cambios"
+# Tablas operativas que no tiene sentido replicar
+TABLAS_EXCLUIDAS = {
+    TABLA_REGISTRO, "sqlite_sequence", "clave_idempotencia", "tarea_pendiente", "cambio_sync", "sync_estado",
+    "evento_difundido"
+}
+PREFIJO_TRIGGER = "replica_"
+
+NOMBRE_STANDBY = "papeleria_dohko_standby.db"
+NOMBRE_BASE = "base_papeleria_dohko.db"
+
+TAMAÑO_LOTE_ENVIO = 5000
+
+def _ahora_unix() -> float:
+    return datetime.now().timestamp()
+
+def _fecha_legible(marca: float) -> str:
+    return datetime.fromtimestamp(marca).strftime("%Y-%m-%d %H:%M:%S") if marca else None
+
+def _tablas_usuario(conn):
+    filas = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '\\_replica\\_%' ESCAPE '\\'"
+    ).fetchall()
+    return [f[0] for f in filas if f[0] not in TABLAS_EXCLUIDAS]
+
+def _columnas(conn, tabla):
+    return [fila[1] for fila in conn.execute(f'PRAGMA table_info("{tabla}")')]
+
+def _copiar_base_datos(origen: str, destino: str):
+    """Copia consistente usando la API de backup de SQLite"""
+    if os.path.exists(destino):
+        os.remove(destino)
+    conn_origen = sqlite3.connect(origen)
+    conn_destino = sqlite3.connect(destino)
+    try:
+        conn_origen.backup(conn_destino)
+    finally:
+        conn_destino.close()
+        conn_origen.close()
+
+class ReplicationService:
+    """Envío continuo del registro de cambios a una base standby"""
+
+    def __init__(self, ruta_db: str, ruta_standby: str, intervalo_segundos: float = 2.0):
+        self.ruta_db = ruta_db
+        self.ruta_standby = ruta_standby
+        self.intervalo_segundos = intervalo_segundos
+        self.archivo_standby = os.path.join(ruta_standby, NOMBRE_STANDBY)
+        self.archivo_base = os.path.join(ruta_standby, NOMBRE_BASE)
+        self.bloqueo = BloqueoArchivo(os.path.join(ruta_standby, "replica.lock"))
+        self.ejecutando = False
+        self.hilo = None
+        self.ultimo_envio = None
+        self.ultimo_error = None
+        self._evento = threading.Event()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ triggers
+
+    @staticmethod
+    def _triggers_tabla(conn, tabla) -> dict:
+        """Sentencias CREATE TRIGGER que registran los cambios de una tabla"""
+        pares = ", ".join(f"'{c}', NEW.\"{c}\"" for c in _columnas(conn, tabla))
+        return {
+            f"{PREFIJO_TRIGGER}{tabla}_ins": f"""CREATE TRIGGER "{PREFIJO_TRIGGER}{tabla}_ins" AFTER INSERT ON "{tabla}" BEGIN
+                    INSERT INTO {TABLA_REGISTRO} (tabla, operacion, fila_id, datos)
+                    VALUES ('{tabla}', 'I', NEW.rowid, json_object({pares}));
+                END""",
+            # Un UPDATE que cambia el rowid se registra como eliminación más inserción
+            f"{PREFIJO_TRIGGER}{tabla}_upd": f"""CREATE TRIGGER "{PREFIJO_TRIGGER}{tabla}_upd" AFTER UPDATE ON "{tabla}" BEGIN
+                    INSERT INTO {TABLA_REGISTRO} (tabla, operacion, fila_id, datos)
+                    SELECT '{tabla}', 'D', OLD.rowid, NULL WHERE OLD.rowid != NEW.rowid;
+                    INSERT INTO {TABLA_REGISTRO} (tabla, operacion, fila_id, datos)
+                    VALUES ('{tabla}', CASE WHEN OLD.rowid != NEW.rowid THEN 'I' ELSE 'U' END, NEW.rowid, json_object({pares}));
+                END""",
+            f"{PREFIJO_TRIGGER}{tabla}_del": f"""CREATE TRIGGER "{PREFIJO_TRIGGER}{tabla}_del" AFTER DELETE ON "{tabla}" BEGIN
+                    INSERT INTO {TABLA_REGISTRO} (tabla, operacion, fila_id, datos)
+                    VALUES ('{tabla}', 'D', OLD.rowid, NULL);
+                END""",
+        }
+
+    def instalar_registro_cambios(self) -> int:
+        """
+        Crear la tabla de cambios y los triggers que falten o cuyas columnas
+        cambiaron; devuelve cuántos triggers se (re)crearon.
+        sqlite3 confirma el DDL de inmediato fuera de una transacción explícita,
+        así que todo va dentro de BEGIN IMMEDIATE: ninguna escritura de otra
+        conexión puede quedar entre el DROP y el CREATE sin registrarse.
+        """
+        conn = sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {TABLA_REGISTRO} (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tabla TEXT NOT NULL,
+                    operacion TEXT NOT NULL,
+                    fila_id INTEGER NOT NULL,
+                    datos TEXT,
+                    fecha REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+                )
+                """)
+                actuales = dict(conn.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?", (f"{PREFIJO_TRIGGER}%",)
+                ).fetchall())
+                deseados = {}
+                for tabla in _tablas_usuario(conn):
+                    deseados.update(self._triggers_tabla(conn, tabla))
+
+                cambiados = 0
+                for nombre in actuales.keys() - deseados.keys():
+                    conn.execute(f'DROP TRIGGER "{nombre}"')
+                for nombre, sql in deseados.items():
+                    if actuales.get(nombre) == sql:
+                        continue
+                    if nombre in actuales:
+                        conn.execute(f'DROP TRIGGER "{nombre}"')
+                    conn.execute(sql)
+                    cambiados += 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return cambiados
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------ standby
+
+    @staticmethod
+    def _preparar_copia(conn, ultimo_seq: int):
+        """Quitar triggers y registro de una copia y crear las tablas de control"""
+        for (nombre,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            conn.execute(f'DROP TRIGGER "{nombre}"')
+        conn.execute(f"DROP TABLE IF EXISTS {TABLA_REGISTRO}")
+        conn.execute("CREATE TABLE IF NOT EXISTS _replica_estado (clave TEXT PRIMARY KEY, valor TEXT)")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS _replica_registro (
+            seq INTEGER PRIMARY KEY,
+            tabla TEXT NOT NULL,
+            operacion TEXT NOT NULL,
+            fila_id INTEGER NOT NULL,
+            datos TEXT,
+            fecha REAL NOT NULL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS _idx_replica_registro_fecha ON _replica_registro (fecha)")
+        conn.executemany("INSERT OR REPLACE INTO _replica_estado (clave, valor) VALUES (?, ?)", [
+            ("ultimo_seq", str(ultimo_seq)),
+            ("fecha_base", str(_ahora_unix())),
+        ])
+        conn.commit()
+
+    def inicializar_standby(self, forzar: bool = False):
+        """Crear la copia base y el standby a partir de la base principal"""
+        if os.path.exists(self.archivo_standby) and not forzar:
+            return
+        os.makedirs(self.ruta_standby, exist_ok=True)
+        _copiar_base_datos(self.ruta_db, self.archivo_base)
+
+        conn = sqlite3.connect(self.archivo_base)
+        try:
+            fila = conn.execute(f"SELECT MAX(seq) FROM {TABLA_REGISTRO}").fetchone()
+            ultimo_seq = fila[0] or 0
+            self._preparar_copia(conn, ultimo_seq)
+            conn.execute("DELETE FROM _replica_registro")
+            conn.commit()
+        finally:
+            conn.close()
+
+        _copiar_base_datos(self.archivo_base, self.archivo_standby)
+        print(f"🪞 Standby inicializado en {self.archivo_standby} (seq base {ultimo_seq})")
+
+    def _sincronizar_esquema(self, conn_destino):
+        """Crear en la copia las tablas y columnas que se agregaron en la principal"""
+        if not os.path.exists(self.ruta_db):
+            return
+        conn_origen = sqlite3.connect(self.ruta_db)
+        try:
+            existentes = set(_tablas_usuario(conn_destino))
+            for tabla in _tablas_usuario(conn_origen):
+                if tabla not in existentes:
+                    (sql,) = conn_origen.execute(
+                        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+                    ).fetchone()
+                    conn_destino.execute(sql)
+                    continue
+                columnas_destino = set(_columnas(conn_destino, tabla))
+                for _, nombre, tipo, _, defecto, _ in conn_origen.execute(f'PRAGMA table_info("{tabla}")'):
+                    if nombre not in columnas_destino:
+                        definicion = f'"{nombre}" {tipo}' + (f" DEFAULT {defecto}" if defecto is not None else "")
+                        conn_destino.execute(f'ALTER TABLE "{tabla}" ADD COLUMN {definicion}')
+            conn_destino.commit()
+        finally:
+            conn_origen.close()
+
+    @staticmethod
+    def _aplicar_cambio(conn, tabla, operacion, fila_id, datos):
+        if operacion == "D":
+            conn.execute(f'DELETE FROM "{tabla}" WHERE rowid = ?', (fila_id,))
+            return
+        valores = json.loads(datos)
+        columnas = ", ".join(f'"{c}"' for c in valores)
+        marcadores = ", ".join("?" for _ in valores)
+        conn.execute(
+            f'INSERT OR REPLACE INTO "{tabla}" (rowid, {columnas}) VALUES (?, {marcadores})',
+            (fila_id, *valores.values())
+        )
+
+    @staticmethod
+    def _leer_estado(conn, clave, defecto=None):
+        fila = conn.execute("SELECT valor FROM _replica_estado WHERE clave = ?", (clave,)).fetchone()
+        return fila[0] if fila else defecto
+
+    # ------------------------------------------------------------------ envío
+
+    def enviar_cambios(self) -> int:
+        """Aplicar en el standby los cambios pendientes; devuelve cuántos se enviaron"""
+        with self._lock:
+            conn_standby = sqlite3.connect(self.archivo_standby)
+            conn_principal = sqlite3.connect(self.ruta_db, timeout=10)
+            try:
+                ultimo_seq = int(self._leer_estado(conn_standby, "ultimo_seq", 0))
+                cambios = conn_principal.execute(
+                    f"SELECT seq, tabla, operacion, fila_id, datos, fecha FROM {TABLA_REGISTRO} WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (ultimo_seq, TAMAÑO_LOTE_ENVIO)
+                ).fetchall()
+                if not cambios:
+                    return 0
+
+                try:
+                    for _, tabla, operacion, fila_id, datos, _ in cambios:
+                        self._aplicar_cambio(conn_standby, tabla, operacion, fila_id, datos)
+                except sqlite3.OperationalError:
+                    # Probablemente cambió el esquema: sincronizar y reintentar el lote completo
+                    conn_standby.rollback()
+                    self._sincronizar_esquema(conn_standby)
+                    for _, tabla, operacion, fila_id, datos, _ in cambios:
+                        self._aplicar_cambio(conn_standby, tabla, operacion, fila_id, datos)
+
+                conn_standby.executemany(
+                    "INSERT OR REPLACE INTO _replica_registro (seq, tabla, operacion, fila_id, datos, fecha) VALUES (?, ?, ?, ?, ?, ?)",
+                    cambios
+                )
+                nuevo_seq = cambios[-1][0]
+                conn_standby.execute("UPDATE _replica_estado SET valor = ? WHERE clave = 'ultimo_seq'", (str(nuevo_seq),))
+                conn_standby.commit()
+
+                # Ya están a salvo en el standby: se pueden borrar de la principal
+                conn_principal.execute(f"DELETE FROM {TABLA_REGISTRO} WHERE seq <= ?", (nuevo_seq,))
+                conn_principal.commit()
+
+                self.ultimo_envio = _ahora_unix()
+                return len(cambios)
+            finally:
+                conn_principal.close()
+                conn_standby.close()
+
+    def _preparar_lider(self) -> bool:
+        """Instalar triggers y standby; solo lo hace el proceso que tiene el bloqueo"""
+        try:
+            cambiados = self.instalar_registro_cambios()
+            if cambiados:
+                print(f"🪞 Registro de cambios actualizado ({cambiados} triggers)")
+            self.inicializar_standby()
+            return True
+        except Exception as e:
+            self.ultimo_error = str(e)
+            print(f"❌ Error preparando la replicación: {e}")
+            return False
+
+    def _ejecutar_bucle(self):
+        while self.ejecutando and not self.bloqueo.adquirir():
+            self._evento.wait(30)
+        while self.ejecutando and not self._preparar_lider():
+            self._evento.wait(30)
+        while self.ejecutando:
+            try:
+                enviados = self.enviar_cambios()
+                self.ultimo_error = None
+            except Exception as e:
+                enviados = 0
+                self.ultimo_error = str(e)
+                print(f"❌ Error en replicación: {e}")
+            # Si quedó un lote lleno se continúa de inmediato
+            if enviados < TAMAÑO_LOTE_ENVIO:
+                self._evento.wait(self.intervalo_segundos)
+
+    def iniciar(self):
+        """
+        Arrancar el envío continuo. Con varios workers, solo el que obtiene el
+        bloqueo instala los triggers, prepara el standby y envía los cambios.
+        """
+        if self.ejecutando:
+            return
+        os.makedirs(self.ruta_standby, exist_ok=True)
+        self.ejecutando = True
+        self._evento.clear()
+        self.hilo = threading.Thread(target=self._ejecutar_bucle, name="replicacion", daemon=True)
+        self.hilo.start()
+        programador_tareas.agregar_tarea("consolidar_replica", "0 4 * * *", self.consolidar_base)
+        print(f"🪞 Replicación continua activa cada {self.intervalo_segundos}s hacia {self.ruta_standby}")
+
+    def detener(self):
+        """Detener el envío (enviando antes lo pendiente si somos el líder)"""
+        self.ejecutando = False
+        self._evento.set()
+        if self.hilo:
+            self.hilo.join(timeout=10)
+        if self.bloqueo.adquirido:
+            try:
+                self.enviar_cambios()
+            except Exception as e:
+                print(f"⚠️ No se pudieron enviar los últimos cambios: {e}")
+        self.bloqueo.liberar()
+
+    # ------------------------------------------------------------------ recuperación
+
+    def consolidar_base(self, dias_ventana: int = 30):
+        """Aplicar a la copia base los cambios más antiguos que la ventana de recuperación"""
+        limite = (datetime.now() - timedelta(days=dias_ventana)).timestamp()
+        with self._lock:
+            conn_standby = sqlite3.connect(self.archivo_standby)
+            conn_base = sqlite3.connect(self.archivo_base)
+            try:
+                cambios = conn_standby.execute(
+                    "SELECT seq, tabla, operacion, fila_id, datos FROM _replica_registro WHERE fecha < ? ORDER BY seq",
+                    (limite,)
+                ).fetchall()
+                if not cambios:
+                    return {"exito": True, "consolidados": 0}
+                self._sincronizar_esquema(conn_base)
+                for _, tabla, operacion, fila_id, datos in cambios:
+                    self._aplicar_cambio(conn_base, tabla, operacion, fila_id, datos)
+                conn_base.executemany("INSERT OR REPLACE INTO _replica_estado (clave, valor) VALUES (?, ?)", [
+                    ("ultimo_seq", str(cambios[-1][0])),
+                    ("fecha_base", str(limite)),
+                ])
+                conn_base.commit()
+                conn_standby.execute("DELETE FROM _replica_registro WHERE seq <= ?", (cambios[-1][0],))
+                conn_standby.execute("INSERT OR REPLACE INTO _replica_estado (clave, valor) VALUES ('fecha_base', ?)", (str(limite),))
+                conn_standby.commit()
+                return {"exito": True, "consolidados": len(cambios)}
+            finally:
+                conn_base.close()
+                conn_standby.close()
+
+    def restaurar_hasta(self, fecha: str, destino: str = None):
+        """Reconstruir la base tal como estaba en 'fecha' (YYYY-MM-DD HH:MM:SS)"""
+        instante = datetime.strptime(fecha, "%Y-%m-%d %H:%M:%S").timestamp()
+        destino = destino or os.path.join(
+            self.ruta_standby, f"restaurado_{fecha.replace(' ', '_').replace(':', '-')}.db"
+        )
+        with self._lock:
+            conn_base = sqlite3.connect(self.archivo_base)
+            try:
+                fecha_base = float(self._leer_estado(conn_base, "fecha_base", 0))
+                base_seq = int(self._leer_estado(conn_base, "ultimo_seq", 0))
+            finally:
+                conn_base.close()
+            if instante < fecha_base:
+                return {"exito": False, "mensaje": f"La ventana de recuperación comienza en {_fecha_legible(fecha_base)}"}
+
+            _copiar_base_datos(self.archivo_base, destino)
+            conn_destino = sqlite3.connect(destino)
+            conn_standby = sqlite3.connect(self.archivo_standby)
+            try:
+                self._sincronizar_esquema(conn_destino)
+                cambios = conn_standby.execute(
+                    "SELECT tabla, operacion, fila_id, datos FROM _replica_registro WHERE seq > ? AND fecha <= ? ORDER BY seq",
+                    (base_seq, instante)
+                )
+                aplicados = 0
+                for tabla, operacion, fila_id, datos in cambios:
+                    self._aplicar_cambio(conn_destino, tabla, operacion, fila_id, datos)
+                    aplicados += 1
+                conn_destino.execute("DROP TABLE IF EXISTS _replica_registro")
+                conn_destino.execute("DROP TABLE IF EXISTS _replica_estado")
+                conn_destino.commit()
+                conn_destino.execute("VACUUM")
+            finally:
+                conn_standby.close()
+                conn_destino.close()
+        return {"exito": True, "archivo": destino, "cambios_aplicados": aplicados,
+                "mensaje": f"Base restaurada al {fecha} en {destino}"}
+
+    def promover(self, origen: str = None):
+        """
+        Convertir el standby (o una base restaurada) en la base principal.
+        La base principal anterior se conserva con sufijo '.anterior-<fecha>'.
+        """
+        origen = origen or self.archivo_standby
+        if not os.path.exists(origen):
+            return {"exito": False, "mensaje": f"No existe {origen}"}
+
+        if os.path.exists(self.ruta_db) and origen == self.archivo_standby:
+            try:
+                self.enviar_cambios()
+            except Exception as e:
+                print(f"⚠️ La base principal no respondió, se promueve con lo ya replicado: {e}")
+
+        if os.path.exists(self.ruta_db):
+            sufijo = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            os.replace(self.ruta_db, f"{self.ruta_db}.anterior-{sufijo}")
+
+        _copiar_base_datos(origen, self.ruta_db)
+        conn = sqlite3.connect(self.ruta_db)
+        try:
+            conn.execute("DROP TABLE IF EXISTS _replica_registro")
+            conn.execute("DROP TABLE IF EXISTS _replica_estado")
+            conn.commit()
+        finally:
+            conn.close()
+
+        # El standby se regenera desde la nueva principal
+        self.instalar_registro_cambios()
+        self.inicializar_standby(forzar=True)
+        return {"exito": True, "mensaje": f"Base promovida desde {origen}"}
+
+    def estado(self):
+        """Obtener el estado de la replicación"""
+        resultado = {
+            "ejecutando": self.ejecutando,
+            "es_lider": self.bloqueo.adquirido,
+            "directorio": self.ruta_standby,
+            "ultimo_envio": _fecha_legible(self.ultimo_envio),
+            "ultimo_error": self.ultimo_error,
+        }
+        if not os.path.exists(self.archivo_standby) or not os.path.exists(self.ruta_db):
+            return {**resultado, "standby_inicializado": os.path.exists(self.archivo_standby)}
+
+        conn_standby = sqlite3.connect(self.archivo_standby)
+        conn_principal = sqlite3.connect(self.ruta_db)
+        try:
+            ultimo_seq = int(self._leer_estado(conn_standby, "ultimo_seq", 0))
+            fecha_base = float(self._leer_estado(conn_standby, "fecha_base", 0))
+            ultimo_cambio = conn_standby.execute("SELECT MAX(fecha) FROM _replica_registro").fetchone()[0]
+            pendientes, mas_antiguo = conn_principal.execute(
+                f"SELECT COUNT(*), MIN(fecha) FROM {TABLA_REGISTRO} WHERE seq > ?", (ultimo_seq,)
+            ).fetchone()
+        finally:
+            conn_principal.close()
+            conn_standby.close()
+
+        return {
+            **resultado,
+            "standby_inicializado": True,
+            "ultimo_seq_replicado": ultimo_seq,
+            "cambios_pendientes": pendientes,
+            "retraso_segundos": round(_ahora_unix() - mas_antiguo, 3) if mas_antiguo else 0,
+            "ventana_recuperacion": {
+                "desde": _fecha_legible(fecha_base),
+                "hasta": _fecha_legible(ultimo_cambio) or _fecha_legible(fecha_base)
+            }
+        }
+
+_ruta_standby_defecto = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'standby')
+)
+
+# Desactivada salvo que se pida: instala triggers en todas las tablas y un hilo de envío
+REPLICACION_HABILITADA = os.environ.get("DOHKO_REPLICA_HABILITADA", "0") == "1"
+
+# Instancia única del servicio
+replicacion_service = ReplicationService(
+    ruta_db=os.path.abspath(db.db_path),
+    ruta_standby=os.environ.get("DOHKO_STANDBY_DIR", _ruta_standby_defecto),
+    intervalo_segundos=float(os.environ.get("DOHKO_REPLICA_INTERVALO", "2"))
+)
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else "estado"
+    if comando == "estado":
+        print(json.dumps(replicacion_service.estado(), indent=2, ensure_ascii=False))
+    elif comando == "restaurar" and len(sys.argv) > 2:
+        print(replicacion_service.restaurar_hasta(sys.argv[2])["mensaje"])
+    elif comando == "promover":
+        print(replicacion_service.promover(sys.argv[2] if len(sys.argv) > 2 else None)["mensaje"])
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,197 @@
+"""
+Servicio de Sincronización Incremental (delta-sync)
+Sistema de Gestión Papelería Dohko
+
+Triggers en producto, venta, orden, factura y alerta anotan cada cambio en
+la tabla cambio_sync con un número de secuencia creciente (solo tabla, id y
+operación; los datos se leen al consultar). Un cliente guarda el último seq
+recibido y pide /api/sync?since=<seq> para obtener solo las filas que
+cambiaron desde entonces. persona y proveedor también se registran, solo
+para versionar sus listados (ETags); no se ofrecen en /api/sync.
+
+Como SQLite admite un solo escritor a la vez, los seq se confirman en orden:
+un cliente nunca ve un seq mayor mientras uno menor sigue sin confirmar.
+
+La compactación periódica deja solo el último cambio de cada fila y olvida
+las eliminaciones más antiguas que RETENCION_ELIMINADOS. Un cliente con un
+since anterior a ese horizonte recibe reinicio=True y debe pedir since=0,
+que devuelve el estado completo.
+"""
+
+import time
+from app.database import db
+
+TABLA_CAMBIOS = "cambio_sync"
+TABLA_ESTADO = "sync_estado"
+PREFIJO_TRIGGER = "sync_"
+TABLAS_SINCRONIZADAS = ("producto", "venta", "orden", "factura", "alerta")
+# También se registran, sin ofrecerse en /api/sync, para versionar sus listados (ETags)
+TABLAS_REGISTRADAS = TABLAS_SINCRONIZADAS + ("persona", "proveedor")
+
+LIMITE_DEFECTO = 1000
+LIMITE_MAXIMO = 10000
+# Las eliminaciones se informan durante este tiempo
+RETENCION_ELIMINADOS = 30 * 24 * 3600
+
+class SincronizacionService:
+
+    def __init__(self):
+        self._esquema_listo = False
+
+    def asegurar_esquema(self):
+        """Crear la tabla de cambios y los triggers; la primera vez registra todas las filas existentes"""
+        if self._esquema_listo:
+            return
+        with db.transaccion(inmediata=True) as conn:
+            nueva = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLA_CAMBIOS,)
+            ).fetchone() is None
+            conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABLA_CAMBIOS} (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tabla TEXT NOT NULL,
+                fila_id INTEGER NOT NULL,
+                operacion TEXT NOT NULL,
+                fecha REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+            )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLA_CAMBIOS}_tabla ON {TABLA_CAMBIOS} (tabla, seq)")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLA_ESTADO} (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+            for tabla in TABLAS_REGISTRADAS:
+                for sufijo, evento, fila, operacion in (
+                    ("ins", "INSERT", "NEW", "U"), ("upd", "UPDATE", "NEW", "U"), ("del", "DELETE", "OLD", "D")
+                ):
+                    conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS "{PREFIJO_TRIGGER}{tabla}_{sufijo}" AFTER {evento} ON "{tabla}" BEGIN
+                        INSERT INTO {TABLA_CAMBIOS} (tabla, fila_id, operacion) VALUES ('{tabla}', {fila}.rowid, '{operacion}');
+                    END
+                    """)
+                if nueva:
+                    conn.execute(
+                        f"INSERT INTO {TABLA_CAMBIOS} (tabla, fila_id, operacion) "
+                        f"SELECT '{tabla}', rowid, 'U' FROM \"{tabla}\" ORDER BY rowid"
+                    )
+            if nueva:
+                print("🔄 Registro de cambios para sincronización creado")
+        self._esquema_listo = True
+
+    @staticmethod
+    def _ultimo_seq(conn) -> int:
+        # sqlite_sequence no retrocede aunque la compactación borre los últimos registros
+        fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (TABLA_CAMBIOS,)).fetchone()
+        return fila[0] if fila else 0
+
+    def versiones(self, tablas) -> dict:
+        """
+        Último seq de cada tabla y el horizonte de compactación. La compactación
+        conserva el último cambio de cada fila, así que el máximo de una tabla
+        solo baja al olvidar eliminaciones, y entonces sube el horizonte.
+        """
+        self.asegurar_esquema()
+        with db.transaccion() as conn:
+            conn.execute("BEGIN")
+            versiones = {
+                tabla: conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {TABLA_CAMBIOS} WHERE tabla = ?", (tabla,)).fetchone()[0]
+                for tabla in tablas
+            }
+            fila = conn.execute(f"SELECT valor FROM {TABLA_ESTADO} WHERE clave = 'horizonte'").fetchone()
+            versiones["_horizonte"] = fila[0] if fila else 0
+        return versiones
+
+    def cambios_desde(self, since: int = 0, limite: int = LIMITE_DEFECTO, tablas=None) -> dict:
+        """
+        Filas cambiadas con seq > since, a lo sumo 'limite' cambios por página.
+        Las filas se devuelven con su estado actual; 'hasta' es el seq que el
+        cliente debe usar como since en la siguiente llamada.
+        """
+        self.asegurar_esquema()
+        tablas = [t for t in (tablas or TABLAS_SINCRONIZADAS) if t in TABLAS_SINCRONIZADAS]
+        # Una sola transacción de lectura: cambios y filas del mismo instante.
+        # sqlite3 no abre transacción para SELECT por sí solo; sin este BEGIN
+        # cada consulta vería un estado distinto de la base.
+        with db.transaccion() as conn:
+            conn.execute("BEGIN")
+            ultimo_seq = self._ultimo_seq(conn)
+            fila = conn.execute(f"SELECT valor FROM {TABLA_ESTADO} WHERE clave = 'horizonte'").fetchone()
+            horizonte = fila[0] if fila else 0
+            if since and (since < horizonte or since > ultimo_seq):
+                return {
+                    "exito": False, "reinicio": True, "desde": since, "hasta": since, "ultimo_seq": ultimo_seq,
+                    "hay_mas": False, "cambios": {},
+                    "mensaje": "El seq indicado ya no está disponible; sincronice desde since=0"
+                }
+
+            marcas = ",".join("?" * len(tablas))
+            registros = conn.execute(
+                f"SELECT seq, tabla, fila_id, operacion FROM {TABLA_CAMBIOS} "
+                f"WHERE seq > ? AND tabla IN ({marcas}) ORDER BY seq LIMIT ?",
+                (since, *tablas, limite)
+            ).fetchall()
+            hay_mas = len(registros) == limite
+            hasta = registros[-1][0] if hay_mas else ultimo_seq
+
+            # El último cambio de cada fila es el que cuenta
+            ultima_operacion = {}
+            for _, tabla, fila_id, operacion in registros:
+                ultima_operacion[(tabla, fila_id)] = operacion
+
+            cambios = {}
+            for tabla in tablas:
+                ids = [i for (t, i), op in ultima_operacion.items() if t == tabla and op == "U"]
+                eliminados = [i for (t, i), op in ultima_operacion.items() if t == tabla and op == "D"]
+                filas = []
+                for inicio in range(0, len(ids), 500):
+                    grupo = ids[inicio:inicio + 500]
+                    cursor = conn.execute(
+                        f'SELECT rowid AS _rowid, * FROM "{tabla}" WHERE rowid IN ({",".join("?" * len(grupo))})', grupo
+                    )
+                    columnas = [c[0] for c in cursor.description]
+                    filas.extend(dict(zip(columnas, valores)) for valores in cursor)
+                # Fila borrada después de este cambio (su eliminación llega en una página posterior)
+                encontrados = {f.pop("_rowid") for f in filas}
+                eliminados.extend(i for i in ids if i not in encontrados)
+                if filas or eliminados:
+                    cambios[tabla] = {"actualizados": filas, "eliminados": sorted(eliminados)}
+
+        return {
+            "exito": True, "reinicio": False, "desde": since, "hasta": hasta, "ultimo_seq": ultimo_seq,
+            "hay_mas": hay_mas, "cambios": cambios
+        }
+
+    def compactar(self) -> dict:
+        """Dejar solo el último cambio por fila y olvidar eliminaciones antiguas (tarea programada)"""
+        self.asegurar_esquema()
+        inicio = time.perf_counter()
+        with db.transaccion(inmediata=True) as conn:
+            reemplazados = conn.execute(f"""
+            DELETE FROM {TABLA_CAMBIOS}
+            WHERE seq NOT IN (SELECT MAX(seq) FROM {TABLA_CAMBIOS} GROUP BY tabla, fila_id)
+            """).rowcount
+            limite = time.time() - RETENCION_ELIMINADOS
+            fila = conn.execute(
+                f"SELECT MAX(seq) FROM {TABLA_CAMBIOS} WHERE operacion = 'D' AND fecha < ?", (limite,)
+            ).fetchone()
+            eliminaciones = 0
+            if fila[0] is not None:
+                eliminaciones = conn.execute(
+                    f"DELETE FROM {TABLA_CAMBIOS} WHERE operacion = 'D' AND seq <= ?", (fila[0],)
+                ).rowcount
+                # Quien sincronizó antes de esto pudo perder eliminaciones
+                conn.execute(
+                    f"INSERT INTO {TABLA_ESTADO} (clave, valor) VALUES ('horizonte', ?) "
+                    "ON CONFLICT (clave) DO UPDATE SET valor = MAX(valor, excluded.valor)", (fila[0],)
+                )
+        if reemplazados or eliminaciones:
+            print(f"🗜️ Registro de sincronización compactado: {reemplazados} cambios reemplazados, "
+                  f"{eliminaciones} eliminaciones antiguas ({time.perf_counter() - inicio:.2f}s)")
+        return {"exito": True, "reemplazados": reemplazados, "eliminaciones_olvidadas": eliminaciones}
+
+    def estado(self) -> dict:
+        self.asegurar_esquema()
+        with db.transaccion() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {TABLA_CAMBIOS}").fetchone()[0]
+            fila = conn.execute(f"SELECT valor FROM {TABLA_ESTADO} WHERE clave = 'horizonte'").fetchone()
+            return {"registros": total, "ultimo_seq": self._ultimo_seq(conn), "horizonte": fila[0] if fila else 0}
+
+# Instancia global del servicio
+sincronizacion_service = SincronizacionService()
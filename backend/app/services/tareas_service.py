@@ -0,0 +1,244 @@
+"""
+Cola de Tareas en Segundo Plano
+Efectos secundarios de ventas y stock (comprobantes, alertas, caché) fuera
+del camino crítico de la petición
+Sistema de Gestión Papelería Dohko
+
+Las tareas se guardan en la tabla tarea_pendiente (outbox) y las procesan
+hilos de trabajo del mismo proceso. Si el proceso se detiene, las tareas
+siguen en la base y se retoman al iniciar. Una tarea que falla se reintenta
+con espera exponencial hasta agotar sus intentos y queda como 'fallida'.
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Iterable
+from app.database import db
+from app.utils.metrics import tareas_pendientes, tareas_procesadas, duracion_tarea
+from app.utils.single_flight import grupo_lecturas
+
+HILOS_TRABAJO = int(os.environ.get("DOHKO_TAREAS_HILOS", "2"))
+MAX_INTENTOS = 5
+ESPERA_MAXIMA_REINTENTO = 300
+# Una tarea 'en_proceso' sin actualizarse en este tiempo se considera abandonada
+TIEMPO_ABANDONO = 300
+# Las tareas completadas se conservan este tiempo para consulta
+RETENCION_COMPLETADAS = 24 * 3600
+
+class ColaTareas:
+
+    def __init__(self, hilos: int = HILOS_TRABAJO):
+        self.hilos = hilos
+        self.manejadores = {}
+        self.ejecutando = False
+        self._trabajadores = []
+        self._evento = threading.Event()
+        self._esquema_listo = False
+
+    # ------------------------------------------------------------------ esquema y registro
+
+    def asegurar_esquema(self):
+        if self._esquema_listo:
+            return
+        with db.transaccion() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS tarea_pendiente (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                datos TEXT,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                intentos INTEGER NOT NULL DEFAULT 0,
+                disponible_en REAL NOT NULL,
+                creada REAL NOT NULL,
+                actualizada REAL NOT NULL,
+                ultimo_error TEXT
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tarea_pendiente_estado ON tarea_pendiente (estado, disponible_en)")
+        self._esquema_listo = True
+
+    def registrar_manejador(self, tipo: str, funcion: Callable[[dict], None], max_intentos: int = MAX_INTENTOS):
+        """Asociar un tipo de tarea con la función que la ejecuta (recibe el dict de datos)"""
+        self.manejadores[tipo] = {"funcion": funcion, "max_intentos": max_intentos}
+
+    # ------------------------------------------------------------------ encolar
+
+    def encolar(self, tareas: Iterable[tuple], conn=None):
+        """
+        Encolar tareas (tipo, datos). Con 'conn' se insertan dentro de la
+        transacción de quien llama, así solo existen si esa transacción se confirma.
+        """
+        ahora = time.time()
+        filas = [(tipo, json.dumps(datos or {}), ahora, ahora, ahora) for tipo, datos in tareas]
+        if not filas:
+            return
+        query = "INSERT INTO tarea_pendiente (tipo, datos, disponible_en, creada, actualizada) VALUES (?, ?, ?, ?, ?)"
+        self.asegurar_esquema()
+        if conn is not None:
+            conn.executemany(query, filas)
+        else:
+            with db.transaccion() as nueva:
+                nueva.executemany(query, filas)
+        self._evento.set()
+
+    # ------------------------------------------------------------------ procesamiento
+
+    def _tomar_siguiente(self):
+        """Marcar como 'en_proceso' la tarea disponible más antigua y devolverla"""
+        ahora = time.time()
+        with db.transaccion(inmediata=True) as conn:
+            return conn.execute("""
+            UPDATE tarea_pendiente
+            SET estado = 'en_proceso', intentos = intentos + 1, actualizada = ?
+            WHERE id = (
+                SELECT id FROM tarea_pendiente
+                WHERE estado = 'pendiente' AND disponible_en <= ?
+                ORDER BY disponible_en, id LIMIT 1
+            )
+            RETURNING id, tipo, datos, intentos
+            """, (ahora, ahora)).fetchone()
+
+    def procesar_una(self) -> bool:
+        """Ejecutar una tarea disponible; devuelve False si no había ninguna"""
+        tarea = self._tomar_siguiente()
+        if tarea is None:
+            return False
+        tarea_id, tipo, datos, intentos = tarea
+        manejador = self.manejadores.get(tipo)
+        inicio = time.perf_counter()
+        try:
+            if manejador is None:
+                raise LookupError(f"No hay manejador para tareas de tipo '{tipo}'")
+            manejador["funcion"](json.loads(datos or "{}"))
+        except Exception as e:
+            max_intentos = manejador["max_intentos"] if manejador else 1
+            error = f"{type(e).__name__}: {e}"
+            if intentos >= max_intentos:
+                estado, disponible_en = "fallida", time.time()
+                print(f"❌ Tarea {tarea_id} ({tipo}) fallida tras {intentos} intentos: {error}")
+                traceback.print_exc()
+            else:
+                estado = "pendiente"
+                disponible_en = time.time() + min(2 ** intentos, ESPERA_MAXIMA_REINTENTO)
+            db.execute_query(
+                "UPDATE tarea_pendiente SET estado = ?, disponible_en = ?, actualizada = ?, ultimo_error = ? WHERE id = ?",
+                (estado, disponible_en, time.time(), error, tarea_id)
+            )
+            tareas_procesadas.etiquetar(tipo, "fallida" if estado == "fallida" else "reintento").inc()
+            return True
+        finally:
+            duracion_tarea.etiquetar(tipo).observar(time.perf_counter() - inicio)
+
+        db.execute_query(
+            "UPDATE tarea_pendiente SET estado = 'completada', actualizada = ?, ultimo_error = NULL WHERE id = ?",
+            (time.time(), tarea_id)
+        )
+        tareas_procesadas.etiquetar(tipo, "completada").inc()
+        return True
+
+    def _bucle(self):
+        while self.ejecutando:
+            try:
+                if self.procesar_una():
+                    continue
+            except Exception as e:
+                print(f"⚠️ Error en el trabajador de tareas: {e}")
+            # Sin trabajo: esperar un aviso de encolar() o revisar reintentos programados
+            self._evento.wait(timeout=1.0)
+            self._evento.clear()
+
+    def recuperar_abandonadas(self) -> int:
+        """Devolver a la cola las tareas que quedaron 'en_proceso' en un proceso que se detuvo"""
+        with db.transaccion() as conn:
+            return conn.execute(
+                "UPDATE tarea_pendiente SET estado = 'pendiente', disponible_en = ? "
+                "WHERE estado = 'en_proceso' AND actualizada < ?",
+                (time.time(), time.time() - TIEMPO_ABANDONO)
+            ).rowcount
+
+    def purgar_completadas(self) -> int:
+        with db.transaccion() as conn:
+            eliminadas = conn.execute(
+                "DELETE FROM tarea_pendiente WHERE estado = 'completada' AND actualizada < ?",
+                (time.time() - RETENCION_COMPLETADAS,)
+            ).rowcount
+        if eliminadas:
+            print(f"🧹 {eliminadas} tareas completadas eliminadas de la cola")
+        return eliminadas
+
+    def iniciar(self):
+        if self.ejecutando:
+            return
+        self.asegurar_esquema()
+        recuperadas = self.recuperar_abandonadas()
+        if recuperadas:
+            print(f"♻️ {recuperadas} tareas abandonadas devueltas a la cola")
+        self.ejecutando = True
+        self._trabajadores = [
+            threading.Thread(target=self._bucle, name=f"tareas-{i}", daemon=True) for i in range(self.hilos)
+        ]
+        for hilo in self._trabajadores:
+            hilo.start()
+        print(f"⚙️ Cola de tareas iniciada con {self.hilos} hilos")
+
+    def detener(self, timeout: float = 5.0):
+        self.ejecutando = False
+        self._evento.set()
+        for hilo in self._trabajadores:
+            hilo.join(timeout=timeout)
+        self._trabajadores = []
+
+    # ------------------------------------------------------------------ visibilidad
+
+    def contar_pendientes(self) -> int:
+        self.asegurar_esquema()
+        fila = db.fetch_one("SELECT COUNT(*) FROM tarea_pendiente WHERE estado IN ('pendiente', 'en_proceso')")
+        return fila[0] if fila else 0
+
+    def reintentar(self, tarea_id: int) -> bool:
+        """Volver a encolar una tarea fallida"""
+        self.asegurar_esquema()
+        with db.transaccion() as conn:
+            cambiadas = conn.execute(
+                "UPDATE tarea_pendiente SET estado = 'pendiente', intentos = 0, disponible_en = ?, actualizada = ? "
+                "WHERE id = ? AND estado = 'fallida'", (time.time(), time.time(), tarea_id)
+            ).rowcount
+        self._evento.set()
+        return cambiadas > 0
+
+    def estado(self, limite_fallidas: int = 20) -> dict:
+        self.asegurar_esquema()
+        ahora = time.time()
+        por_tipo = {}
+        for tipo, estado, cantidad, mas_antigua in db.fetch_all(
+            "SELECT tipo, estado, COUNT(*), MIN(creada) FROM tarea_pendiente GROUP BY tipo, estado"
+        ):
+            resumen = por_tipo.setdefault(tipo, {"pendiente": 0, "en_proceso": 0, "completada": 0, "fallida": 0})
+            resumen[estado] = cantidad
+            if estado == "pendiente":
+                resumen["espera_maxima_segundos"] = round(ahora - mas_antigua, 1)
+        fallidas = [
+            {"id": f[0], "tipo": f[1], "datos": json.loads(f[2] or "{}"), "intentos": f[3], "ultimo_error": f[4]}
+            for f in db.fetch_all(
+                "SELECT id, tipo, datos, intentos, ultimo_error FROM tarea_pendiente "
+                "WHERE estado = 'fallida' ORDER BY id DESC LIMIT ?", (limite_fallidas,)
+            )
+        ]
+        return {
+            "ejecutando": self.ejecutando,
+            "hilos": self.hilos,
+            "manejadores": sorted(self.manejadores),
+            "por_tipo": por_tipo,
+            "pendientes": sum(r["pendiente"] + r["en_proceso"] for r in por_tipo.values()),
+            "fallidas": fallidas,
+        }
+
+# Instancia única de la cola
+cola_tareas = ColaTareas()
+tareas_pendientes.set_funcion(cola_tareas.contar_pendientes)
+
+# Los resultados agrupados ya se invalidan por versión de datos; esto libera la memoria antes
+cola_tareas.registrar_manejador("invalidar_cache", lambda datos: grupo_lecturas.limpiar(), max_intentos=1)
@@ -3,12 +3,196 @@ Servicio de Ventas
 Contiene la lógica de negocio para gestión de ventas
 """
 
+from collections import defaultdict
+from datetime import datetime
 from app.models.venta import Venta
 from app.models.producto import Producto
 from app.database import db
+from app.utils.metrics import ventas_registradas, lineas_venta
+from app.services.tareas_service import cola_tareas
+from app.utils.eventos import difusor_eventos, publicar_stock
+
+# Ventas de un lote que se escriben en cada transacción
+TAMAÑO_GRUPO_LOTE = 200
+
+_esquema_listo = False
 
 class VentasService:
     
+    @staticmethod
+    def asegurar_esquema():
+        """Crear la tabla que relaciona el UUID de la caja con la venta registrada"""
+        global _esquema_listo
+        if _esquema_listo:
+            return
+        db.execute_query("""
+        CREATE TABLE IF NOT EXISTS venta_sincronizada (
+            uuid TEXT PRIMARY KEY,
+            venta_id INTEGER NOT NULL,
+            fecha_recepcion TEXT NOT NULL,
+            FOREIGN KEY (venta_id) REFERENCES venta (id)
+        )
+        """)
+        _esquema_listo = True
+    
+    def registrar_lote(self, ventas_data):
+        """
+        Registrar ventas enviadas en bloque por una caja que estuvo sin conexión.
+        Cada venta trae un UUID: si ya se registró antes se informa como
+        duplicada con su venta_id, así que reenviar el mismo lote es seguro.
+        Las ventas se procesan en orden y el stock se valida por grupo.
+        """
+        self.asegurar_esquema()
+        resultados = [None] * len(ventas_data)
+        
+        # Un UUID repetido dentro del mismo lote se resuelve con la primera aparición
+        primera_aparicion = {}
+        repetidas = []
+        for i, venta_data in enumerate(ventas_data):
+            clave = str(venta_data.uuid)
+            if clave in primera_aparicion:
+                repetidas.append((i, primera_aparicion[clave]))
+            else:
+                primera_aparicion[clave] = i
+        
+        pendientes = list(primera_aparicion.values())
+        for inicio in range(0, len(pendientes), TAMAÑO_GRUPO_LOTE):
+            self._registrar_grupo_lote(ventas_data, pendientes[inicio:inicio + TAMAÑO_GRUPO_LOTE], resultados)
+        
+        for i, original in repetidas:
+            resultados[i] = {
+                **resultados[original],
+                "estado": "duplicada" if resultados[original]["venta_id"] else "rechazada",
+                "mensaje": "UUID repetido dentro del lote"
+            }
+        
+        conteo = defaultdict(int)
+        for resultado in resultados:
+            conteo[resultado["estado"]] += 1
+        return {
+            "exito": conteo["rechazada"] == 0,
+            "mensaje": f"{conteo['registrada']} registradas, {conteo['duplicada']} duplicadas, {conteo['rechazada']} rechazadas",
+            "registradas": conteo["registrada"],
+            "duplicadas": conteo["duplicada"],
+            "rechazadas": conteo["rechazada"],
+            "resultados": resultados
+        }
+    
+    @staticmethod
+    def _validar_venta_lote(venta_data, stock: dict):
+        """Mensaje de rechazo de una venta del lote, o None si se puede registrar"""
+        if not venta_data.productos:
+            return "La venta no tiene productos"
+        vistos = set()
+        problemas = []
+        for item in venta_data.productos:
+            if item.producto_id in vistos:
+                return f"El producto {item.producto_id} aparece más de una vez"
+            vistos.add(item.producto_id)
+            if item.cantidad <= 0:
+                return f"Cantidad inválida para el producto {item.producto_id}"
+            if item.producto_id not in stock:
+                problemas.append(f"producto {item.producto_id} no encontrado")
+            elif stock[item.producto_id][0] < item.cantidad:
+                disponible, nombre = stock[item.producto_id]
+                problemas.append(f"{nombre} (disponible {disponible}, solicitado {item.cantidad})")
+        if problemas:
+            return "Productos no disponibles: " + "; ".join(problemas)
+        return None
+    
+    def _registrar_grupo_lote(self, ventas_data, indices: list, resultados: list):
+        """Validar y escribir un grupo de ventas del lote en una sola transacción"""
+        uuids = [str(ventas_data[i].uuid) for i in indices]
+        producto_ids = list({item.producto_id for i in indices for item in ventas_data[i].productos})
+        cola_tareas.asegurar_esquema()
+        try:
+            with db.transaccion(inmediata=True) as conn:
+                marcas = ",".join("?" * len(uuids))
+                existentes = dict(conn.execute(
+                    f"SELECT uuid, venta_id FROM venta_sincronizada WHERE uuid IN ({marcas})", uuids
+                ))
+                stock = {}
+                if producto_ids:
+                    marcas = ",".join("?" * len(producto_ids))
+                    for producto_id, stock_actual, nombre in conn.execute(
+                        f"SELECT id, stock_actual, nombre FROM producto WHERE id IN ({marcas})", producto_ids
+                    ):
+                        stock[producto_id] = [stock_actual, nombre]
+                
+                recepcion = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                lineas, comprobantes, sincronizadas, registradas = [], [], [], []
+                descuentos = defaultdict(int)
+                for i, clave in zip(indices, uuids):
+                    venta_data = ventas_data[i]
+                    if clave in existentes:
+                        resultados[i] = {"uuid": clave, "estado": "duplicada", "venta_id": existentes[clave],
+                                         "mensaje": "La venta ya estaba registrada"}
+                        continue
+                    
+                    error = self._validar_venta_lote(venta_data, stock)
+                    if error:
+                        resultados[i] = {"uuid": clave, "estado": "rechazada", "venta_id": None, "mensaje": error}
+                        continue
+                    
+                    fecha = (venta_data.fecha or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+                    total = sum(p.cantidad * p.precio_unitario for p in venta_data.productos)
+                    venta_id = conn.execute("""
+                    INSERT INTO venta (fecha, total, estado, cliente_id, administradora_id,
+                                      cliente_nombre, cliente_email, cliente_telefono, tipo_pago, observaciones)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        fecha, total, "completada", venta_data.cliente_id, venta_data.administradora_id,
+                        venta_data.cliente_nombre, venta_data.cliente_email, venta_data.cliente_telefono,
+                        venta_data.tipo_pago or "efectivo", venta_data.observaciones
+                    )).lastrowid
+                    
+                    for item in venta_data.productos:
+                        stock[item.producto_id][0] -= item.cantidad
+                        descuentos[item.producto_id] += item.cantidad
+                        lineas.append((venta_id, item.producto_id, item.cantidad, item.precio_unitario))
+                    comprobantes.append((fecha, f"Venta realizada el {fecha}", total, "venta", venta_id))
+                    sincronizadas.append((clave, venta_id, recepcion))
+                    registradas.append((venta_id, fecha, total))
+                    resultados[i] = {"uuid": clave, "estado": "registrada", "venta_id": venta_id,
+                                     "mensaje": "Venta registrada exitosamente"}
+                
+                if sincronizadas:
+                    conn.executemany(
+                        "INSERT INTO venta_producto (venta_id, producto_id, cantidad, precio_unitario) VALUES (?, ?, ?, ?)",
+                        lineas
+                    )
+                    conn.executemany(
+                        "UPDATE producto SET stock_actual = stock_actual - ? WHERE id = ?",
+                        [(cantidad, producto_id) for producto_id, cantidad in descuentos.items()]
+                    )
+                    conn.executemany(
+                        "INSERT INTO comprobante (fecha, detalles, total, tipo, venta_id) VALUES (?, ?, ?, ?, ?)",
+                        comprobantes
+                    )
+                    conn.executemany(
+                        "INSERT INTO venta_sincronizada (uuid, venta_id, fecha_recepcion) VALUES (?, ?, ?)",
+                        sincronizadas
+                    )
+                    cola_tareas.encolar([
+                        ("alertas_stock", {"producto_ids": list(descuentos)}),
+                        ("invalidar_cache", None),
+                    ], conn=conn)
+        except Exception as e:
+            print(f"Error registrando grupo de ventas del lote: {e}")
+            for i, clave in zip(indices, uuids):
+                resultados[i] = {"uuid": clave, "estado": "rechazada", "venta_id": None,
+                                 "mensaje": "Error al registrar la venta; puede reenviarse"}
+            return
+        
+        ventas_registradas.inc(len(sincronizadas))
+        lineas_venta.inc(len(lineas))
+        difusor_eventos.publicar_varios(
+            ("venta_registrada", {"id": venta_id, "fecha": fecha, "total": total, "origen": "lote"})
+            for venta_id, fecha, total in registradas
+        )
+        publicar_stock(descuentos)
+    
+
     def registrar_venta(self, venta_data):
         """Registrar una nueva venta completa"""
         # Verificar disponibilidad de productos
@@ -39,16 +223,28 @@ class VentasService:
             observaciones=venta_data.observaciones
         )
         
-        if venta.registrar():
-            # Agregar productos a la venta y actualizar stock
-            if venta.agregar_productos(productos_data):
-                # Generar comprobante automáticamente
-                venta.generar_comprobante()
-                return {"exito": True, "venta": venta, "mensaje": "Venta registrada exitosamente"}
-            else:
-                return {"exito": False, "mensaje": "Error al procesar los productos de la venta"}
-        else:
-            return {"exito": False, "mensaje": "Error al registrar la venta"}
+        # Venta, productos, stock y tareas en una sola transacción: si algo
+        # falla no queda nada escrito (el error llega al controlador como 500 y
+        # la venta se puede reintentar), y el comprobante nunca se pierde
+        cola_tareas.asegurar_esquema()
+        with db.transaccion(inmediata=True) as conn:
+            # El stock se vuelve a comprobar con el bloqueo de escritura tomado
+            if not venta.registrar_con_productos(conn, productos_data):
+                return {"exito": False, "mensaje": "Algunos productos no están disponibles en la cantidad solicitada"}
+            # Comprobante, alertas de stock y caché se procesan en segundo plano
+            cola_tareas.encolar([
+                ("comprobante_venta", {"venta_id": venta.id}),
+                ("alertas_stock", {"producto_ids": [p["producto_id"] for p in productos_data]}),
+                ("invalidar_cache", None),
+            ], conn=conn)
+        
+        ventas_registradas.inc()
+        lineas_venta.inc(len(productos_data))
+        difusor_eventos.publicar("venta_registrada", {
+            "id": venta.id, "fecha": venta.fecha, "total": venta.total, "tipo_pago": venta.tipo_pago
+        })
+        publicar_stock(p["producto_id"] for p in productos_data)
+        return {"exito": True, "venta": venta, "mensaje": "Venta registrada exitosamente"}
     
     def verificar_disponibilidad_productos(self, productos):
         """Verificar disponibilidad de múltiples productos"""
@@ -125,3 +321,13 @@ class VentasService:
             })
         
         return productos
+
+def _tarea_comprobante_venta(datos: dict):
+    """Generar el comprobante de una venta (una sola vez aunque la tarea se reintente)"""
+    venta = Venta.obtener_por_id(datos["venta_id"])
+    if not venta or db.fetch_one("SELECT 1 FROM comprobante WHERE venta_id = ?", (venta.id,)):
+        return
+    if not venta.generar_comprobante():
+        raise RuntimeError(f"No se pudo generar el comprobante de la venta {venta.id}")
+
+cola_tareas.registrar_manejador("comprobante_venta", _tarea_comprobante_venta)
@@ -0,0 +1,129 @@
+"""
+Contexto por petición para contar accesos a la base de datos
+Sistema de Gestión Papelería Dohko
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from app.utils.estadisticas_sql import normalizar_sql
+
+# En modo depuración se agregan cabeceras con el conteo de consultas a cada respuesta
+MODO_DEBUG = os.environ.get("DOHKO_DEBUG", "0") == "1"
+
+# Repeticiones de una misma sentencia dentro de una petición que se consideran N+1
+UMBRAL_REPETICIONES = int(os.environ.get("DOHKO_UMBRAL_N_MAS_1", "5"))
+
+class ContextoPeticion:
+    """Contadores de base de datos acumulados durante una petición"""
+
+    __slots__ = ("consultas", "conexiones", "filas", "sentencias", "ruta")
+
+    def __init__(self, ruta: str = ""):
+        self.consultas = 0
+        self.conexiones = 0
+        self.filas = 0
+        self.sentencias = {}
+        self.ruta = ruta
+
+    def posibles_n_mas_1(self, umbral: int = UMBRAL_REPETICIONES) -> dict:
+        """Sentencias idénticas repetidas al menos 'umbral' veces (probable consulta por fila)"""
+        return {sql: veces for sql, veces in self.sentencias.items() if veces >= umbral}
+
+    def resumen(self) -> dict:
+        return {
+            "consultas": self.consultas,
+            "conexiones": self.conexiones,
+            "filas": self.filas,
+            "posibles_n_mas_1": self.posibles_n_mas_1(),
+        }
+
+_contexto_actual: ContextVar[Optional[ContextoPeticion]] = ContextVar("contexto_peticion", default=None)
+
+# Observadores notificados al terminar cada petición (usados por presupuesto_consultas)
+_observadores = []
+_lock_observadores = threading.Lock()
+
+def contexto_actual() -> Optional[ContextoPeticion]:
+    return _contexto_actual.get()
+
+def iniciar_contexto(ruta: str = ""):
+    """Abrir un contexto nuevo; devuelve (contexto, token) para cerrarlo después"""
+    contexto = ContextoPeticion(ruta)
+    return contexto, _contexto_actual.set(contexto)
+
+def finalizar_contexto(contexto: ContextoPeticion, token):
+    """Restaurar el contexto anterior y avisar a los observadores registrados"""
+    _contexto_actual.reset(token)
+    if _observadores:
+        with _lock_observadores:
+            observadores = list(_observadores)
+        for observador in observadores:
+            observador(contexto)
+
+def registrar_conexion():
+    contexto = _contexto_actual.get()
+    if contexto is not None:
+        contexto.conexiones += 1
+
+def registrar_consulta(query: str, filas: int):
+    contexto = _contexto_actual.get()
+    if contexto is not None:
+        contexto.consultas += 1
+        contexto.filas += filas
+        clave = normalizar_sql(query)
+        contexto.sentencias[clave] = contexto.sentencias.get(clave, 0) + 1
+
+def cabeceras_debug(contexto: ContextoPeticion) -> list:
+    """Cabeceras de respuesta con los contadores de la petición (solo en modo depuración)"""
+    cabeceras = [(
+        b"x-consultas-db",
+        f"consultas={contexto.consultas}, conexiones={contexto.conexiones}, filas={contexto.filas}".encode()
+    )]
+    sospechosas = contexto.posibles_n_mas_1()
+    if sospechosas:
+        cabeceras.append((b"x-posible-n-mas-1", str(len(sospechosas)).encode()))
+    return cabeceras
+
+@contextmanager
+def presupuesto_consultas(maximo_consultas: int, maximo_repeticiones: Optional[int] = None):
+    """
+    Verificar que cada petición (o el bloque de código) no supere un número
+    de consultas. Pensado para pruebas:
+
+        with presupuesto_consultas(3):
+            client.get("/api/proveedores/ordenes")
+
+    Si se indica maximo_repeticiones, también falla cuando una misma sentencia
+    se repite más veces que ese límite. Lanza AssertionError con el detalle.
+    """
+    contextos = []
+
+    def observador(contexto):
+        contextos.append(contexto)
+
+    with _lock_observadores:
+        _observadores.append(observador)
+    # Contexto propio para las llamadas directas a modelos y servicios dentro del bloque
+    contexto_bloque, token = iniciar_contexto("bloque")
+    try:
+        yield contextos
+    finally:
+        _contexto_actual.reset(token)
+        with _lock_observadores:
+            _observadores.remove(observador)
+
+    if contexto_bloque.consultas:
+        contextos.append(contexto_bloque)
+    errores = []
+    for contexto in contextos:
+        if contexto.consultas > maximo_consultas:
+            errores.append(f"{contexto.ruta}: {contexto.consultas} consultas (máximo {maximo_consultas})")
+        if maximo_repeticiones is not None:
+            for sql, veces in contexto.sentencias.items():
+                if veces > maximo_repeticiones:
+                    errores.append(f"{contexto.ruta}: sentencia repetida {veces} veces: {sql}")
+    if errores:
+        raise AssertionError("Presupuesto de consultas excedido:\n" + "\n".join(errores))
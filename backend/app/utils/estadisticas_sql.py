@@ -0,0 +1,151 @@
+"""
+Estadísticas de sentencias SQL y registro de consultas lentas
+Sistema de Gestión Papelería Dohko
+"""
+
+import os
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+# Umbral en milisegundos a partir del cual una sentencia se considera lenta
+UMBRAL_CONSULTA_LENTA_MS = float(os.environ.get("DOHKO_UMBRAL_CONSULTA_LENTA_MS", "100"))
+
+_PATRON_CADENA = re.compile(r"'(?:[^']|'')*'")
+_PATRON_NUMERO = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PATRON_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_PATRON_ESPACIOS = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def normalizar_sql(query: str) -> str:
+    """
+    Reducir una sentencia a su forma canónica: espacios colapsados, literales
+    reemplazados por '?' y listas IN de cualquier largo agrupadas como '(?+)'.
+    Las sentencias del proyecto son cadenas fijas, así que la caché casi
+    siempre acierta.
+    """
+    texto = _PATRON_CADENA.sub("?", query)
+    texto = _PATRON_NUMERO.sub("?", texto)
+    texto = _PATRON_LISTA.sub("(?+)", texto)
+    return _PATRON_ESPACIOS.sub(" ", texto).strip()
+
+def forma_parametros(params) -> str:
+    """Describir los parámetros por tipo, sin exponer sus valores"""
+    if not params:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+def plan_consulta(conn, query: str, params) -> list:
+    """Obtener EXPLAIN QUERY PLAN como líneas indentadas según la jerarquía"""
+    try:
+        filas = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    except Exception as e:
+        return [f"No disponible: {e}"]
+    profundidad = {0: -1}
+    lineas = []
+    for id_nodo, padre, _, detalle in filas:
+        nivel = profundidad.get(padre, -1) + 1
+        profundidad[id_nodo] = nivel
+        lineas.append("  " * nivel + detalle)
+    return lineas
+
+class _Estadistica:
+    __slots__ = ("conteo", "total", "maximo", "filas", "lentas", "ultima_lenta")
+
+    def __init__(self):
+        self.conteo = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.filas = 0
+        self.lentas = 0
+        self.ultima_lenta = None
+
+class EstadisticasSQL:
+    """Acumula tiempo, cantidad y filas por sentencia normalizada"""
+
+    CRITERIOS_ORDEN = ("total", "maximo", "conteo", "promedio", "filas")
+
+    def __init__(self, umbral_lenta_ms: float = UMBRAL_CONSULTA_LENTA_MS):
+        self.umbral_lenta = umbral_lenta_ms / 1000
+        self._estadisticas = {}
+        self._lock = threading.Lock()
+        self.desde = datetime.now()
+
+    def registrar(self, query: str, duracion: float, filas: int):
+        """Acumular una ejecución; devuelve True si superó el umbral de lentitud"""
+        clave = normalizar_sql(query)
+        with self._lock:
+            estadistica = self._estadisticas.get(clave)
+            if estadistica is None:
+                estadistica = self._estadisticas[clave] = _Estadistica()
+            estadistica.conteo += 1
+            estadistica.total += duracion
+            estadistica.filas += filas
+            if duracion > estadistica.maximo:
+                estadistica.maximo = duracion
+        return duracion >= self.umbral_lenta
+
+    def registrar_lenta(self, conn, query: str, params, duracion: float):
+        """Guardar y mostrar el plan de una sentencia que superó el umbral"""
+        plan = plan_consulta(conn, query, params)
+        muestra = {
+            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "duracion_ms": round(duracion * 1000, 3),
+            "parametros": forma_parametros(params),
+            "plan": plan,
+        }
+        clave = normalizar_sql(query)
+        with self._lock:
+            estadistica = self._estadisticas.get(clave)
+            if estadistica is not None:
+                estadistica.lentas += 1
+                estadistica.ultima_lenta = muestra
+
+        print(f"🐢 Consulta lenta ({muestra['duracion_ms']:.1f} ms) parámetros {muestra['parametros']}: {clave}")
+        for linea in plan:
+            print(f"     {linea}")
+
+    def top(self, limite: int = 20, orden: str = "total"):
+        """Obtener las sentencias con mayor costo según el criterio indicado"""
+        if orden not in self.CRITERIOS_ORDEN:
+            raise ValueError(f"Orden inválido. Use uno de: {', '.join(self.CRITERIOS_ORDEN)}")
+        with self._lock:
+            filas = [
+                {
+                    "sql": sql,
+                    "conteo": e.conteo,
+                    "total_ms": round(e.total * 1000, 3),
+                    "promedio_ms": round(e.total / e.conteo * 1000, 3) if e.conteo else 0.0,
+                    "maximo_ms": round(e.maximo * 1000, 3),
+                    "filas": e.filas,
+                    "lentas": e.lentas,
+                    "ultima_lenta": e.ultima_lenta,
+                }
+                for sql, e in self._estadisticas.items()
+            ]
+        clave = {"total": "total_ms", "maximo": "maximo_ms", "promedio": "promedio_ms"}.get(orden, orden)
+        filas.sort(key=lambda fila: fila[clave], reverse=True)
+        return filas[:limite]
+
+    def resumen(self):
+        """Totales generales desde el último reinicio"""
+        with self._lock:
+            return {
+                "desde": self.desde.strftime("%Y-%m-%d %H:%M:%S"),
+                "sentencias_distintas": len(self._estadisticas),
+                "ejecuciones": sum(e.conteo for e in self._estadisticas.values()),
+                "lentas": sum(e.lentas for e in self._estadisticas.values()),
+                "umbral_lenta_ms": self.umbral_lenta * 1000,
+            }
+
+    def reiniciar(self):
+        """Descartar las estadísticas acumuladas"""
+        with self._lock:
+            self._estadisticas.clear()
+            self.desde = datetime.now()
+
+# Estadísticas globales del proceso
+estadisticas_sql = EstadisticasSQL()
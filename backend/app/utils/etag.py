@@ -0,0 +1,136 @@
+"""
+ETags por versión de tabla y GET condicional (If-None-Match)
+Sistema de Gestión Papelería Dohko
+
+La versión de una tabla es el último seq que el registro de cambios de la
+sincronización (cambio_sync) anotó para ella, así que el ETag de un listado
+no cambia mientras las tablas que lee no cambien y no hace falta otro juego
+de triggers. Las versiones se guardan en memoria y solo se vuelven a leer
+cuando cambia PRAGMA data_version: una consulta repetida sin cambios se
+responde 304 sin ejecutar el endpoint.
+"""
+
+import re
+import secrets
+import threading
+import anyio
+from app.database import db
+from app.services.sincronizacion_service import sincronizacion_service, TABLA_ESTADO
+
+CLAVE_EPOCA = "epoca_etag"
+
+# Rutas GET con ETag y las tablas de las que depende su respuesta
+RUTAS_CON_ETAG = [
+    (re.compile(r"^/api/inventario/productos$"), ("producto",)),
+    (re.compile(r"^/api/inventario/productos/\d+$"), ("producto",)),
+    (re.compile(r"^/api/proveedores/$"), ("persona", "proveedor")),
+]
+TABLAS_VERSIONADAS = tuple(sorted({tabla for _, tablas in RUTAS_CON_ETAG for tabla in tablas}))
+
+# Versión anterior: contadores propios mantenidos por triggers
+TABLA_VERSIONES_ANTERIOR = "version_tabla"
+PREFIJO_TRIGGER_ANTERIOR = "version_"
+
+class VersionesTablas:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._esquema_listo = None
+        self._clave = None
+        self._versiones = {}
+
+    def asegurar_esquema(self):
+        if self._esquema_listo == db.db_path:
+            return
+        sincronizacion_service.asegurar_esquema()
+        with db.transaccion() as conn:
+            for tabla in TABLAS_VERSIONADAS:
+                for sufijo in ("ins", "upd", "del"):
+                    conn.execute(f'DROP TRIGGER IF EXISTS "{PREFIJO_TRIGGER_ANTERIOR}{tabla}_{sufijo}"')
+            conn.execute(f"DROP TABLE IF EXISTS {TABLA_VERSIONES_ANTERIOR}")
+            # La época cambia en cada arranque: una base restaurada desde un
+            # respaldo o un standby promovido trae seqs de antes, que al volver
+            # a subir repetirían ETags ya entregados para otros datos.
+            # Cada worker la renueva al iniciar; todos leen el mismo valor.
+            conn.execute(
+                f"INSERT OR REPLACE INTO {TABLA_ESTADO} (clave, valor) VALUES (?, ?)",
+                (CLAVE_EPOCA, secrets.randbits(31))
+            )
+        self._esquema_listo = db.db_path
+
+    def obtener(self) -> dict:
+        """Versiones vigentes; solo consulta el registro de cambios si otra conexión confirmó cambios"""
+        self.asegurar_esquema()
+        clave = (db.db_path, db.version_datos())
+        with self._lock:
+            if clave == self._clave:
+                return self._versiones
+        versiones = sincronizacion_service.versiones(TABLAS_VERSIONADAS)
+        fila = db.fetch_one(f"SELECT valor FROM {TABLA_ESTADO} WHERE clave = ?", (CLAVE_EPOCA,))
+        versiones["_epoca"] = fila[0] if fila else 0
+        with self._lock:
+            self._clave, self._versiones = clave, versiones
+        return versiones
+
+    def etag(self, tablas) -> str:
+        versiones = self.obtener()
+        partes = [str(versiones["_epoca"]), str(versiones["_horizonte"])] + [str(versiones.get(t, 0)) for t in tablas]
+        return 'W/"' + ".".join(partes) + '"'
+
+versiones_tablas = VersionesTablas()
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (lista separada por comas o '*')"""
+    if if_none_match.strip() == "*":
+        return True
+    opaco = etag[2:] if etag.startswith("W/") else etag
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == opaco:
+            return True
+    return False
+
+class MiddlewareETag:
+    """Middleware ASGI: ETag en las RUTAS_CON_ETAG y 304 si If-None-Match coincide"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        ruta = scope["path"]
+        raiz = scope.get("root_path", "")
+        if raiz and ruta.startswith(raiz):
+            ruta = ruta[len(raiz):]
+        tablas = next((t for patron, t in RUTAS_CON_ETAG if patron.match(ruta)), None)
+        if tablas is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Se calcula antes de ejecutar el endpoint: si algo cambia mientras
+        # tanto, el ETag queda viejo y la próxima consulta recibe los datos nuevos.
+        # En un hilo: PRAGMA data_version y la relectura de versiones pueden
+        # esperar el bloqueo de una escritura y no deben detener el bucle de eventos.
+        etag = await anyio.to_thread.run_sync(versiones_tablas.etag, tablas)
+        cabecera_etag = etag.encode("latin-1")
+        if_none_match = next((v for k, v in scope["headers"] if k == b"if-none-match"), None)
+        if if_none_match is not None and _coincide(if_none_match.decode("latin-1"), etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", cabecera_etag), (b"cache-control", b"no-cache")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and mensaje["status"] == 200:
+                mensaje = {**mensaje, "headers": list(mensaje.get("headers", []))
+                           + [(b"etag", cabecera_etag), (b"cache-control", b"no-cache")]}
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
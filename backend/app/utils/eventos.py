@@ -0,0 +1,242 @@
+"""
+Difusión de eventos de cambios (stock, ventas, alertas) por Server-Sent Events
+Sistema de Gestión Papelería Dohko
+
+Los servicios publican eventos compactos desde cualquier hilo. Cada evento
+se guarda en la tabla evento_difundido, compartida por todos los workers de
+uvicorn: su seq es el id del evento. En cada proceso un hilo vigila PRAGMA
+data_version y reparte los eventos nuevos (de cualquier worker) a las
+conexiones abiertas de /api/eventos/stream. Los últimos eventos quedan en la
+tabla para que un cliente que se reconecta con Last-Event-ID, a cualquier
+worker, reciba lo que se perdió. Si ese id ya no está en el historial el
+cliente recibe un evento 'reinicio' y debe volver a cargar sus listas.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Iterable, Optional
+from app.database import db
+from app.utils.metrics import eventos_publicados, eventos_descartados, suscriptores_eventos
+
+TABLA_EVENTOS = "evento_difundido"
+# Eventos que se conservan para reanudar conexiones
+TAMAÑO_HISTORIAL = int(os.environ.get("DOHKO_EVENTOS_HISTORIAL", "1000"))
+# Cada cuánto se buscan eventos publicados por otros procesos (segundos)
+INTERVALO_SONDEO = 0.2
+# Eventos sin enviar por conexión; un cliente más lento se desconecta y reanuda
+MAX_EVENTOS_EN_COLA = 500
+
+class Suscripcion:
+    """Una conexión abierta: cola de eventos del bucle asyncio que la atiende"""
+    __slots__ = ("bucle", "cola", "tipos", "desde", "desbordada")
+
+    def __init__(self, bucle, tipos: Optional[set], desde: int = 0):
+        self.bucle = bucle
+        self.cola = asyncio.Queue(maxsize=MAX_EVENTOS_EN_COLA)
+        self.tipos = tipos
+        # Eventos con seq hasta este valor ya los tiene el cliente
+        self.desde = desde
+        self.desbordada = False
+
+    def _entregar(self, evento):
+        """Se ejecuta en el bucle de la conexión (call_soon_threadsafe)"""
+        if self.desbordada:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cerrar la conexión: al reconectar recupera lo perdido desde el historial
+            self.desbordada = True
+            eventos_descartados.inc()
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(None)
+
+class DifusorEventos:
+
+    def __init__(self, tamaño_historial: int = TAMAÑO_HISTORIAL):
+        self.tamaño_historial = tamaño_historial
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._esquema_listo = None
+        # Último seq repartido por este proceso
+        self._ultimo = 0
+        self._hilo = None
+        self._lock_hilo = threading.Lock()
+        self._detener = threading.Event()
+
+    def asegurar_esquema(self):
+        if self._esquema_listo == db.db_path:
+            return
+        with db.transaccion() as conn:
+            conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABLA_EVENTOS} (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                datos TEXT NOT NULL
+            )
+            """)
+        self._esquema_listo = db.db_path
+
+    def publicar(self, tipo: str, datos: dict):
+        """Registrar un evento para todas las conexiones de todos los workers (seguro desde cualquier hilo)"""
+        self.publicar_varios([(tipo, datos)])
+
+    def publicar_varios(self, eventos: Iterable[tuple]):
+        """Registrar varios eventos (tipo, datos) en una sola escritura"""
+        filas = [(tipo, json.dumps(datos, ensure_ascii=False, default=str)) for tipo, datos in eventos]
+        if not filas:
+            return
+        try:
+            self.asegurar_esquema()
+            with db.transaccion() as conn:
+                conn.executemany(f"INSERT INTO {TABLA_EVENTOS} (tipo, datos) VALUES (?, ?)", filas)
+                (ultimo,) = conn.execute("SELECT last_insert_rowid()").fetchone()
+                conn.execute(f"DELETE FROM {TABLA_EVENTOS} WHERE seq <= ?", (ultimo - self.tamaño_historial,))
+        except Exception as e:
+            # El cambio ya está confirmado; los clientes lo verán al recargar
+            print(f"⚠️ No se pudo publicar el evento {filas[0][0]}: {e}")
+            return
+        for tipo, _ in filas:
+            eventos_publicados.etiquetar(tipo).inc()
+
+    def _leer_desde(self, seq: int, hasta: Optional[int] = None) -> list:
+        query = f"SELECT seq, tipo, datos FROM {TABLA_EVENTOS} WHERE seq > ?"
+        params = (seq,)
+        if hasta is not None:
+            query += " AND seq <= ?"
+            params = (seq, hasta)
+        return db.fetch_all(query + " ORDER BY seq", params)
+
+    def _repartir(self):
+        """Enviar a las conexiones de este proceso los eventos nuevos de cualquier worker"""
+        # Solo este hilo avanza self._ultimo: la lectura se hace sin el lock
+        eventos = self._leer_desde(self._ultimo)
+        if not eventos:
+            return
+        with self._lock:
+            self._ultimo = eventos[-1][0]
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            for evento in eventos:
+                if evento[0] > suscripcion.desde and (suscripcion.tipos is None or evento[1] in suscripcion.tipos):
+                    try:
+                        suscripcion.bucle.call_soon_threadsafe(suscripcion._entregar, evento)
+                    except RuntimeError:
+                        # El bucle de esa conexión ya se cerró
+                        self.cancelar(suscripcion)
+                        break
+
+    def _vigilar(self):
+        version = None
+        while not self._detener.is_set():
+            try:
+                # data_version solo cambia cuando alguna conexión confirma una escritura
+                actual = (db.db_path, db.version_datos())
+                if actual != version:
+                    version = actual
+                    self._repartir()
+            except Exception as e:
+                print(f"⚠️ Error leyendo eventos: {e}")
+            self._detener.wait(INTERVALO_SONDEO)
+
+    def _iniciar_vigilancia(self):
+        """Arrancar el hilo que reparte eventos (con la primera conexión)"""
+        with self._lock_hilo:
+            if self._hilo is not None:
+                if self._hilo.is_alive() and not self._detener.is_set():
+                    return
+                # Detenido por cerrar_todas: esperar a que termine antes de arrancar otro
+                self._hilo.join()
+            self.asegurar_esquema()
+            fila = db.fetch_one(f"SELECT MAX(seq) FROM {TABLA_EVENTOS}")
+            with self._lock:
+                self._ultimo = fila[0] or 0
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._vigilar, name="difusor-eventos", daemon=True)
+            self._hilo.start()
+
+    def suscribir(self, bucle, ultimo_id: Optional[str] = None, tipos: Optional[Iterable[str]] = None):
+        """
+        Abrir una suscripción atendida por 'bucle'. Devuelve (suscripcion, pendientes, reiniciar):
+        pendientes son los eventos posteriores a ultimo_id y reiniciar indica
+        que no se pueden recuperar todos. Lee la base: llamar desde un hilo.
+        """
+        tipos = set(tipos) if tipos else None
+        numero = ultimo_id.strip() if ultimo_id else None
+        numero = int(numero) if numero and numero.isdigit() else None
+        suscripcion = Suscripcion(bucle, tipos, numero or 0)
+        self._iniciar_vigilancia()
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+            # Los posteriores a este seq llegan por la cola de la suscripción
+            repartido = self._ultimo
+
+        pendientes, reiniciar = [], False
+        if ultimo_id:
+            # El historial es de todos los workers: el hilo de este proceso
+            # puede ir unos milisegundos atrás sin que el id sea desconocido
+            primero, maximo = db.fetch_one(f"SELECT MIN(seq), MAX(seq) FROM {TABLA_EVENTOS}")
+            if numero is None or numero > (maximo or 0):
+                reiniciar = True
+            elif numero < repartido:
+                reiniciar = primero is None or numero < primero - 1
+                if not reiniciar:
+                    pendientes = self._leer_desde(numero, repartido)
+            if reiniciar:
+                suscripcion.desde = 0
+        if tipos is not None:
+            pendientes = [e for e in pendientes if e[1] in tipos]
+        return suscripcion, pendientes, reiniciar
+
+    def cancelar(self, suscripcion: Suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def cerrar_todas(self):
+        """Terminar las conexiones abiertas y el hilo de reparto (apagado del servidor)"""
+        self._detener.set()
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+            self._suscripciones.clear()
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.bucle.call_soon_threadsafe(suscripcion.cola.put_nowait, None)
+            except (RuntimeError, asyncio.QueueFull):
+                pass
+
+    def ultimo_id(self) -> str:
+        with self._lock:
+            return str(self._ultimo)
+
+    def contar_suscripciones(self) -> int:
+        with self._lock:
+            return len(self._suscripciones)
+
+    def formatear(self, evento) -> bytes:
+        numero, tipo, datos = evento
+        return f"id: {numero}\nevent: {tipo}\ndata: {datos}\n\n".encode("utf-8")
+
+# Instancia única del difusor
+difusor_eventos = DifusorEventos()
+suscriptores_eventos.set_funcion(difusor_eventos.contar_suscripciones)
+
+def publicar_stock(producto_ids: Iterable[int]):
+    """Publicar el stock vigente de los productos indicados (después de confirmar el cambio)"""
+    producto_ids = list(dict.fromkeys(producto_ids))
+    if not producto_ids:
+        return
+    try:
+        marcas = ",".join("?" * len(producto_ids))
+        filas = db.fetch_all(
+            f"SELECT id, stock_actual, stock_minimo FROM producto WHERE id IN ({marcas})", producto_ids
+        )
+    except Exception as e:
+        print(f"⚠️ No se pudo publicar el cambio de stock: {e}")
+        return
+    difusor_eventos.publicar_varios(
+        ("stock_actualizado", {"producto_id": producto_id, "stock_actual": stock_actual, "stock_minimo": stock_minimo})
+        for producto_id, stock_actual, stock_minimo in filas
+    )
@@ -0,0 +1,257 @@
+"""
+Claves de idempotencia (cabecera Idempotency-Key) para endpoints POST
+Sistema de Gestión Papelería Dohko
+
+Un cliente que reintenta un POST con la misma clave recibe la respuesta
+guardada de la primera ejecución en lugar de crear otra venta, orden o
+factura. Las claves caducan tras DOHKO_IDEMPOTENCIA_TTL_HORAS (24 por defecto).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import anyio
+from app.database import db
+
+CABECERA = b"idempotency-key"
+LONGITUD_MAXIMA_CLAVE = 255
+TTL_SEGUNDOS = float(os.environ.get("DOHKO_IDEMPOTENCIA_TTL_HORAS", "24")) * 3600
+# Una clave 'en_proceso' más antigua que esto se considera abandonada (proceso caído)
+ABANDONO_SEGUNDOS = 120
+# Esperas entre intentos de guardar la respuesta si la base está bloqueada
+ESPERAS_GUARDADO = (0.2, 1.0, 3.0)
+
+# Endpoints POST que aceptan Idempotency-Key
+RUTAS_IDEMPOTENTES = {
+    "/api/ventas/",
+    "/api/proveedores/ordenes",
+    "/api/proveedores/facturas",
+}
+
+# Cabeceras de la respuesta que se guardan para repetirlas
+CABECERAS_GUARDADAS = {b"content-type", b"location"}
+
+class AlmacenIdempotencia:
+    """Tabla clave_idempotencia: una fila por (clave, ruta) con la respuesta guardada"""
+
+    def __init__(self):
+        self._esquema_listo = False
+        # Respuestas que no se pudieron guardar: se repiten desde memoria y se
+        # vuelve a intentar guardarlas, para que la clave no quede 'en_proceso'
+        # y se ejecute otra vez al considerarse abandonada
+        self._sin_guardar = {}
+        self._lock = threading.Lock()
+
+    def asegurar_esquema(self):
+        if self._esquema_listo:
+            return
+        with db.transaccion() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS clave_idempotencia (
+                clave TEXT NOT NULL,
+                ruta TEXT NOT NULL,
+                huella TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'en_proceso',
+                codigo INTEGER,
+                cabeceras TEXT,
+                cuerpo BLOB,
+                creada REAL NOT NULL,
+                expira REAL NOT NULL,
+                PRIMARY KEY (clave, ruta)
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_clave_idempotencia_expira ON clave_idempotencia (expira)")
+        self._esquema_listo = True
+
+    def reservar(self, clave: str, ruta: str, huella: str):
+        """
+        Registrar la clave antes de ejecutar la petición. Devuelve
+        ('nueva', None), ('completada', fila), ('en_proceso', None) o ('conflicto', None)
+        si la clave ya se usó con otro cuerpo.
+        """
+        self.asegurar_esquema()
+        self._reintentar_sin_guardar()
+        with self._lock:
+            pendiente = self._sin_guardar.get((clave, ruta))
+        if pendiente is not None:
+            if pendiente["huella"] != huella:
+                return "conflicto", None
+            return "completada", pendiente
+        ahora = time.time()
+        with db.transaccion(inmediata=True) as conn:
+            fila = conn.execute(
+                "SELECT huella, estado, codigo, cabeceras, cuerpo, creada, expira FROM clave_idempotencia "
+                "WHERE clave = ? AND ruta = ?", (clave, ruta)
+            ).fetchone()
+            vigente = fila and fila[6] > ahora and not (fila[1] == "en_proceso" and fila[5] < ahora - ABANDONO_SEGUNDOS)
+            if vigente:
+                if fila[0] != huella:
+                    return "conflicto", None
+                if fila[1] == "en_proceso":
+                    return "en_proceso", None
+                return "completada", {"codigo": fila[2], "cabeceras": json.loads(fila[3]), "cuerpo": fila[4]}
+            conn.execute(
+                "INSERT OR REPLACE INTO clave_idempotencia (clave, ruta, huella, estado, creada, expira) "
+                "VALUES (?, ?, ?, 'en_proceso', ?, ?)", (clave, ruta, huella, ahora, ahora + TTL_SEGUNDOS)
+            )
+        return "nueva", None
+
+    @staticmethod
+    def _escribir(clave: str, ruta: str, respuesta: dict):
+        db.execute_query(
+            "UPDATE clave_idempotencia SET estado = 'completada', codigo = ?, cabeceras = ?, cuerpo = ? "
+            "WHERE clave = ? AND ruta = ?",
+            (respuesta["codigo"], json.dumps(respuesta["cabeceras"]), respuesta["cuerpo"], clave, ruta)
+        )
+
+    def guardar(self, clave: str, ruta: str, huella: str, codigo: int, cabeceras: list, cuerpo: bytes) -> bool:
+        """
+        Marcar la clave como completada con su respuesta. Si la base no
+        responde tras varios intentos, la respuesta queda en memoria: los
+        reintentos de este proceso la reciben igual y se vuelve a intentar
+        guardarla en cada reserva.
+        """
+        respuesta = {"huella": huella, "codigo": codigo, "cabeceras": cabeceras, "cuerpo": cuerpo}
+        for espera in ESPERAS_GUARDADO:
+            try:
+                self._escribir(clave, ruta, respuesta)
+                return True
+            except sqlite3.Error as e:
+                error = e
+                time.sleep(espera)
+        print(f"⚠️ No se pudo guardar la respuesta de la Idempotency-Key {clave} ({error}); se conserva en memoria")
+        with self._lock:
+            self._sin_guardar[(clave, ruta)] = respuesta
+        return False
+
+    def _reintentar_sin_guardar(self):
+        with self._lock:
+            pendientes = list(self._sin_guardar.items())
+        for (clave, ruta), respuesta in pendientes:
+            try:
+                self._escribir(clave, ruta, respuesta)
+            except sqlite3.Error:
+                return
+            with self._lock:
+                self._sin_guardar.pop((clave, ruta), None)
+
+    def liberar(self, clave: str, ruta: str):
+        """Olvidar la clave para que el reintento vuelva a ejecutarse (errores 5xx)"""
+        db.execute_query("DELETE FROM clave_idempotencia WHERE clave = ? AND ruta = ?", (clave, ruta))
+
+    def purgar_expiradas(self) -> int:
+        """Eliminar claves vencidas (tarea programada)"""
+        self.asegurar_esquema()
+        with db.transaccion() as conn:
+            eliminadas = conn.execute("DELETE FROM clave_idempotencia WHERE expira <= ?", (time.time(),)).rowcount
+        if eliminadas:
+            print(f"🔑 {eliminadas} claves de idempotencia vencidas eliminadas")
+        return eliminadas
+
+almacen_idempotencia = AlmacenIdempotencia()
+
+async def _responder_json(send, codigo: int, mensaje: str, cabeceras_extra: list = ()):
+    cuerpo = json.dumps({"detail": mensaje}, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": codigo,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(cuerpo)).encode())]
+                   + list(cabeceras_extra),
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+class MiddlewareIdempotencia:
+    """Middleware ASGI: aplica Idempotency-Key a los POST de RUTAS_IDEMPOTENTES"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        ruta = scope["path"]
+        raiz = scope.get("root_path", "")
+        if raiz and ruta.startswith(raiz):
+            ruta = ruta[len(raiz):]
+        clave = next((v for k, v in scope["headers"] if k == CABECERA), None)
+        if ruta not in RUTAS_IDEMPOTENTES or clave is None:
+            await self.app(scope, receive, send)
+            return
+
+        clave = clave.decode("latin-1").strip()
+        if not clave or len(clave) > LONGITUD_MAXIMA_CLAVE:
+            await _responder_json(send, 400, f"Idempotency-Key debe tener entre 1 y {LONGITUD_MAXIMA_CLAVE} caracteres")
+            return
+
+        # Leer el cuerpo completo para comparar reintentos con la petición original
+        partes = []
+        while True:
+            mensaje = await receive()
+            if mensaje["type"] == "http.disconnect":
+                return
+            partes.append(mensaje.get("body", b""))
+            if not mensaje.get("more_body", False):
+                break
+        cuerpo_peticion = b"".join(partes)
+        huella = hashlib.sha256(cuerpo_peticion).hexdigest()
+
+        resultado, guardada = await anyio.to_thread.run_sync(almacen_idempotencia.reservar, clave, ruta, huella)
+        if resultado == "conflicto":
+            await _responder_json(send, 422, "La Idempotency-Key ya se usó con una petición distinta")
+            return
+        if resultado == "en_proceso":
+            await _responder_json(send, 409, "Hay una petición con esta Idempotency-Key en curso",
+                                  [(b"retry-after", b"1")])
+            return
+        if resultado == "completada":
+            cabeceras = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in guardada["cabeceras"]]
+            cuerpo = guardada["cuerpo"] or b""
+            await send({
+                "type": "http.response.start",
+                "status": guardada["codigo"],
+                "headers": cabeceras + [(b"content-length", str(len(cuerpo)).encode()),
+                                        (b"idempotent-replayed", b"true")],
+            })
+            await send({"type": "http.response.body", "body": cuerpo})
+            return
+
+        entregado = False
+
+        async def recibir():
+            nonlocal entregado
+            if not entregado:
+                entregado = True
+                return {"type": "http.request", "body": cuerpo_peticion, "more_body": False}
+            return await receive()
+
+        respuesta = {"codigo": 500, "cabeceras": [], "cuerpo": []}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["codigo"] = mensaje["status"]
+                respuesta["cabeceras"] = [
+                    (k.decode("latin-1"), v.decode("latin-1"))
+                    for k, v in mensaje.get("headers", []) if k.lower() in CABECERAS_GUARDADAS
+                ]
+            elif mensaje["type"] == "http.response.body":
+                respuesta["cuerpo"].append(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, recibir, enviar)
+        except BaseException:
+            await anyio.to_thread.run_sync(almacen_idempotencia.liberar, clave, ruta)
+            raise
+
+        # Los errores del servidor no se guardan: el reintento debe ejecutarse de nuevo
+        if respuesta["codigo"] >= 500:
+            await anyio.to_thread.run_sync(almacen_idempotencia.liberar, clave, ruta)
+        else:
+            await anyio.to_thread.run_sync(
+                almacen_idempotencia.guardar, clave, ruta, huella, respuesta["codigo"],
+                respuesta["cabeceras"], b"".join(respuesta["cuerpo"])
+            )
@@ -0,0 +1,122 @@
+"""
+Middleware de medición de peticiones HTTP
+Sistema de Gestión Papelería Dohko
+"""
+
+import time
+import weakref
+from datetime import datetime
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.metrics import (
+    duracion_http, tamaño_respuesta_http, tamaño_peticion_http, peticiones_en_curso,
+    consultas_por_peticion, posibles_n_mas_1
+)
+from app.utils.memoria import diagnostico_memoria
+from app.utils.contexto_peticion import MODO_DEBUG, iniciar_contexto, finalizar_contexto, cabeceras_debug
+
+# Peticiones más lentas que este umbral se muestran en consola
+UMBRAL_PETICION_LENTA = 1.0
+
+# Etiqueta para peticiones que no coinciden con ninguna ruta (evita una serie por URL)
+RUTA_SIN_COINCIDENCIA = "sin_ruta"
+
+# Plantilla completa (con el prefijo de include_router) de cada ruta, por aplicación
+_plantillas_por_app = weakref.WeakKeyDictionary()
+
+def _plantillas(app) -> dict:
+    try:
+        from fastapi.routing import iter_route_contexts
+    except ImportError:
+        # Versiones que copian cada ruta con su prefijo: route.path ya es completa
+        return {id(ruta): ruta.path for ruta in app.routes if hasattr(ruta, "path")}
+    # Versiones que incluyen los routers sin copiarlos: route.path no trae el prefijo
+    return {id(contexto.original_route): contexto.path for contexto in iter_route_contexts(app.routes)}
+
+def plantilla_ruta(scope: Scope) -> str:
+    """Obtener la plantilla de la ruta atendida (p. ej. /api/ventas/{venta_id})"""
+    ruta = scope.get("route")
+    if ruta is None:
+        return RUTA_SIN_COINCIDENCIA
+    app = scope.get("app")
+    plantillas = _plantillas_por_app.get(app) if app is not None else None
+    if plantillas is None and app is not None:
+        plantillas = _plantillas_por_app[app] = _plantillas(app)
+    return (plantillas or {}).get(id(ruta)) or getattr(ruta, "path", RUTA_SIN_COINCIDENCIA)
+
+class MiddlewareMedicion:
+    """
+    Middleware ASGI puro que mide cada petición HTTP: duración por plantilla
+    de ruta y código de estado, tamaño de petición y respuesta, consultas a la
+    base de datos, y agrega la cabecera Server-Timing con el tiempo hasta el
+    inicio de la respuesta.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        contexto, token = iniciar_contexto(f"{scope['method']} {scope['path']}")
+        estado = 500
+        bytes_enviados = 0
+
+        async def enviar(mensaje: Message) -> None:
+            nonlocal estado, bytes_enviados
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                duracion_ms = (time.perf_counter() - inicio) * 1000
+                cabeceras = list(mensaje.get("headers", ()))
+                cabeceras.append((b"server-timing", f"app;dur={duracion_ms:.1f}".encode()))
+                if MODO_DEBUG:
+                    cabeceras.extend(cabeceras_debug(contexto))
+                mensaje["headers"] = cabeceras
+            elif mensaje["type"] == "http.response.body":
+                bytes_enviados += len(mensaje.get("body", b""))
+            elif mensaje["type"] == "http.response.zerocopysend":
+                bytes_enviados += mensaje.get("count") or 0
+            await send(mensaje)
+
+        # Pico de memoria solo para peticiones muestreadas mientras tracemalloc está activo
+        medir_memoria = diagnostico_memoria.muestreo_activo and diagnostico_memoria.iniciar_peticion()
+        peticiones_en_curso.inc()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            peticiones_en_curso.dec()
+            metodo = scope["method"]
+            ruta = plantilla_ruta(scope)
+            contexto.ruta = f"{metodo} {ruta}"
+            if medir_memoria:
+                diagnostico_memoria.finalizar_peticion(contexto.ruta)
+            finalizar_contexto(contexto, token)
+            if contexto.consultas:
+                consultas_por_peticion.etiquetar(ruta).observar(contexto.consultas)
+            sospechosas = contexto.posibles_n_mas_1()
+            if sospechosas:
+                posibles_n_mas_1.etiquetar(ruta).inc()
+                if MODO_DEBUG:
+                    for sql, veces in sospechosas.items():
+                        print(f"🔁 Posible N+1 en {contexto.ruta}: {veces} veces {sql}")
+            duracion_http.etiquetar(metodo, ruta, str(estado)).observar(duracion)
+            tamaño_respuesta_http.etiquetar(metodo, ruta).observar(bytes_enviados)
+            longitud = _longitud_peticion(scope)
+            if longitud is not None:
+                tamaño_peticion_http.etiquetar(metodo, ruta).observar(longitud)
+            if duracion >= UMBRAL_PETICION_LENTA:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                print(f"🔴 [{timestamp}] {metodo} {ruta} -> {estado} en {duracion:.3f}s")
+
+def _longitud_peticion(scope: Scope):
+    """Leer Content-Length de la petición sin consumir el cuerpo"""
+    for nombre, valor in scope.get("headers", ()):
+        if nombre == b"content-length":
+            try:
+                return int(valor)
+            except ValueError:
+                return None
+    return None
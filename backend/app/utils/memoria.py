@@ -0,0 +1,166 @@
+"""
+Diagnóstico de memoria con tracemalloc
+Sistema de Gestión Papelería Dohko
+"""
+
+import random
+import threading
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+
+# Instantáneas guardadas como máximo (cada una puede ocupar varios MB)
+MAX_INSTANTANEAS = 5
+
+AGRUPACIONES = ("lineno", "filename", "traceback")
+
+def _filtrar(instantanea):
+    """Quitar del análisis las asignaciones del propio tracemalloc y del importador"""
+    return instantanea.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+def _describir_traza(traza) -> str:
+    # La traza va del marco más antiguo al más reciente
+    marco = traza[-1] if len(traza) else None
+    return f"{marco.filename}:{marco.lineno}" if marco else "<desconocido>"
+
+class DiagnosticoMemoria:
+    """
+    Controla tracemalloc: inicio y fin del rastreo, instantáneas con nombre,
+    comparación entre ellas y pico de memoria de peticiones muestreadas.
+    Mientras no está activo el middleware solo consulta un atributo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._instantaneas = OrderedDict()
+        self.tasa_muestreo = 0.0
+        self.muestreo_activo = False
+        # Solo se mide una petición a la vez: el pico de tracemalloc es global
+        self._lock_peticion = threading.Lock()
+        self._picos = {}
+
+    def iniciar(self, marcos: int = 1, tasa_muestreo: float = 0.0):
+        """Comenzar a rastrear asignaciones (marcos = profundidad de la pila guardada)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(marcos)
+            with self._lock:
+                self._picos.clear()
+        self.tasa_muestreo = min(max(tasa_muestreo, 0.0), 1.0)
+        self.muestreo_activo = self.tasa_muestreo > 0
+        return self.estado()
+
+    def detener(self):
+        """Detener el rastreo y liberar las instantáneas guardadas"""
+        self.muestreo_activo = False
+        tracemalloc.stop()
+        with self._lock:
+            self._instantaneas.clear()
+        return self.estado()
+
+    def tomar_instantanea(self, nombre: str = None) -> dict:
+        if not tracemalloc.is_tracing():
+            raise ValueError("tracemalloc no está activo")
+        nombre = nombre or datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        instantanea = _filtrar(tracemalloc.take_snapshot())
+        with self._lock:
+            self._instantaneas[nombre] = (datetime.now(), instantanea)
+            self._instantaneas.move_to_end(nombre)
+            while len(self._instantaneas) > MAX_INSTANTANEAS:
+                self._instantaneas.popitem(last=False)
+        return {"nombre": nombre, "bytes": sum(t.size for t in instantanea.traces)}
+
+    def _obtener(self, nombre: str):
+        with self._lock:
+            if nombre not in self._instantaneas:
+                raise KeyError(f"No existe la instantánea '{nombre}'")
+            return self._instantaneas[nombre][1]
+
+    def estadisticas(self, nombre: str, agrupar: str = "lineno", limite: int = 25) -> list:
+        """Mayores consumidores de una instantánea agrupados por archivo o línea"""
+        if agrupar not in AGRUPACIONES:
+            raise ValueError(f"Agrupación inválida. Use una de: {', '.join(AGRUPACIONES)}")
+        return [
+            {"ubicacion": _describir_traza(e.traceback) if agrupar != "filename" else e.traceback[0].filename,
+             "bytes": e.size, "bloques": e.count,
+             "pila": [str(m) for m in e.traceback] if agrupar == "traceback" else None}
+            for e in self._obtener(nombre).statistics(agrupar)[:limite]
+        ]
+
+    def comparar(self, anterior: str, posterior: str, agrupar: str = "lineno", limite: int = 25) -> list:
+        """Diferencia entre dos instantáneas: dónde creció (o bajó) la memoria"""
+        if agrupar not in AGRUPACIONES:
+            raise ValueError(f"Agrupación inválida. Use una de: {', '.join(AGRUPACIONES)}")
+        diferencias = self._obtener(posterior).compare_to(self._obtener(anterior), agrupar)
+        return [
+            {"ubicacion": _describir_traza(d.traceback) if agrupar != "filename" else d.traceback[0].filename,
+             "bytes": d.size, "diferencia_bytes": d.size_diff,
+             "bloques": d.count, "diferencia_bloques": d.count_diff}
+            for d in diferencias[:limite]
+        ]
+
+    def iniciar_peticion(self) -> bool:
+        """
+        Decidir si se mide esta petición. Devuelve True si quedó seleccionada;
+        en ese caso hay que llamar a finalizar_peticion al terminar.
+        """
+        if random.random() >= self.tasa_muestreo or not tracemalloc.is_tracing():
+            return False
+        if not self._lock_peticion.acquire(blocking=False):
+            return False
+        tracemalloc.reset_peak()
+        self._base_peticion = tracemalloc.get_traced_memory()[0]
+        return True
+
+    def finalizar_peticion(self, ruta: str):
+        try:
+            actual, pico = tracemalloc.get_traced_memory()
+            pico_peticion = max(pico - self._base_peticion, 0)
+            retenido = actual - self._base_peticion
+        finally:
+            self._lock_peticion.release()
+        with self._lock:
+            registro = self._picos.setdefault(ruta, {"muestras": 0, "pico_maximo_bytes": 0, "pico_total_bytes": 0,
+                                                     "retenido_total_bytes": 0})
+            registro["muestras"] += 1
+            registro["pico_total_bytes"] += pico_peticion
+            registro["retenido_total_bytes"] += retenido
+            registro["pico_maximo_bytes"] = max(registro["pico_maximo_bytes"], pico_peticion)
+
+    def picos_por_ruta(self) -> list:
+        """Pico de memoria de las peticiones muestreadas, de mayor a menor"""
+        with self._lock:
+            filas = [
+                {
+                    "ruta": ruta,
+                    "muestras": r["muestras"],
+                    "pico_maximo_bytes": r["pico_maximo_bytes"],
+                    "pico_promedio_bytes": r["pico_total_bytes"] // r["muestras"],
+                    "retenido_promedio_bytes": r["retenido_total_bytes"] // r["muestras"],
+                }
+                for ruta, r in self._picos.items()
+            ]
+        return sorted(filas, key=lambda f: f["pico_maximo_bytes"], reverse=True)
+
+    def estado(self) -> dict:
+        actual, pico = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._lock:
+            instantaneas = [
+                {"nombre": nombre, "fecha": fecha.strftime("%Y-%m-%d %H:%M:%S")}
+                for nombre, (fecha, _) in self._instantaneas.items()
+            ]
+        return {
+            "activo": tracemalloc.is_tracing(),
+            "marcos": tracemalloc.get_traceback_limit(),
+            "memoria_rastreada_bytes": actual,
+            "pico_bytes": pico,
+            "tasa_muestreo": self.tasa_muestreo,
+            "instantaneas": instantaneas,
+        }
+
+# Instancia global del diagnóstico de memoria
+diagnostico_memoria = DiagnosticoMemoria()
@@ -0,0 +1,272 @@
+"""
+Registro de métricas con exposición en formato Prometheus
+Sistema de Gestión Papelería Dohko
+"""
+
+import math
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Sequence, Tuple
+
+# Límites en segundos pensados para latencias HTTP y de base de datos
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Límites en bytes para tamaños de petición y respuesta
+BUCKETS_TAMAÑO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _formatear_valor(valor: float) -> str:
+    if valor == math.inf:
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _etiquetas_texto(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+class _ValorContador:
+    __slots__ = ("valor", "_lock")
+
+    def __init__(self):
+        self.valor = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad: float = 1):
+        with self._lock:
+            self.valor += cantidad
+
+class _ValorMedidor(_ValorContador):
+    __slots__ = ()
+
+    def dec(self, cantidad: float = 1):
+        with self._lock:
+            self.valor -= cantidad
+
+    def set(self, valor: float):
+        self.valor = valor
+
+class _ValorHistograma:
+    __slots__ = ("limites", "cubetas", "suma", "_lock")
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float):
+        indice = bisect_left(self.limites, valor)
+        with self._lock:
+            self.cubetas[indice] += 1
+            self.suma += valor
+
+class _Metrica(ABC):
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._hijos: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.etiquetas:
+            self._sin_etiquetas = self._crear_hijo()
+
+    @abstractmethod
+    def _crear_hijo(self):
+        """Crear la serie de una combinación de etiquetas"""
+
+    def etiquetar(self, *valores):
+        """Obtener (y cachear) la serie correspondiente a los valores de etiqueta"""
+        hijo = self._hijos.get(valores)
+        if hijo is None:
+            if len(valores) != len(self.etiquetas):
+                raise ValueError(f"{self.nombre} espera etiquetas {self.etiquetas}")
+            with self._lock:
+                hijo = self._hijos.setdefault(valores, self._crear_hijo())
+        return hijo
+
+    def _series(self):
+        if not self.etiquetas:
+            return [((), self._sin_etiquetas)]
+        return list(self._hijos.items())
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for valores, serie in self._series():
+            lineas.append(f"{self.nombre}{_etiquetas_texto(self.etiquetas, valores)} {_formatear_valor(serie.valor)}")
+        return lineas
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def _crear_hijo(self):
+        return _ValorContador()
+
+    def inc(self, cantidad: float = 1):
+        self._sin_etiquetas.inc(cantidad)
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._funcion = None
+
+    def _crear_hijo(self):
+        return _ValorMedidor()
+
+    def inc(self, cantidad: float = 1):
+        self._sin_etiquetas.inc(cantidad)
+
+    def dec(self, cantidad: float = 1):
+        self._sin_etiquetas.dec(cantidad)
+
+    def set(self, valor: float):
+        self._sin_etiquetas.set(valor)
+
+    def set_funcion(self, funcion: Callable[[], float]):
+        """Calcular el valor al momento de exponer (p. ej. profundidad de una cola)"""
+        self._funcion = funcion
+
+    def exponer(self) -> list:
+        if self._funcion is not None:
+            try:
+                self._sin_etiquetas.set(self._funcion())
+            except Exception:
+                pass
+        return super().exponer()
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(nombre, ayuda, etiquetas)
+
+    def _crear_hijo(self):
+        return _ValorHistograma(self.buckets)
+
+    def observar(self, valor: float):
+        self._sin_etiquetas.observar(valor)
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for valores, serie in self._series():
+            with serie._lock:
+                cubetas = list(serie.cubetas)
+                suma = serie.suma
+            acumulado = 0
+            for limite, cantidad in zip(self.buckets + (math.inf,), cubetas):
+                acumulado += cantidad
+                etiquetas = _etiquetas_texto(self.etiquetas, valores, f'le="{_formatear_valor(limite)}"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            etiquetas = _etiquetas_texto(self.etiquetas, valores)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_formatear_valor(suma)}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {acumulado}")
+        return lineas
+
+class RegistroMetricas:
+    """Colección de métricas del proceso"""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: _Metrica):
+        with self._lock:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nombre] = metrica
+            return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Medidor:
+        return self._registrar(Medidor(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exponer(self) -> str:
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+TIPO_CONTENIDO_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+# Registro global del proceso
+registro_metricas = RegistroMetricas()
+
+# Métricas HTTP registradas por el middleware de medición
+duracion_http = registro_metricas.histograma(
+    "dohko_http_peticion_duracion_segundos", "Duración de las peticiones HTTP por ruta",
+    ("metodo", "ruta", "estado"))
+tamaño_respuesta_http = registro_metricas.histograma(
+    "dohko_http_respuesta_bytes", "Tamaño del cuerpo de las respuestas HTTP por ruta",
+    ("metodo", "ruta"), buckets=BUCKETS_TAMAÑO)
+tamaño_peticion_http = registro_metricas.histograma(
+    "dohko_http_peticion_bytes", "Tamaño declarado del cuerpo de las peticiones HTTP por ruta",
+    ("metodo", "ruta"), buckets=BUCKETS_TAMAÑO)
+peticiones_en_curso = registro_metricas.medidor(
+    "dohko_http_peticiones_en_curso", "Peticiones HTTP atendiéndose en este momento")
+consultas_por_peticion = registro_metricas.histograma(
+    "dohko_http_consultas_db", "Consultas a la base de datos por petición HTTP",
+    ("ruta",), buckets=(1, 2, 3, 5, 10, 20, 50, 100, 250, 1000))
+posibles_n_mas_1 = registro_metricas.contador(
+    "dohko_http_posibles_n_mas_1_total", "Peticiones con sentencias repetidas (probable N+1)", ("ruta",))
+
+# Métricas de negocio
+ventas_registradas = registro_metricas.contador(
+    "dohko_ventas_registradas_total", "Ventas registradas correctamente")
+lineas_venta = registro_metricas.contador(
+    "dohko_venta_lineas_total", "Líneas de producto incluidas en ventas registradas")
+
+# Lecturas pesadas agrupadas por app.utils.single_flight
+lecturas_agrupadas = registro_metricas.contador(
+    "dohko_lecturas_agrupadas_total",
+    "Lecturas pesadas según cómo se resolvieron: ejecutada, compartida (esperó a otra idéntica en curso) o cache",
+    ("ruta", "resultado"))
+
+# Cola de tareas en segundo plano (app.services.tareas_service)
+tareas_pendientes = registro_metricas.medidor(
+    "dohko_tareas_pendientes", "Tareas en la cola esperando ser procesadas")
+tareas_procesadas = registro_metricas.contador(
+    "dohko_tareas_procesadas_total", "Tareas procesadas por tipo y resultado (completada, reintento, fallida)",
+    ("tipo", "resultado"))
+duracion_tarea = registro_metricas.histograma(
+    "dohko_tarea_duracion_segundos", "Duración de la ejecución de cada tarea", ("tipo",))
+
+# Eventos de cambios enviados por SSE (app.utils.eventos)
+eventos_publicados = registro_metricas.contador(
+    "dohko_eventos_publicados_total", "Eventos de cambios publicados por tipo", ("tipo",))
+eventos_descartados = registro_metricas.contador(
+    "dohko_eventos_conexiones_desbordadas_total",
+    "Conexiones de eventos cerradas por no consumir a tiempo (el cliente reanuda con Last-Event-ID)")
+suscriptores_eventos = registro_metricas.medidor(
+    "dohko_eventos_suscriptores", "Conexiones abiertas al stream de eventos")
+
+# Métricas de base de datos
+conexiones_db_abiertas = registro_metricas.medidor(
+    "dohko_db_conexiones_abiertas", "Conexiones SQLite abiertas en este momento")
+duracion_db = registro_metricas.histograma(
+    "dohko_db_operacion_duracion_segundos", "Duración de las operaciones de base de datos", ("operacion",))
+
+# Métricas del pool de hilos de FastAPI (endpoints síncronos)
+hilos_en_uso = registro_metricas.medidor(
+    "dohko_hilos_en_uso", "Hilos del pool de trabajo ocupados")
+hilos_en_espera = registro_metricas.medidor(
+    "dohko_hilos_cola_espera", "Tareas esperando un hilo libre del pool de trabajo")
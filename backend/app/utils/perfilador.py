@@ -0,0 +1,129 @@
+"""
+Perfilador por muestreo de pilas bajo demanda
+Sistema de Gestión Papelería Dohko
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+
+# Archivos donde un hilo solo está esperando trabajo (selector, colas, locks)
+ARCHIVOS_INACTIVOS = ("selectors.py", "threading.py", "queue.py")
+
+# Límites para que una petición no deje el muestreo corriendo indefinidamente
+MAX_SEGUNDOS = 120
+MIN_INTERVALO_MS = 1
+
+def _nombre_marco(marco) -> str:
+    codigo = marco.f_code
+    return f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{codigo.co_firstlineno}"
+
+class SesionPerfilado:
+    """Una sesión de muestreo: su hilo y el resultado que produjo (None si falló)"""
+
+    def __init__(self):
+        self.hilo = None
+        self.resultado = None
+
+    def terminada(self) -> bool:
+        return not self.hilo.is_alive()
+
+class PerfiladorMuestreo:
+    """
+    Muestrea con un hilo temporizador las pilas de todos los hilos del proceso
+    (sys._current_frames). No instala hooks de trazado: cuando no hay una
+    sesión activa no existe ningún costo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.en_ejecucion = False
+        self.ultimo_resultado = None
+
+    def iniciar(self, segundos: float, intervalo_ms: float = 5, incluir_inactivos: bool = False):
+        """Comenzar una sesión de muestreo; devuelve la SesionPerfilado, o None si ya hay una en curso"""
+        if not self._lock.acquire(blocking=False):
+            return None
+        segundos = min(max(segundos, 0.1), MAX_SEGUNDOS)
+        intervalo = max(intervalo_ms, MIN_INTERVALO_MS) / 1000
+        self.en_ejecucion = True
+        sesion = SesionPerfilado()
+        sesion.hilo = threading.Thread(
+            target=self._muestrear, args=(sesion, segundos, intervalo, incluir_inactivos),
+            name="perfilador-muestreo", daemon=True
+        )
+        sesion.hilo.start()
+        return sesion
+
+    def _muestrear(self, sesion: SesionPerfilado, segundos: float, intervalo: float, incluir_inactivos: bool):
+        pilas = Counter()
+        muestras = 0
+        propio = threading.get_ident()
+        inicio = time.perf_counter()
+        fin = inicio + segundos
+        try:
+            while True:
+                ahora = time.perf_counter()
+                if ahora >= fin:
+                    break
+                nombres_hilos = {h.ident: h.name for h in threading.enumerate()}
+                for ident, marco in sys._current_frames().items():
+                    if ident == propio:
+                        continue
+                    if not incluir_inactivos and os.path.basename(marco.f_code.co_filename) in ARCHIVOS_INACTIVOS:
+                        continue
+                    pila = []
+                    while marco is not None:
+                        pila.append(_nombre_marco(marco))
+                        marco = marco.f_back
+                    pila.append(nombres_hilos.get(ident, f"hilo-{ident}"))
+                    pilas[";".join(reversed(pila))] += 1
+                muestras += 1
+                # Mantener la cadencia descontando lo que tomó la muestra
+                time.sleep(max(0.0, intervalo - (time.perf_counter() - ahora)))
+            sesion.resultado = {
+                "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "duracion_segundos": round(time.perf_counter() - inicio, 3),
+                "intervalo_ms": intervalo * 1000,
+                "muestras": muestras,
+                "pilas": pilas,
+            }
+            self.ultimo_resultado = sesion.resultado
+        finally:
+            self.en_ejecucion = False
+            self._lock.release()
+
+    @staticmethod
+    def pilas_colapsadas(resultado: dict) -> str:
+        """Formato 'marco;marco;marco cantidad' (entrada de flamegraph.pl / speedscope)"""
+        return "\n".join(f"{pila} {cantidad}" for pila, cantidad in resultado["pilas"].most_common()) + "\n"
+
+    @staticmethod
+    def funciones_principales(resultado: dict, limite: int = 30) -> list:
+        """Tabla de funciones por muestras propias (en la cima) y acumuladas (en la pila)"""
+        propias = Counter()
+        acumuladas = Counter()
+        for pila, cantidad in resultado["pilas"].items():
+            marcos = pila.split(";")[1:]
+            if not marcos:
+                continue
+            propias[marcos[-1]] += cantidad
+            for marco in set(marcos):
+                acumuladas[marco] += cantidad
+        total = sum(resultado["pilas"].values()) or 1
+        return [
+            {
+                "funcion": funcion,
+                "propias": propias[funcion],
+                "acumuladas": cantidad,
+                "porcentaje_propio": round(propias[funcion] * 100 / total, 2),
+                "porcentaje_acumulado": round(cantidad * 100 / total, 2),
+            }
+            for funcion, cantidad in sorted(acumuladas.items(), key=lambda x: (propias[x[0]], x[1]), reverse=True)[:limite]
+        ]
+
+# Instancia global del perfilador
+perfilador = PerfiladorMuestreo()
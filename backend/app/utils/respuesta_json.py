@@ -0,0 +1,58 @@
+"""
+Respuestas JSON rápidas para listados grandes
+Sistema de Gestión Papelería Dohko
+
+Los listados arman el JSON directamente desde las filas de SQLite, sin crear
+un objeto del modelo ni un esquema Pydantic por fila: la consulta ya devuelve
+las columnas con los tipos del esquema de respuesta. Los endpoints conservan
+su response_model para la documentación OpenAPI; como devuelven una Response,
+FastAPI no vuelve a validar ni serializar el resultado.
+
+El codificador es intercambiable: orjson si está instalado, o json de la
+biblioteca estándar (DOHKO_JSON_CODIFICADOR=json lo fuerza).
+"""
+
+import json
+import os
+from typing import Callable, Iterable, Sequence
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _codificar_estandar(datos) -> bytes:
+    # Mismo formato que JSONResponse de Starlette
+    return json.dumps(datos, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+CODIFICADORES = {"json": _codificar_estandar}
+if orjson is not None:
+    CODIFICADORES["orjson"] = orjson.dumps
+
+_codificador = CODIFICADORES.get(os.environ.get("DOHKO_JSON_CODIFICADOR", "orjson"), _codificar_estandar)
+
+def usar_codificador(nombre: str) -> Callable:
+    """Elegir el codificador por nombre (devuelve el anterior)"""
+    global _codificador
+    if nombre not in CODIFICADORES:
+        raise ValueError(f"Codificador no disponible: {nombre}. Opciones: {', '.join(CODIFICADORES)}")
+    anterior, _codificador = _codificador, CODIFICADORES[nombre]
+    return anterior
+
+def codificador_actual() -> str:
+    return next(nombre for nombre, funcion in CODIFICADORES.items() if funcion is _codificador)
+
+def codificar_json(datos) -> bytes:
+    return _codificador(datos)
+
+def filas_a_json(columnas: Sequence[str], filas: Iterable[tuple]) -> bytes:
+    """Arreglo JSON de objetos a partir de filas cuyas columnas ya tienen los nombres y tipos de la respuesta"""
+    return _codificador([dict(zip(columnas, fila)) for fila in filas])
+
+class RespuestaJSON(Response):
+    """Respuesta JSON con el codificador configurado; acepta bytes ya codificados"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return content if isinstance(content, bytes) else _codificador(content)
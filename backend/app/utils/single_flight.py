@@ -0,0 +1,115 @@
+"""
+Agrupación de lecturas idénticas concurrentes (single-flight)
+Sistema de Gestión Papelería Dohko
+
+Cuando varias peticiones iguales llegan a la vez (p. ej. el panel abierto en
+varias cajas), solo la primera consulta la base; las demás esperan y reciben
+el mismo resultado. La clave incluye la versión de los datos
+(PRAGMA data_version), así que ninguna petición recibe un resultado calculado
+antes de un cambio confirmado. Opcionalmente el resultado se conserva unos
+segundos (DOHKO_CACHE_LECTURAS_TTL, 0 = desactivado).
+"""
+
+import functools
+import os
+import threading
+import time
+from app.database import db
+from app.utils.metrics import lecturas_agrupadas
+
+TTL_DEFECTO = float(os.environ.get("DOHKO_CACHE_LECTURAS_TTL", "0"))
+MAX_ENTRADAS_CACHE = 256
+
+class _Llamada:
+    __slots__ = ("terminada", "resultado", "error", "esperando")
+
+    def __init__(self):
+        self.terminada = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.esperando = 0
+
+class GrupoLecturas:
+    """Llamadas en curso y resultados recientes, indexados por clave"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_curso = {}
+        self._cache = {}
+
+    def ejecutar(self, clave, funcion, ttl: float = 0, ruta: str = ""):
+        """Ejecutar funcion() una sola vez por clave entre las llamadas concurrentes"""
+        with self._lock:
+            if ttl > 0:
+                guardado = self._cache.get(clave)
+                if guardado and guardado[0] > time.monotonic():
+                    lecturas_agrupadas.etiquetar(ruta, "cache").inc()
+                    return guardado[1]
+            llamada = self._en_curso.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = self._en_curso[clave] = _Llamada()
+            else:
+                llamada.esperando += 1
+
+        if not lider:
+            lecturas_agrupadas.etiquetar(ruta, "compartida").inc()
+            llamada.terminada.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        lecturas_agrupadas.etiquetar(ruta, "ejecutada").inc()
+        try:
+            llamada.resultado = funcion()
+            return llamada.resultado
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+                if ttl > 0 and llamada.error is None:
+                    self._guardar_en_cache(clave, llamada.resultado, ttl)
+            llamada.terminada.set()
+
+    def _guardar_en_cache(self, clave, resultado, ttl: float):
+        ahora = time.monotonic()
+        if len(self._cache) >= MAX_ENTRADAS_CACHE:
+            for vieja in [c for c, (expira, _) in self._cache.items() if expira <= ahora]:
+                del self._cache[vieja]
+            if len(self._cache) >= MAX_ENTRADAS_CACHE:
+                self._cache.pop(next(iter(self._cache)))
+        self._cache[clave] = (ahora + ttl, resultado)
+
+    def limpiar(self):
+        with self._lock:
+            self._cache.clear()
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "en_curso": len(self._en_curso),
+                "esperando": sum(llamada.esperando for llamada in self._en_curso.values()),
+                "en_cache": len(self._cache),
+            }
+
+grupo_lecturas = GrupoLecturas()
+
+def lectura_agrupada(ttl: float = None):
+    """
+    Decorador para endpoints síncronos de solo lectura (o funciones que arman
+    su respuesta). La clave es la función, sus parámetros y la versión de los
+    datos. El resultado se comparte entre peticiones: no debe modificarse después.
+    """
+    def decorador(funcion):
+        nombre = funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            duracion = TTL_DEFECTO if ttl is None else ttl
+            clave = (funcion.__module__, nombre, repr(args), repr(sorted(kwargs.items())),
+                     db.db_path, db.version_datos())
+            return grupo_lecturas.ejecutar(clave, lambda: funcion(*args, **kwargs), duracion, nombre)
+        return envoltura
+    return decorador
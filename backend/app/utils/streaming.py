@@ -0,0 +1,203 @@
+"""
+Respuestas de descarga por streaming
+Sistema de Gestión Papelería Dohko
+"""
+
+import os
+import tarfile
+from email.utils import formatdate
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+TAMAÑO_BLOQUE = 256 * 1024
+BLOQUE_TAR = tarfile.BLOCKSIZE
+
+def _disposicion(nombre: str) -> str:
+    return f"attachment; filename*=utf-8''{quote(nombre)}"
+
+def _parsear_rango(cabecera: str, tamaño: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpretar 'Range: bytes=inicio-fin'. Devuelve (inicio, fin) inclusivos,
+    None si no aplica, o lanza ValueError si no se puede satisfacer.
+    Solo se atiende un rango; con varios se envía el archivo completo.
+    """
+    if not cabecera or not cabecera.startswith("bytes=") or "," in cabecera:
+        return None
+    inicio_str, _, fin_str = cabecera[len("bytes="):].strip().partition("-")
+    try:
+        if inicio_str == "":
+            sufijo = int(fin_str)
+        else:
+            inicio = int(inicio_str)
+            fin = int(fin_str) if fin_str else tamaño - 1
+    except ValueError:
+        return None
+    if inicio_str == "":
+        if sufijo < 0:
+            return None
+        # Sufijo: los últimos N bytes; en un archivo vacío no hay ninguno
+        if sufijo <= 0 or tamaño == 0:
+            raise ValueError("Rango vacío")
+        return max(0, tamaño - sufijo), tamaño - 1
+    if fin_str and fin < inicio:
+        # Sintácticamente inválido: se ignora y se envía el archivo completo
+        return None
+    if inicio >= tamaño:
+        raise ValueError("Rango fuera del archivo")
+    return inicio, min(fin, tamaño - 1)
+
+class RespuestaArchivoRango(Response):
+    """
+    Envía un archivo por bloques sin cargarlo en memoria.
+    Atiende peticiones Range (206/416) e If-Range, y si el servidor ASGI
+    ofrece la extensión 'http.response.zerocopysend' delega en sendfile.
+    """
+
+    def __init__(self, ruta: str, nombre_descarga: str, cabeceras_peticion, media_type: str = "application/octet-stream"):
+        self.ruta = ruta
+        self.nombre_descarga = nombre_descarga
+        self.cabeceras_peticion = cabeceras_peticion
+        self.media_type = media_type
+        self.background = None
+        super().__init__(status_code=200, media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        estado = await anyio.to_thread.run_sync(os.stat, self.ruta)
+        tamaño = estado.st_size
+        etag = f'"{int(estado.st_mtime)}-{tamaño}"'
+        cabeceras = {
+            "accept-ranges": "bytes",
+            "content-disposition": _disposicion(self.nombre_descarga),
+            "content-type": self.media_type,
+            "etag": etag,
+            "last-modified": formatdate(estado.st_mtime, usegmt=True),
+        }
+
+        rango = None
+        cabecera_rango = self.cabeceras_peticion.get("range")
+        if_range = self.cabeceras_peticion.get("if-range")
+        if cabecera_rango and (not if_range or if_range == etag):
+            try:
+                rango = _parsear_rango(cabecera_rango, tamaño)
+            except ValueError:
+                cabeceras["content-range"] = f"bytes */{tamaño}"
+                await self._enviar_cabeceras(send, 416, {**cabeceras, "content-length": "0"})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if rango:
+            inicio, fin = rango
+            codigo = 206
+            cabeceras["content-range"] = f"bytes {inicio}-{fin}/{tamaño}"
+        else:
+            inicio, fin = 0, tamaño - 1
+            codigo = 200
+        longitud = fin - inicio + 1
+        cabeceras["content-length"] = str(longitud)
+
+        await self._enviar_cabeceras(send, codigo, cabeceras)
+        if scope.get("method") == "HEAD" or longitud <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        extensiones = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensiones:
+            archivo = await anyio.to_thread.run_sync(open, self.ruta, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": archivo.fileno(),
+                    "offset": inicio,
+                    "count": longitud,
+                })
+            finally:
+                await anyio.to_thread.run_sync(archivo.close)
+            return
+
+        async with await anyio.open_file(self.ruta, "rb") as archivo:
+            await archivo.seek(inicio)
+            restante = longitud
+            while restante > 0:
+                bloque = await archivo.read(min(TAMAÑO_BLOQUE, restante))
+                if not bloque:
+                    break
+                restante -= len(bloque)
+                await send({"type": "http.response.body", "body": bloque, "more_body": restante > 0})
+        if restante > 0:
+            # El archivo se truncó mientras se enviaba
+            await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _enviar_cabeceras(send: Send, codigo: int, cabeceras: dict):
+        await send({
+            "type": "http.response.start",
+            "status": codigo,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in cabeceras.items()],
+        })
+
+class RespuestaTarStreaming(Response):
+    """
+    Empaqueta varios archivos en un .tar generado al vuelo: cabecera,
+    contenido por bloques y relleno de cada miembro, sin archivo temporal.
+    """
+
+    def __init__(self, archivos: List[Tuple[str, str]], nombre_descarga: str):
+        # archivos: lista de (ruta_en_disco, nombre_en_el_tar)
+        self.archivos = archivos
+        self.nombre_descarga = nombre_descarga
+        self.background = None
+        super().__init__(status_code=200, media_type="application/x-tar")
+
+    @staticmethod
+    def _cabecera(ruta: str, nombre: str) -> Tuple[bytes, int]:
+        estado = os.stat(ruta)
+        info = tarfile.TarInfo(name=nombre)
+        info.size = estado.st_size
+        info.mtime = int(estado.st_mtime)
+        info.mode = 0o644
+        return info.tobuf(format=tarfile.PAX_FORMAT), estado.st_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        miembros = []
+        for ruta, nombre in self.archivos:
+            cabecera, tamaño = await anyio.to_thread.run_sync(self._cabecera, ruta, nombre)
+            miembros.append((ruta, cabecera, tamaño))
+
+        longitud_total = sum(
+            len(cabecera) + tamaño + (-tamaño % BLOQUE_TAR) for _, cabecera, tamaño in miembros
+        ) + 2 * BLOQUE_TAR
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/x-tar"),
+                (b"content-length", str(longitud_total).encode()),
+                (b"content-disposition", _disposicion(self.nombre_descarga).encode("latin-1")),
+            ],
+        })
+        if scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        for ruta, cabecera, tamaño in miembros:
+            await send({"type": "http.response.body", "body": cabecera, "more_body": True})
+            restante = tamaño
+            async with await anyio.open_file(ruta, "rb") as archivo:
+                while restante > 0:
+                    bloque = await archivo.read(min(TAMAÑO_BLOQUE, restante))
+                    if not bloque:
+                        # Mantener el tamaño anunciado aunque el archivo se haya truncado
+                        bloque = b"\0" * restante
+                    restante -= len(bloque)
+                    await send({"type": "http.response.body", "body": bloque, "more_body": True})
+            relleno = -tamaño % BLOQUE_TAR
+            if relleno:
+                await send({"type": "http.response.body", "body": b"\0" * relleno, "more_body": True})
+
+        # Fin del archivo tar: dos bloques vacíos
+        await send({"type": "http.response.body", "body": b"\0" * (2 * BLOQUE_TAR), "more_body": False})
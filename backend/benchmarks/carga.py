@@ -0,0 +1,299 @@
+"""
+Benchmark de carga de la API
+Sistema de Gestión Papelería Dohko
+
+Levanta la aplicación en el mismo proceso (transporte ASGI de httpx) o con
+uvicorn en localhost, sobre un dataset sintético, y ejecuta mezclas
+realistas de operaciones con la concurrencia indicada. Informa rendimiento
+y percentiles de latencia, guarda baselines JSON y termina con código 1
+si algún escenario empeora más allá del umbral.
+
+Uso (desde backend/):
+    python -m benchmarks.carga                         # todos los escenarios, modo asgi
+    python -m benchmarks.carga --escenario punto_de_venta --concurrencia 16
+    python -m benchmarks.carga --modo uvicorn --duracion 30
+    python -m benchmarks.carga --guardar-baseline      # actualizar baselines/carga_<modo>.json
+
+Requiere httpx (requirements-dev.txt).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.comun import (
+    DIR_BACKEND, DIR_BASELINES, preparar_dataset, copia_de_trabajo, configurar_entorno,
+    resumir_latencias, descripcion_entorno, cargar_baseline, guardar_baseline
+)
+
+# Peso relativo de cada operación dentro de cada escenario
+ESCENARIOS = {
+    "punto_de_venta": {"registrar_venta": 30, "consultar_producto": 45, "disponibilidad": 15, "listar_productos": 10},
+    "consultas": {"consultar_producto": 50, "listar_productos": 20, "consultar_venta": 20, "alertas_stock_bajo": 10},
+    "compras": {"crear_orden": 20, "listar_ordenes": 10, "consultar_producto": 50, "listar_proveedores": 20},
+    "listados": {"listar_ventas": 10, "listar_productos": 50, "listar_ordenes": 20, "alertas_stock_bajo": 20},
+}
+
+# Tolerancia por defecto antes de considerar que un escenario empeoró
+UMBRAL_REGRESION = 0.15
+# Errores aceptados (respuestas no 2xx) antes de invalidar la corrida
+MAX_TASA_ERRORES = 0.01
+
+class DatosCarga:
+    """Identificadores del dataset usados para construir peticiones válidas"""
+
+    def __init__(self, ruta_db: str):
+        conn = sqlite3.connect(ruta_db)
+        try:
+            productos = conn.execute("SELECT id, precio, proveedor_id FROM producto ORDER BY id").fetchall()
+            self.venta_max = conn.execute("SELECT COALESCE(MAX(id), 1) FROM venta").fetchone()[0]
+            self.proveedores = [fila[0] for fila in conn.execute("SELECT id FROM proveedor")]
+        finally:
+            conn.close()
+        self.productos = [(pid, precio) for pid, precio, _ in productos]
+        self.productos_proveedor = defaultdict(list)
+        for pid, _, proveedor_id in productos:
+            if proveedor_id is not None:
+                self.productos_proveedor[proveedor_id].append(pid)
+        self.proveedores = [p for p in self.proveedores if self.productos_proveedor[p]] or self.proveedores
+        # Los más consultados son pocos: mismo sesgo que en las ventas generadas
+        self.pesos = [1.0 / (i + 1) ** 1.1 for i in range(len(self.productos))]
+
+    def producto_popular(self, rnd: random.Random):
+        return rnd.choices(self.productos, weights=self.pesos, k=1)[0]
+
+def construir_peticion(operacion: str, datos: DatosCarga, rnd: random.Random):
+    """Devolver (método, ruta, cuerpo json) para una operación"""
+    if operacion == "consultar_producto":
+        return "GET", f"/api/inventario/productos/{datos.producto_popular(rnd)[0]}", None
+    if operacion == "disponibilidad":
+        return "GET", f"/api/inventario/disponibilidad/{datos.producto_popular(rnd)[0]}", None
+    if operacion == "listar_productos":
+        return "GET", "/api/inventario/productos", None
+    if operacion == "alertas_stock_bajo":
+        return "GET", "/api/inventario/alertas/stock-bajo", None
+    if operacion == "consultar_venta":
+        return "GET", f"/api/ventas/{rnd.randint(1, datos.venta_max)}", None
+    if operacion == "listar_ventas":
+        return "GET", "/api/ventas/", None
+    if operacion == "registrar_venta":
+        lineas = {}
+        for _ in range(min(1 + int(rnd.expovariate(0.8)), 8)):
+            pid, precio = datos.producto_popular(rnd)
+            lineas[pid] = {"producto_id": pid, "cantidad": rnd.randint(1, 3), "precio_unitario": precio}
+        return "POST", "/api/ventas/", {"productos": list(lineas.values()), "tipo_pago": "efectivo"}
+    if operacion == "crear_orden":
+        proveedor_id = rnd.choice(datos.proveedores)
+        catalogo = datos.productos_proveedor[proveedor_id]
+        productos = [{"producto_id": pid, "cantidad": rnd.randrange(10, 110, 10)}
+                     for pid in rnd.sample(catalogo, min(len(catalogo), rnd.randint(1, 5)))]
+        return "POST", "/api/proveedores/ordenes", {"proveedor_id": proveedor_id, "productos": productos}
+    if operacion == "listar_ordenes":
+        return "GET", "/api/proveedores/ordenes", None
+    if operacion == "listar_proveedores":
+        return "GET", "/api/proveedores/", None
+    raise ValueError(f"Operación desconocida: {operacion}")
+
+async def _trabajador(cliente, escenario: dict, datos: DatosCarga, semilla: int, fin: float,
+                      limite: list, resultados: list):
+    rnd = random.Random(semilla)
+    operaciones = list(escenario)
+    pesos = list(escenario.values())
+    while time.perf_counter() < fin and (limite[0] is None or limite[0] > 0):
+        if limite[0] is not None:
+            limite[0] -= 1
+        operacion = rnd.choices(operaciones, weights=pesos, k=1)[0]
+        metodo, ruta, cuerpo = construir_peticion(operacion, datos, rnd)
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+            codigo = respuesta.status_code
+        except Exception:
+            codigo = 0
+        resultados.append((operacion, time.perf_counter() - inicio, codigo))
+
+async def ejecutar_escenario(cliente, nombre: str, datos: DatosCarga, concurrencia: int, duracion: float,
+                             peticiones: int = None, calentamiento: float = 2.0, semilla: int = 42) -> dict:
+    escenario = ESCENARIOS[nombre]
+
+    # Calentamiento: cachés de SQLite, compilación de rutas y del pool de hilos
+    if calentamiento > 0:
+        await asyncio.gather(*[
+            _trabajador(cliente, escenario, datos, semilla + 1000 + i, time.perf_counter() + calentamiento, [None], [])
+            for i in range(concurrencia)
+        ])
+
+    resultados = []
+    limite = [peticiones]
+    inicio = time.perf_counter()
+    fin = inicio + (duracion if peticiones is None else 10 ** 9)
+    await asyncio.gather(*[
+        _trabajador(cliente, escenario, datos, semilla + i, fin, limite, resultados)
+        for i in range(concurrencia)
+    ])
+    transcurrido = time.perf_counter() - inicio
+
+    por_operacion = defaultdict(list)
+    errores = defaultdict(int)
+    for operacion, latencia, codigo in resultados:
+        por_operacion[operacion].append(latencia)
+        if not 200 <= codigo < 300:
+            errores[operacion] += 1
+
+    total = len(resultados)
+    resumen = {
+        "peticiones": total,
+        "duracion_s": round(transcurrido, 3),
+        "rps": round(total / transcurrido, 2) if transcurrido else 0.0,
+        "errores": sum(errores.values()),
+        "concurrencia": concurrencia,
+        **resumir_latencias([latencia for _, latencia, _ in resultados]),
+        "operaciones": {
+            operacion: {**resumir_latencias(latencias), "errores": errores.get(operacion, 0)}
+            for operacion, latencias in sorted(por_operacion.items())
+        },
+    }
+    return resumen
+
+def comparar_con_baseline(actual: dict, baseline: dict, umbral: float) -> list:
+    """Lista de regresiones (escenario, métrica, antes, ahora)"""
+    regresiones = []
+    for nombre, resultado in actual.items():
+        anterior = (baseline or {}).get("escenarios", {}).get(nombre)
+        if not anterior:
+            continue
+        if resultado["rps"] < anterior["rps"] * (1 - umbral):
+            regresiones.append((nombre, "rps", anterior["rps"], resultado["rps"]))
+        for metrica in ("p50_ms", "p95_ms"):
+            # Holgura absoluta de 1 ms para no fallar por ruido en latencias muy bajas
+            if resultado[metrica] > anterior[metrica] * (1 + umbral) + 1.0:
+                regresiones.append((nombre, metrica, anterior[metrica], resultado[metrica]))
+    return regresiones
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def _esperar_servidor(httpx, url: str, proceso, timeout: float = 30):
+    limite = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as cliente:
+        while time.perf_counter() < limite:
+            if proceso.poll() is not None:
+                raise RuntimeError("uvicorn terminó antes de aceptar conexiones")
+            try:
+                if (await cliente.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn no respondió a tiempo")
+
+async def correr(args) -> dict:
+    import httpx
+
+    ruta_dataset = preparar_dataset(args.escala, args.semilla)
+    resultados = {}
+    nombres = list(ESCENARIOS) if args.escenario == "todos" else [args.escenario]
+
+    for nombre in nombres:
+        # Copia nueva por escenario: cada uno parte del mismo estado
+        ruta_trabajo = copia_de_trabajo(ruta_dataset, f"carga_{nombre}", stock_ilimitado=True)
+        datos = DatosCarga(ruta_trabajo)
+        limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+
+        if args.modo == "asgi":
+            configurar_entorno(ruta_trabajo)
+            from app.database import db
+            db.db_path = ruta_trabajo  # la conexión global ya pudo leerse en un escenario anterior
+            from main import app
+            transporte = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", limits=limites) as cliente:
+                resultados[nombre] = await ejecutar_escenario(
+                    cliente, nombre, datos, args.concurrencia, args.duracion, args.peticiones,
+                    args.calentamiento, args.semilla)
+        else:
+            puerto = _puerto_libre()
+            entorno = dict(os.environ, DOHKO_DB_PATH=ruta_trabajo, DOHKO_REPLICA_HABILITADA="0",
+                           DOHKO_RESPALDOS_DIR=os.path.join(os.path.dirname(ruta_trabajo), "respaldos"))
+            proceso = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto),
+                 "--log-level", "warning", "--no-access-log"],
+                cwd=DIR_BACKEND, env=entorno, stdout=subprocess.DEVNULL
+            )
+            try:
+                url = f"http://127.0.0.1:{puerto}"
+                await _esperar_servidor(httpx, url, proceso)
+                async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as cliente:
+                    resultados[nombre] = await ejecutar_escenario(
+                        cliente, nombre, datos, args.concurrencia, args.duracion, args.peticiones,
+                        args.calentamiento, args.semilla)
+            finally:
+                proceso.terminate()
+                proceso.wait(timeout=10)
+
+        r = resultados[nombre]
+        print(f"📊 {nombre:15s} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms  "
+              f"p99 {r['p99_ms']:>8.2f} ms  errores {r['errores']}/{r['peticiones']}")
+        for operacion, o in r["operaciones"].items():
+            print(f"     {operacion:20s} n={o['n']:<6d} p50 {o['p50_ms']:>8.2f} ms  p95 {o['p95_ms']:>8.2f} ms  errores {o['errores']}")
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la API")
+    parser.add_argument("--escenario", default="todos", choices=["todos", *ESCENARIOS])
+    parser.add_argument("--modo", default="asgi", choices=["asgi", "uvicorn"],
+                        help="asgi: en el mismo proceso; uvicorn: servidor real en localhost")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de medición por escenario")
+    parser.add_argument("--peticiones", type=int, default=None, help="Número fijo de peticiones (en lugar de duración)")
+    parser.add_argument("--calentamiento", type=float, default=2.0, help="Segundos de calentamiento por escenario")
+    parser.add_argument("--escala", type=float, default=0.05, help="Escala del dataset sintético")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--baseline", default=None, help="Archivo de baseline (por defecto baselines/carga_<modo>.json)")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guardar esta corrida como nuevo baseline")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION, help="Regresión tolerada (0.15 = 15 %%)")
+    args = parser.parse_args()
+
+    ruta_baseline = args.baseline or os.path.join(DIR_BASELINES, f"carga_{args.modo}.json")
+    resultados = asyncio.run(correr(args))
+
+    invalidos = [n for n, r in resultados.items() if r["peticiones"] and r["errores"] / r["peticiones"] > MAX_TASA_ERRORES]
+    if invalidos:
+        print(f"❌ Demasiados errores en: {', '.join(invalidos)}")
+        sys.exit(1)
+
+    if args.guardar_baseline:
+        guardar_baseline(ruta_baseline, {
+            "configuracion": {"modo": args.modo, "concurrencia": args.concurrencia, "duracion": args.duracion,
+                              "escala": args.escala, "semilla": args.semilla},
+            "entorno": descripcion_entorno(),
+            "escenarios": resultados,
+        })
+        return
+
+    baseline = cargar_baseline(ruta_baseline)
+    if baseline is None:
+        print(f"ℹ️  No hay baseline en {ruta_baseline}; use --guardar-baseline para crearlo")
+        return
+    configuracion = baseline.get("configuracion", {})
+    if configuracion.get("concurrencia") != args.concurrencia or configuracion.get("escala") != args.escala:
+        print("⚠️  El baseline se tomó con otra concurrencia o escala; la comparación es orientativa")
+
+    regresiones = comparar_con_baseline(resultados, baseline, args.umbral)
+    if regresiones:
+        print(f"❌ Regresiones mayores al {args.umbral:.0%}:")
+        for nombre, metrica, antes, ahora in regresiones:
+            print(f"   {nombre}: {metrica} {antes} → {ahora}")
+        sys.exit(1)
+    print(f"✅ Sin regresiones frente a {os.path.basename(ruta_baseline)}")
+
+if __name__ == "__main__":
+    main()
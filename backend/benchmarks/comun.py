@@ -0,0 +1,117 @@
+"""
+Utilidades compartidas por los benchmarks
+Sistema de Gestión Papelería Dohko
+"""
+
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+from datetime import date, datetime
+
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_BACKEND = os.path.dirname(DIR_BENCHMARKS)
+DIR_PROYECTO = os.path.dirname(DIR_BACKEND)
+DIR_BASELINES = os.path.join(DIR_BENCHMARKS, "baselines")
+# Bases generadas y copias de trabajo (no se versionan)
+DIR_DATOS = os.path.join(DIR_BENCHMARKS, ".datos")
+
+# Fecha final fija para que el mismo dataset se genere igual en cualquier día
+FECHA_DATASET = date(2026, 1, 1)
+
+def preparar_dataset(escala: float, semilla: int = 42, anios: int = 3) -> str:
+    """Generar (o reutilizar) la base sintética para esa escala y semilla"""
+    os.makedirs(DIR_DATOS, exist_ok=True)
+    ruta = os.path.join(DIR_DATOS, f"dataset_e{escala:g}_s{semilla}_a{anios}.db")
+    if os.path.exists(ruta):
+        return ruta
+
+    sys.path.insert(0, os.path.join(DIR_PROYECTO, "database"))
+    try:
+        from generar_datos import GeneradorDatos
+    finally:
+        sys.path.pop(0)
+
+    temporal = ruta + ".tmp"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    print(f"🏭 Generando dataset de benchmark (escala {escala:g}, semilla {semilla})...")
+    GeneradorDatos(temporal, escala, anios, semilla, FECHA_DATASET).generar()
+    os.replace(temporal, ruta)
+    return ruta
+
+def copia_de_trabajo(ruta_dataset: str, nombre: str, stock_ilimitado: bool = False) -> str:
+    """
+    Copiar el dataset para que las escrituras del benchmark no lo alteren.
+    Con stock_ilimitado las ventas generadas nunca se rechazan por falta de stock.
+    """
+    destino = os.path.join(DIR_DATOS, f"trabajo_{nombre}.db")
+    shutil.copyfile(ruta_dataset, destino)
+    if stock_ilimitado:
+        conn = sqlite3.connect(destino)
+        try:
+            conn.execute("UPDATE producto SET stock_actual = 1000000000")
+            conn.commit()
+        finally:
+            conn.close()
+    return destino
+
+def configurar_entorno(ruta_db: str):
+    """
+    Apuntar la aplicación a la base del benchmark. Debe llamarse antes de
+    importar 'app' o 'main', porque la conexión global lee el entorno al importar.
+    """
+    os.environ["DOHKO_DB_PATH"] = ruta_db
+    os.environ["DOHKO_RESPALDOS_DIR"] = os.path.join(DIR_DATOS, "respaldos")
+    os.environ["DOHKO_REPLICA_HABILITADA"] = "0"
+    if DIR_BACKEND not in sys.path:
+        sys.path.insert(0, DIR_BACKEND)
+
+def percentil(valores_ordenados: list, p: float) -> float:
+    """Percentil por interpolación lineal sobre una lista ya ordenada"""
+    if not valores_ordenados:
+        return 0.0
+    posicion = (len(valores_ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    fraccion = posicion - inferior
+    return valores_ordenados[inferior] * (1 - fraccion) + valores_ordenados[superior] * fraccion
+
+def resumir_latencias(segundos: list) -> dict:
+    """Percentiles de latencia en milisegundos"""
+    ordenados = sorted(segundos)
+    return {
+        "n": len(ordenados),
+        "media_ms": round(statistics.fmean(ordenados) * 1000, 3) if ordenados else 0.0,
+        "p50_ms": round(percentil(ordenados, 50) * 1000, 3),
+        "p90_ms": round(percentil(ordenados, 90) * 1000, 3),
+        "p95_ms": round(percentil(ordenados, 95) * 1000, 3),
+        "p99_ms": round(percentil(ordenados, 99) * 1000, 3),
+        "max_ms": round(ordenados[-1] * 1000, 3) if ordenados else 0.0,
+    }
+
+def descripcion_entorno() -> dict:
+    return {
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def cargar_baseline(ruta: str):
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+def guardar_baseline(ruta: str, datos: dict):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=2, sort_keys=True)
+        archivo.write("\n")
+    print(f"💾 Baseline guardado en {ruta}")
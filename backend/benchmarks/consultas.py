@@ -0,0 +1,99 @@
+"""
+Presupuesto de consultas por endpoint
+Sistema de Gestión Papelería Dohko
+
+Ejecuta cada endpoint una vez sobre el dataset sintético dentro de
+presupuesto_consultas y termina con código 1 si alguno supera su máximo de
+consultas o repite una misma sentencia más veces de lo permitido (un N+1
+que vuelve a aparecer). Los máximos no dependen del tamaño del dataset.
+
+Uso (desde backend/):
+    python -m benchmarks.consultas
+    python -m benchmarks.consultas --escala 0.05
+"""
+
+import argparse
+import sqlite3
+import sys
+
+from benchmarks.comun import preparar_dataset, copia_de_trabajo, configurar_entorno
+
+# (método, ruta, cuerpo, máximo de consultas, máximo de repeticiones de una sentencia)
+PRESUPUESTOS = [
+    ("GET", "/api/proveedores/ordenes", None, 3, 1),
+    ("GET", "/api/proveedores/", None, 3, 1),
+    ("GET", "/api/inventario/productos", None, 3, 1),
+    ("GET", "/api/inventario/productos/{producto}", None, 3, 1),
+    ("GET", "/api/inventario/disponibilidad/{producto}", None, 3, 1),
+    ("GET", "/api/inventario/alertas/stock-bajo", None, 3, 1),
+    ("GET", "/api/ventas/{venta}", None, 3, 1),
+    ("POST", "/api/proveedores/ordenes", "orden", 4, 1),
+    ("POST", "/api/ventas/", "venta", 14, 2),
+]
+
+def _datos(ruta_db: str) -> dict:
+    conn = sqlite3.connect(ruta_db)
+    try:
+        producto, precio, proveedor = conn.execute(
+            "SELECT id, precio, proveedor_id FROM producto WHERE proveedor_id IS NOT NULL ORDER BY id LIMIT 1"
+        ).fetchone()
+        productos = [fila[0] for fila in conn.execute(
+            "SELECT id FROM producto WHERE proveedor_id = ? ORDER BY id LIMIT 3", (proveedor,)
+        )]
+        (venta,) = conn.execute("SELECT MAX(id) FROM venta").fetchone()
+    finally:
+        conn.close()
+    return {
+        "producto": producto,
+        "venta": venta,
+        "orden": {"proveedor_id": proveedor, "productos": [{"producto_id": p, "cantidad": 10} for p in productos]},
+        "venta_cuerpo": {"productos": [{"producto_id": producto, "cantidad": 1, "precio_unitario": precio}],
+                         "tipo_pago": "efectivo"},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificar el presupuesto de consultas de cada endpoint")
+    parser.add_argument("--escala", type=float, default=0.01)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    ruta_db = copia_de_trabajo(preparar_dataset(args.escala, args.semilla), "consultas", stock_ilimitado=True)
+    configurar_entorno(ruta_db)
+    datos = _datos(ruta_db)
+
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.utils.contexto_peticion import presupuesto_consultas
+
+    # Sin 'with': no se inicia el ciclo de vida (réplica, programadores, cola)
+    cliente = TestClient(app)
+    fallas = 0
+    print(f"{'endpoint':<48} {'consultas':>10} {'máximo':>7}")
+    for metodo, ruta, cuerpo, maximo, repeticiones in PRESUPUESTOS:
+        url = ruta.format(**datos)
+        json = {"orden": datos["orden"], "venta": datos["venta_cuerpo"]}.get(cuerpo)
+        # La primera llamada crea tablas auxiliares y triggers; no cuenta
+        cliente.request(metodo, url, json=json)
+        try:
+            with presupuesto_consultas(maximo, repeticiones) as contextos:
+                respuesta = cliente.request(metodo, url, json=json)
+            error = None
+        except AssertionError as e:
+            error = str(e)
+        consultas = sum(c.consultas for c in contextos)
+        estado = "✅" if error is None and respuesta.status_code < 400 else "❌"
+        print(f"{estado} {metodo + ' ' + ruta:<46} {consultas:>10} {maximo:>7}")
+        if respuesta.status_code >= 400:
+            print(f"   respuesta {respuesta.status_code}: {respuesta.text[:200]}")
+            fallas += 1
+        elif error:
+            print("   " + error.replace("\n", "\n   "))
+            fallas += 1
+
+    if fallas:
+        print(f"\n❌ {fallas} endpoints fuera de presupuesto")
+        sys.exit(1)
+    print("\n✅ Todos los endpoints dentro del presupuesto")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Microbenchmarks de la capa de acceso a datos
+Sistema de Gestión Papelería Dohko
+
+Mide las rutas calientes de modelos y servicios sobre datasets sintéticos
+de varios tamaños, con calentamiento, repeticiones calibradas y comparación
+estadística (prueba U de Mann-Whitney) contra baselines/micro.json.
+
+Uso (desde backend/):
+    python -m benchmarks.micro                          # todos, escalas por defecto
+    python -m benchmarks.micro --filtro Producto --escalas 0.05
+    python -m benchmarks.micro --guardar-baseline
+"""
+
+import argparse
+import gc
+import math
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+
+from benchmarks.comun import (
+    DIR_BASELINES, DIR_DATOS, preparar_dataset, copia_de_trabajo, configurar_entorno,
+    descripcion_entorno, cargar_baseline, guardar_baseline
+)
+
+ESCALAS_DEFECTO = (0.01, 0.05, 0.2)
+# Duración mínima de cada repetición; las operaciones rápidas se repiten en bucle
+TIEMPO_MIN_REPETICION = 0.05
+UMBRAL_REGRESION = 0.25
+# Nivel de significancia para declarar un cambio
+ALFA = 0.01
+
+class ContextoMicro:
+    """Dataset de trabajo de una escala y los datos necesarios para armar llamadas"""
+
+    def __init__(self, escala: float, semilla: int):
+        self.escala = escala
+        self.rnd = random.Random(semilla)
+        self.ruta_db = copia_de_trabajo(preparar_dataset(escala, semilla), f"micro_e{escala:g}", stock_ilimitado=True)
+        configurar_entorno(self.ruta_db)
+
+        from app.database import db
+        # La conexión global se crea una vez por proceso: apuntarla a esta escala
+        db.db_path = self.ruta_db
+
+        conn = sqlite3.connect(self.ruta_db)
+        try:
+            self.productos = [fila for fila in conn.execute("SELECT id, precio FROM producto")]
+        finally:
+            conn.close()
+
+        # Catálogo de respaldos proporcional al tamaño (un respaldo por hora durante N días)
+        self.dir_respaldos = os.path.join(DIR_DATOS, f"respaldos_micro_e{escala:g}")
+        shutil.rmtree(self.dir_respaldos, ignore_errors=True)
+        os.environ["DOHKO_RESPALDOS_DIR"] = self.dir_respaldos
+        from app.services.backup_service import BackupService
+        self.backup_service = BackupService()
+        for i in range(max(24, int(escala * 5000))):
+            dia, hora = divmod(i, 24)
+            fecha = f"2025-{1 + dia // 28 % 12:02d}-{1 + dia % 28:02d} {hora:02d}:00:00"
+            self.backup_service.catalogo.registrar(
+                f"respaldo_sintetico_{i:06d}.db", 1024 * 1024, "0" * 64, "programado", fecha, {"producto": i})
+
+    def producto_aleatorio(self):
+        return self.rnd.choice(self.productos)
+
+def _definir_benchmarks(contexto: ContextoMicro) -> dict:
+    """
+    Cada benchmark es (operación, preparar). 'preparar' se ejecuta fuera del
+    tiempo medido y devuelve los argumentos de una llamada. Las lecturas van
+    primero para que las escrituras no alteren el dataset que miden.
+    """
+    from app.models.producto import Producto
+    from app.models.venta import Venta
+    from app.models.inventario import Inventario
+    from app.services.proveedores_service import ProveedoresService
+
+    proveedores_service = ProveedoresService()
+
+    def preparar_venta():
+        venta = Venta(total=0.0, administradora_id=1)
+        venta.registrar()
+        lineas = {}
+        for _ in range(3):
+            pid, precio = contexto.producto_aleatorio()
+            lineas[pid] = {"producto_id": pid, "cantidad": 1, "precio_unitario": precio}
+        return (venta, list(lineas.values()))
+
+    def preparar_inventario():
+        pid, _ = contexto.producto_aleatorio()
+        return (Inventario(pid, 1), Producto.obtener_por_id(pid), 1)
+
+    return {
+        "Producto.obtener_por_id": (Producto.obtener_por_id, lambda: (contexto.producto_aleatorio()[0],)),
+        "Producto.obtener_todos": (Producto.obtener_todos, None),
+        "Venta.obtener_todas": (Venta.obtener_todas, None),
+        "ProveedoresService.obtener_ordenes": (proveedores_service.obtener_ordenes, None),
+        "BackupService.listar_respaldos": (contexto.backup_service.listar_respaldos, None),
+        "Venta.agregar_productos": (lambda venta, lineas: venta.agregar_productos(lineas), preparar_venta),
+        "Inventario.actualizar_stock": (lambda inv, producto, cantidad: inv.actualizar_stock(producto, cantidad),
+                                        preparar_inventario),
+    }
+
+def _una_repeticion(operacion, preparar, iteraciones: int) -> float:
+    argumentos = [preparar() if preparar else () for _ in range(iteraciones)]
+    gc.collect()
+    inicio = time.perf_counter()
+    for args in argumentos:
+        operacion(*args)
+    return (time.perf_counter() - inicio) / iteraciones
+
+def medir(operacion, preparar, repeticiones: int, calentamiento: int) -> dict:
+    """Tiempo por llamada en microsegundos para cada repetición"""
+    for _ in range(calentamiento):
+        operacion(*(preparar() if preparar else ()))
+
+    # Calibrar: cuántas llamadas hacen falta para superar TIEMPO_MIN_REPETICION
+    por_llamada = _una_repeticion(operacion, preparar, 1)
+    iteraciones = max(1, min(10000, math.ceil(TIEMPO_MIN_REPETICION / max(por_llamada, 1e-7))))
+
+    muestras = [_una_repeticion(operacion, preparar, iteraciones) * 1e6 for _ in range(repeticiones)]
+    ordenadas = sorted(muestras)
+    cuartil = max(1, len(ordenadas) // 4)
+    return {
+        "iteraciones": iteraciones,
+        "mediana_us": round(statistics.median(muestras), 3),
+        "media_us": round(statistics.fmean(muestras), 3),
+        "desviacion_us": round(statistics.stdev(muestras), 3) if len(muestras) > 1 else 0.0,
+        "minimo_us": round(ordenadas[0], 3),
+        "iqr_us": round(ordenadas[-cuartil - 1] - ordenadas[cuartil], 3) if len(ordenadas) > 3 else 0.0,
+        "muestras_us": [round(m, 3) for m in muestras],
+    }
+
+def mann_whitney(a: list, b: list) -> float:
+    """Valor p bilateral de la prueba U de Mann-Whitney (aproximación normal con empates)"""
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+    combinados = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    rangos = [0.0] * len(combinados)
+    empates = 0.0
+    i = 0
+    while i < len(combinados):
+        j = i
+        while j + 1 < len(combinados) and combinados[j + 1][0] == combinados[i][0]:
+            j += 1
+        rango_medio = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            rangos[k] = rango_medio
+        t = j - i + 1
+        empates += t ** 3 - t
+        i = j + 1
+    r1 = sum(r for r, (_, grupo) in zip(rangos, combinados) if grupo == 0)
+    u = r1 - n1 * (n1 + 1) / 2
+    media = n1 * n2 / 2
+    n = n1 + n2
+    varianza = n1 * n2 / 12 * ((n + 1) - empates / (n * (n - 1)))
+    if varianza <= 0:
+        return 1.0
+    z = (abs(u - media) - 0.5) / math.sqrt(varianza)
+    return math.erfc(max(z, 0) / math.sqrt(2))
+
+def comparar(actual: dict, anterior: dict, umbral: float):
+    """Clasificar el cambio frente al baseline: 'regresion', 'mejora' o 'igual'"""
+    razon = actual["mediana_us"] / anterior["mediana_us"] if anterior["mediana_us"] else 1.0
+    p = mann_whitney(actual["muestras_us"], anterior["muestras_us"])
+    if p < ALFA and razon > 1 + umbral:
+        return "regresion", razon, p
+    if p < ALFA and razon < 1 - umbral:
+        return "mejora", razon, p
+    return "igual", razon, p
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de modelos y servicios")
+    parser.add_argument("--escalas", default=",".join(f"{e:g}" for e in ESCALAS_DEFECTO),
+                        help="Escalas de dataset separadas por coma")
+    parser.add_argument("--filtro", default="", help="Ejecutar solo benchmarks cuyo nombre contenga este texto")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--calentamiento", type=int, default=3, help="Llamadas de calentamiento")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--baseline", default=os.path.join(DIR_BASELINES, "micro.json"))
+    parser.add_argument("--guardar-baseline", action="store_true")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION, help="Cambio mínimo relevante (0.25 = 25 %%)")
+    args = parser.parse_args()
+
+    escalas = [float(e) for e in args.escalas.split(",") if e.strip()]
+    baseline = None if args.guardar_baseline else cargar_baseline(args.baseline)
+    resultados = {}
+    regresiones = []
+
+    for escala in escalas:
+        contexto = ContextoMicro(escala, args.semilla)
+        print(f"\n📐 Escala {escala:g}")
+        for nombre, (operacion, preparar) in _definir_benchmarks(contexto).items():
+            if args.filtro and args.filtro.lower() not in nombre.lower():
+                continue
+            resultado = medir(operacion, preparar, args.repeticiones, args.calentamiento)
+            clave = f"{nombre}@{escala:g}"
+            resultados[clave] = resultado
+
+            linea = f"   {nombre:36s} {resultado['mediana_us']:>12.1f} µs  ±{resultado['iqr_us']:.1f} (IQR)"
+            anterior = (baseline or {}).get("resultados", {}).get(clave)
+            if anterior:
+                veredicto, razon, p = comparar(resultado, anterior, args.umbral)
+                simbolo = {"regresion": "🔴", "mejora": "🟢", "igual": "⚪"}[veredicto]
+                linea += f"  {simbolo} x{razon:.2f} (p={p:.3f})"
+                if veredicto == "regresion":
+                    regresiones.append((clave, anterior["mediana_us"], resultado["mediana_us"], p))
+            print(linea)
+
+    if args.guardar_baseline:
+        guardar_baseline(args.baseline, {
+            "configuracion": {"repeticiones": args.repeticiones, "semilla": args.semilla, "escalas": escalas},
+            "entorno": descripcion_entorno(),
+            "resultados": resultados,
+        })
+        return
+    if baseline is None:
+        print(f"\nℹ️  No hay baseline en {args.baseline}; use --guardar-baseline para crearlo")
+        return
+    if regresiones:
+        print(f"\n❌ Regresiones significativas (más de {args.umbral:.0%}, p < {ALFA}):")
+        for clave, antes, ahora, p in regresiones:
+            print(f"   {clave}: {antes:.1f} µs → {ahora:.1f} µs (p={p:.4f})")
+        sys.exit(1)
+    print("\n✅ Sin regresiones significativas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark de serialización de listados grandes
+Sistema de Gestión Papelería Dohko
+
+Compara, sobre listados de N filas (100.000 por defecto), la ruta anterior
+(dataclass por fila -> esquema Pydantic -> validación y serialización de
+response_model) con la ruta directa de app.utils.respuesta_json (filas de
+SQLite -> JSON) con cada codificador disponible. Verifica además que ambas
+rutas devuelvan el mismo contenido.
+
+Uso (desde backend/):
+    python -m benchmarks.serializacion
+    python -m benchmarks.serializacion --filas 20000 --repeticiones 3
+"""
+
+import argparse
+import gc
+import json
+import os
+import sqlite3
+import statistics
+import time
+from typing import List
+
+from benchmarks.comun import preparar_dataset, copia_de_trabajo, configurar_entorno, descripcion_entorno
+
+ESCALA_DATASET = 0.05
+
+def _completar_filas(ruta_db: str, filas: int):
+    """Replicar productos y ventas existentes hasta tener 'filas' de cada uno"""
+    conn = sqlite3.connect(ruta_db)
+    try:
+        for tabla, columnas in (
+            ("producto", "nombre, descripcion, precio, stock_actual, stock_minimo, proveedor_id"),
+            ("venta", "fecha, total, estado, cliente_id, administradora_id, cliente_nombre, cliente_email, "
+                      "cliente_telefono, tipo_pago, observaciones"),
+        ):
+            (actuales,) = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()
+            while actuales < filas:
+                conn.execute(
+                    f"INSERT INTO {tabla} ({columnas}) SELECT {columnas} FROM {tabla} ORDER BY id LIMIT ?",
+                    (filas - actuales,)
+                )
+                (actuales,) = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()
+            conn.execute(f"DELETE FROM {tabla} WHERE id NOT IN (SELECT id FROM {tabla} ORDER BY id LIMIT ?)", (filas,))
+        conn.execute("UPDATE producto SET descripcion = COALESCE(descripcion, '')")
+        conn.commit()
+    finally:
+        conn.close()
+
+def _app_referencia():
+    """Los endpoints de listado tal como estaban: objeto del modelo y esquema Pydantic por fila"""
+    from fastapi import FastAPI
+    from app.models.producto import Producto
+    from app.models.venta import Venta
+    from app.schemas.inventario_schemas import ProductoResponse
+    from app.schemas.ventas_schemas import VentaResponse
+
+    app = FastAPI()
+
+    @app.get("/productos", response_model=List[ProductoResponse])
+    def productos():
+        return [
+            ProductoResponse(
+                id=p.id, nombre=p.nombre, descripcion=p.descripcion, precio=p.precio,
+                stock_actual=p.stock_actual, stock_minimo=p.stock_minimo, proveedor_id=p.proveedor_id
+            ) for p in Producto.obtener_todos()
+        ]
+
+    @app.get("/ventas", response_model=List[VentaResponse])
+    def ventas():
+        return [
+            VentaResponse(
+                id=v.id, fecha=v.fecha, total=v.total, estado=v.estado,
+                cliente_nombre=getattr(v, 'cliente_nombre', None),
+                cliente_email=getattr(v, 'cliente_email', None),
+                cliente_telefono=getattr(v, 'cliente_telefono', None),
+                tipo_pago=getattr(v, 'tipo_pago', None),
+                observaciones=getattr(v, 'observaciones', None),
+                cliente_id=v.cliente_id, administradora_id=v.administradora_id
+            ) for v in Venta.obtener_todas()
+        ]
+
+    return app
+
+def _medir(cliente, url: str, repeticiones: int) -> dict:
+    cliente.get(url)  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        tiempos.append(time.perf_counter() - inicio)
+        assert respuesta.status_code == 200, respuesta.text[:200]
+    return {"mediana_ms": statistics.median(tiempos) * 1000, "min_ms": min(tiempos) * 1000,
+            "bytes": len(respuesta.content), "cuerpo": respuesta.content}
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialización de listados: ruta con modelos vs ruta directa")
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    ruta_db = copia_de_trabajo(preparar_dataset(ESCALA_DATASET, args.semilla), "serializacion")
+    _completar_filas(ruta_db, args.filas)
+    configurar_entorno(ruta_db)
+    # Los listados completos superan el umbral de consulta lenta en cada repetición
+    os.environ.setdefault("DOHKO_UMBRAL_CONSULTA_LENTA_MS", "60000")
+
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.utils.respuesta_json import CODIFICADORES, usar_codificador
+
+    entorno = descripcion_entorno()
+    print(f"🖥️  Python {entorno['python']}, SQLite {entorno['sqlite']}, {entorno['cpus']} CPU, "
+          f"codificadores: {', '.join(CODIFICADORES)}")
+    print(f"📦 {args.filas} productos y {args.filas} ventas, {args.repeticiones} repeticiones\n")
+
+    # Sin 'with': no se inicia el ciclo de vida (réplica, programadores, cola)
+    referencia = TestClient(_app_referencia())
+    actual = TestClient(app)
+    rutas = (("productos", "/productos", "/api/inventario/productos"), ("ventas", "/ventas", "/api/ventas/"))
+
+    print(f"{'listado':<10} {'ruta':<18} {'mediana':>10} {'mínimo':>10} {'MB':>7} {'aceleración':>12}")
+    for nombre, url_referencia, url_actual in rutas:
+        base = _medir(referencia, url_referencia, args.repeticiones)
+        esperado = json.loads(base["cuerpo"])
+        print(f"{nombre:<10} {'modelos':<18} {base['mediana_ms']:>8.1f}ms {base['min_ms']:>8.1f}ms "
+              f"{base['bytes'] / 1e6:>7.2f} {'1.00x':>12}")
+        for codificador in CODIFICADORES:
+            anterior = usar_codificador(codificador)
+            try:
+                resultado = _medir(actual, url_actual, args.repeticiones)
+            finally:
+                usar_codificador(next(n for n, f in CODIFICADORES.items() if f is anterior))
+            iguales = json.loads(resultado["cuerpo"]) == esperado
+            print(f"{nombre:<10} {'directa/' + codificador:<18} {resultado['mediana_ms']:>8.1f}ms "
+                  f"{resultado['min_ms']:>8.1f}ms {resultado['bytes'] / 1e6:>7.2f} "
+                  f"{base['mediana_ms'] / resultado['mediana_ms']:>11.2f}x" + ("" if iguales else "  ❌ contenido distinto"))
+
+if __name__ == "__main__":
+    main()
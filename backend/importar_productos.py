@@ -0,0 +1,51 @@
+"""
+Importación masiva de productos desde la línea de comandos
+Sistema de Gestión Papelería Dohko
+
+Uso (desde backend/):
+    python importar_productos.py lista_precios.csv
+    python importar_productos.py catalogo.json --solo-validar
+    python importar_productos.py productos.txt --formato csv --reporte errores.json
+"""
+
+import argparse
+import json
+import sys
+
+from app.services.importacion_service import (
+    importacion_service, ErrorImportacion, formato_por_nombre, FORMATOS_IMPORTACION
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar productos (crear o actualizar por sku o nombre)")
+    parser.add_argument("archivo", help="Archivo CSV, JSON o NDJSON")
+    parser.add_argument("--formato", choices=FORMATOS_IMPORTACION, help="Se deduce de la extensión si no se indica")
+    parser.add_argument("--solo-validar", action="store_true", help="Validar sin guardar cambios")
+    parser.add_argument("--reporte", help="Guardar el resultado completo (con errores por fila) en este archivo JSON")
+    args = parser.parse_args()
+
+    formato = args.formato or formato_por_nombre(args.archivo)
+    if not formato:
+        parser.error("no se pudo deducir el formato; use --formato csv o --formato json")
+
+    try:
+        with open(args.archivo, "rb") as archivo:
+            resultado = importacion_service.importar_archivo(archivo, formato, args.solo_validar)
+    except (OSError, ErrorImportacion) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ {resultado['mensaje']}: {resultado['insertadas']} nuevos, {resultado['actualizadas']} actualizados, "
+          f"{resultado['combinadas']} repetidas combinadas, {resultado['con_errores']} con errores ({resultado['segundos']}s)")
+    for error in resultado["errores"][:20]:
+        print(f"   fila {error['fila']} ({error['clave']}): {'; '.join(error['errores'])}")
+    if resultado["con_errores"] > 20:
+        print(f"   ... y {resultado['con_errores'] - 20} filas más con errores")
+
+    if args.reporte:
+        with open(args.reporte, "w", encoding="utf-8") as salida:
+            json.dump(resultado, salida, ensure_ascii=False, indent=2)
+        print(f"📝 Reporte guardado en {args.reporte}")
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,63 @@ Sistema de Gestión Papelería Dohko
 """
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+import anyio
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.controllers import inventario_controller, ventas_controller, proveedores_controller, respaldos_controller
+from app.controllers import (
+    inventario_controller, ventas_controller, proveedores_controller, respaldos_controller, diagnostico_controller,
+    exportacion_controller, eventos_controller, sincronizacion_controller
+)
 from app.services.backup_scheduler import backup_scheduler
+from app.services.importacion_service import importacion_service
+from app.services.sincronizacion_service import sincronizacion_service
+from app.services.ventas_service import VentasService
+from app.services.job_scheduler import programador_tareas
+from app.services.tareas_service import cola_tareas
+from app.utils.eventos import difusor_eventos
+from app.utils.etag import MiddlewareETag, versiones_tablas
+from app.utils.idempotencia import MiddlewareIdempotencia, almacen_idempotencia
+from app.services.replication_service import replicacion_service, REPLICACION_HABILITADA
+from app.utils.medicion_http import MiddlewareMedicion
+from app.utils.metrics import registro_metricas, hilos_en_uso, hilos_en_espera, TIPO_CONTENIDO_PROMETHEUS
+
+# Claves de idempotencia vencidas: cada hora
+CRON_PURGA_IDEMPOTENCIA = "40 * * * *"
+# Tareas en segundo plano ya completadas: cada día a las 3:50 AM
+CRON_PURGA_TAREAS = "50 3 * * *"
+# Registro de cambios para sincronización: cada hora
+CRON_COMPACTAR_SYNC = "20 * * * *"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gestionar el ciclo de vida de la aplicación"""
     # Startup
     print("🚀 Iniciando Sistema de Gestión Papelería Dohko...")
+    # Antes de la réplica, para que sus triggers incluyan las columnas nuevas
+    importacion_service.asegurar_esquema()
+    VentasService.asegurar_esquema()
+    almacen_idempotencia.asegurar_esquema()
+    sincronizacion_service.asegurar_esquema()
+    versiones_tablas.asegurar_esquema()
+    programador_tareas.agregar_tarea("compactar_sync", CRON_COMPACTAR_SYNC, sincronizacion_service.compactar)
+    programador_tareas.agregar_tarea("purga_idempotencia", CRON_PURGA_IDEMPOTENCIA, almacen_idempotencia.purgar_expiradas)
+    cola_tareas.iniciar()
+    programador_tareas.agregar_tarea("purga_tareas", CRON_PURGA_TAREAS, cola_tareas.purgar_completadas)
     backup_scheduler.iniciar_programador()
+    if REPLICACION_HABILITADA:
+        replicacion_service.iniciar()
     print("✅ Sistema iniciado correctamente")
     
     yield
     
     # Shutdown
     print("🛑 Cerrando Sistema de Gestión Papelería Dohko...")
+    difusor_eventos.cerrar_todas()
+    if REPLICACION_HABILITADA:
+        replicacion_service.detener()
     backup_scheduler.detener_programador()
+    cola_tareas.detener()
     print("✅ Sistema cerrado correctamente")
 
 # Crear la aplicación FastAPI
@@ -33,7 +71,15 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Configurar CORS para permitir conexiones desde el frontend
+# Reintentos de POST con la misma Idempotency-Key repiten la respuesta guardada
+app.add_middleware(MiddlewareIdempotencia)
+
+# GET condicional: los listados sin cambios se responden 304 sin consultar la base
+app.add_middleware(MiddlewareETag)
+
+# Configurar CORS para permitir conexiones desde el frontend.
+# Va después de los middlewares que responden por su cuenta (respuestas
+# repetidas, 409, 422, 304) para que también lleven las cabeceras CORS.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # En producción, especificar dominios exactos
@@ -42,6 +88,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Medir todas las peticiones (duración por ruta, estado, tamaño y Server-Timing).
+# Se agrega al final para que envuelva al resto de middlewares.
+app.add_middleware(MiddlewareMedicion)
+
 # Incluir los controladores (routers)
 app.include_router(
     inventario_controller.router,
@@ -67,6 +117,30 @@ app.include_router(
     tags=["Respaldos"]
 )
 
+app.include_router(
+    diagnostico_controller.router,
+    prefix="/api/diagnostico",
+    tags=["Diagnóstico"]
+)
+
+app.include_router(
+    exportacion_controller.router,
+    prefix="/api/exportar",
+    tags=["Exportación"]
+)
+
+app.include_router(
+    eventos_controller.router,
+    prefix="/api/eventos",
+    tags=["Eventos"]
+)
+
+app.include_router(
+    sincronizacion_controller.router,
+    prefix="/api/sync",
+    tags=["Sincronización"]
+)
+
 # Ruta principal
 @app.get("/")
 def read_root():
@@ -81,6 +155,15 @@ def read_root():
 def health_check():
     return {"estado": "saludable"}
 
+# Métricas en formato Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    limitador = anyio.to_thread.current_default_thread_limiter()
+    hilos_en_uso.set(limitador.borrowed_tokens)
+    hilos_en_espera.set(limitador.statistics().tasks_waiting)
+    return Response(registro_metricas.exponer(), media_type=TIPO_CONTENIDO_PROMETHEUS)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Sin este límite el apagado espera a que se cierren los streams de /api/eventos
+    uvicorn.run(app, host="0.0.0.0", port=8000, timeout_graceful_shutdown=5)
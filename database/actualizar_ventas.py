@@ -5,10 +5,10 @@ Script para actualizar la tabla de ventas con campos adicionales
 import sqlite3
 import os
 
-def actualizar_tabla_ventas():
+def actualizar_tabla_ventas(db_path=None):
     """Agregar campos adicionales a la tabla venta"""
     
-    db_path = os.path.join(os.path.dirname(__file__), 'papeleria_dohko.db')
+    db_path = db_path or os.path.join(os.path.dirname(__file__), 'papeleria_dohko.db')
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
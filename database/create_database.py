@@ -6,9 +6,9 @@ Basado en el diagrama de clases proporcionado
 import sqlite3
 import os
 
-def create_database():
+def create_database(db_path=None):
     # Crear el directorio de la base de datos si no existe
-    db_path = os.path.join(os.path.dirname(__file__), 'papeleria_dohko.db')
+    db_path = db_path or os.path.join(os.path.dirname(__file__), 'papeleria_dohko.db')
     
     # Conectar a la base de datos (se crea si no existe)
     conn = sqlite3.connect(db_path)
@@ -56,9 +56,11 @@ def create_database():
         stock_actual INTEGER NOT NULL DEFAULT 0,
         stock_minimo INTEGER NOT NULL DEFAULT 0,
         proveedor_id INTEGER,
+        sku TEXT,
         FOREIGN KEY (proveedor_id) REFERENCES proveedor (id)
     )
     ''')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_producto_sku ON producto (sku) WHERE sku IS NOT NULL")
     
     # Tabla Inventario
     cursor.execute('''
@@ -0,0 +1,366 @@
+"""
+Generador de datos sintéticos para pruebas de rendimiento
+Sistema de Gestión Papelería Dohko
+
+Crea una base nueva con el esquema de create_database.py y la llena con
+productos, proveedores, clientes, años de ventas (con popularidad sesgada
+de productos), órdenes, facturas, pagos, movimientos de inventario y
+alertas. Con la misma semilla y la misma fecha final (por defecto
+FECHA_FINAL_DEFECTO) el resultado es idéntico.
+
+Uso:
+    python generar_datos.py --escala 1 --anios 3
+    python generar_datos.py --escala 10 --destino /tmp/dohko_10m.db --semilla 7
+
+Con --escala 1 y 3 años se generan alrededor de un millón de filas;
+el volumen de ventas crece linealmente con la escala.
+"""
+
+import argparse
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from create_database import create_database
+from actualizar_ventas import actualizar_tabla_ventas
+
+# Volumen base para escala 1
+VENTAS_POR_DIA = 150
+PRODUCTOS_BASE = 1500
+PROVEEDORES_BASE = 40
+CLIENTES_BASE = 3000
+
+# Filas acumuladas antes de escribir con executemany
+TAMAÑO_LOTE = 50000
+
+# Exponente de la distribución de Zipf para la popularidad de productos
+SESGO_POPULARIDAD = 1.1
+
+CATEGORIAS = [
+    ("Cuaderno", ["Universitario", "Espiral", "Cuadriculado", "Rayado", "Pequeño", "Profesional"], (1.2, 6.0)),
+    ("Bolígrafo", ["Azul", "Negro", "Rojo", "Gel", "Retráctil", "Punta Fina"], (0.3, 2.5)),
+    ("Lápiz", ["HB", "2B", "Bicolor", "Mecánico", "De Color", "Carpintero"], (0.2, 3.0)),
+    ("Borrador", ["Blanco", "Miga de Pan", "Bicolor", "Lápiz", "Eléctrico"], (0.2, 4.0)),
+    ("Carpeta", ["Manila", "Plástica", "Archivadora", "Con Vincha", "Acordeón"], (0.4, 5.5)),
+    ("Resma", ["A4", "Carta", "Oficio", "Reciclada", "Color"], (3.5, 9.0)),
+    ("Marcador", ["Permanente", "Tiza Líquida", "Resaltador", "Pizarra", "Punta Pincel"], (0.6, 3.5)),
+    ("Pegamento", ["Barra", "Líquido", "Silicona", "Escolar", "Contacto"], (0.5, 4.0)),
+    ("Tijera", ["Escolar", "Oficina", "Zigzag", "Punta Roma"], (0.9, 6.0)),
+    ("Regla", ["30 cm", "20 cm", "Flexible", "Metálica", "Escuadra"], (0.3, 3.0)),
+    ("Cartulina", ["Blanca", "Color", "Metalizada", "Corrugada", "Plastificada"], (0.2, 1.5)),
+    ("Calculadora", ["Básica", "Científica", "Financiera", "De Bolsillo"], (5.0, 35.0)),
+]
+MARCAS = ["Norma", "Bic", "Faber-Castell", "Pelikan", "Pilot", "Staedtler", "Maped", "Stabilo", "Artesco", "Paper Mate"]
+NOMBRES = ["Ana", "Luis", "Carla", "Jorge", "Sofía", "Diego", "Valeria", "Andrés", "Camila", "Mateo", "Lucía",
+           "Pablo", "Daniela", "Santiago", "Gabriela", "Miguel", "Paula", "José", "Fernanda", "David"]
+APELLIDOS = ["Pérez", "González", "Torres", "Vera", "Castillo", "Andrade", "Morales", "Paredes", "Salazar",
+             "Cevallos", "Guerrero", "Ortiz", "Mejía", "Ruiz", "Herrera", "Flores", "Jaramillo", "Ramos"]
+SECTORES = ["Solanda", "La Magdalena", "Chillogallo", "Quitumbe", "La Ecuatoriana", "El Recreo", "Villaflora",
+            "Centro Histórico", "La Mariscal", "Cotocollao", "Carcelén", "Conocoto"]
+SUFIJOS_EMPRESA = ["S.A.", "Cía. Ltda.", "Distribuidora", "Importadora", "Comercial"]
+
+# Temporada escolar de la Sierra (septiembre) y regreso de vacaciones en la Costa (abril)
+FACTOR_MES = {1: 0.8, 2: 0.9, 3: 1.0, 4: 1.3, 5: 1.0, 6: 0.9, 7: 0.9, 8: 1.4, 9: 1.8, 10: 1.1, 11: 1.0, 12: 1.2}
+FACTOR_DIA_SEMANA = [1.0, 1.0, 1.0, 1.0, 1.1, 1.3, 0.4]
+METODOS_PAGO = (["efectivo"] * 6) + (["tarjeta"] * 3) + ["transferencia"]
+# Fecha final fija: la misma semilla genera los mismos datos en cualquier día
+FECHA_FINAL_DEFECTO = date(2026, 1, 1)
+
+class GeneradorDatos:
+    """Escribe datos sintéticos deterministas en una base SQLite nueva"""
+
+    def __init__(self, ruta_db: str, escala: float = 1.0, anios: int = 3, semilla: int = 42, hasta: date = None):
+        self.ruta_db = ruta_db
+        self.escala = escala
+        self.anios = anios
+        self.rnd = random.Random(semilla)
+        self.hasta = hasta or FECHA_FINAL_DEFECTO
+        self.desde = self.hasta - timedelta(days=int(365 * anios))
+        self.conn = None
+        self.lotes = {}
+        self.conteos = {}
+
+        # Catálogos y personas crecen más despacio que el volumen de ventas
+        raiz = math.sqrt(escala)
+        self.num_productos = max(20, int(PRODUCTOS_BASE * raiz))
+        self.num_proveedores = max(3, int(PROVEEDORES_BASE * raiz))
+        self.num_clientes = max(10, int(CLIENTES_BASE * escala))
+
+    # ------------------------------------------------------------------
+    # Escritura por lotes
+    # ------------------------------------------------------------------
+
+    SENTENCIAS = {
+        "persona": "INSERT INTO persona (id, nombre, apellido, direccion, correo, tipo) VALUES (?, ?, ?, ?, ?, ?)",
+        "proveedor": "INSERT INTO proveedor (id, ruc, nombre_empresa, telefono) VALUES (?, ?, ?, ?)",
+        "cliente": "INSERT INTO cliente (id, tipo) VALUES (?, ?)",
+        "producto": """INSERT INTO producto (id, nombre, descripcion, precio, stock_actual, stock_minimo, proveedor_id)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        "venta": """INSERT INTO venta (id, fecha, total, estado, cliente_id, administradora_id, cliente_nombre,
+                                       cliente_email, cliente_telefono, tipo_pago, observaciones)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        "venta_producto": "INSERT INTO venta_producto (venta_id, producto_id, cantidad, precio_unitario) VALUES (?, ?, ?, ?)",
+        "pago": "INSERT INTO pago (monto, fecha, metodo, referencia, estado, venta_id, orden_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        "comprobante": "INSERT INTO comprobante (fecha, detalles, total, tipo, venta_id) VALUES (?, ?, ?, ?, ?)",
+        "orden": "INSERT INTO orden (id, fecha, estado, proveedor_id, administradora_id) VALUES (?, ?, ?, ?, ?)",
+        "orden_producto": "INSERT INTO orden_producto (orden_id, producto_id, cantidad, precio_unitario) VALUES (?, ?, ?, ?)",
+        "factura": "INSERT INTO factura (fecha, total, estado, orden_id, proveedor_id) VALUES (?, ?, ?, ?, ?)",
+        "inventario": "INSERT INTO inventario (producto_id, cantidad, fecha_actualizacion) VALUES (?, ?, ?)",
+        "alerta": "INSERT INTO alerta (mensaje, fecha, tipo, producto_id) VALUES (?, ?, ?, ?)",
+    }
+
+    def agregar(self, tabla: str, fila: tuple):
+        lote = self.lotes.setdefault(tabla, [])
+        lote.append(fila)
+        if len(lote) >= TAMAÑO_LOTE:
+            self.escribir(tabla)
+
+    def escribir(self, tabla: str = None):
+        """Volcar los lotes pendientes (de una tabla o de todas) con executemany"""
+        tablas = [tabla] if tabla else list(self.lotes)
+        for nombre in tablas:
+            lote = self.lotes.get(nombre)
+            if lote:
+                self.conn.executemany(self.SENTENCIAS[nombre], lote)
+                self.conteos[nombre] = self.conteos.get(nombre, 0) + len(lote)
+                lote.clear()
+
+    # ------------------------------------------------------------------
+    # Entidades
+    # ------------------------------------------------------------------
+
+    def _persona(self):
+        nombre = self.rnd.choice(NOMBRES)
+        apellido = self.rnd.choice(APELLIDOS)
+        return nombre, apellido, f"{self.rnd.choice(SECTORES)}, Quito"
+
+    def generar_personas(self):
+        siguiente_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM persona").fetchone()[0]
+        self.proveedores = []
+        for i in range(self.num_proveedores):
+            pid = siguiente_id + i
+            nombre, apellido, direccion = self._persona()
+            empresa = f"{apellido} {self.rnd.choice(SUFIJOS_EMPRESA)} {i + 1}"
+            self.agregar("persona", (pid, nombre, apellido, direccion, f"ventas{pid}@proveedor.ec", "proveedor"))
+            self.agregar("proveedor", (pid, f"17{self.rnd.randrange(10**8):08d}001", empresa, f"09{self.rnd.randrange(10**8):08d}"))
+            self.proveedores.append(pid)
+        siguiente_id += self.num_proveedores
+
+        self.clientes = []
+        for i in range(self.num_clientes):
+            cid = siguiente_id + i
+            nombre, apellido, direccion = self._persona()
+            correo = f"{nombre.lower()}.{apellido.lower()}{cid}@correo.ec"
+            self.agregar("persona", (cid, nombre, apellido, direccion, correo, "cliente"))
+            self.agregar("cliente", (cid, self.rnd.choices(["regular", "frecuente", "mayorista"], [80, 17, 3])[0]))
+            self.clientes.append((cid, f"{nombre} {apellido}", correo, f"09{self.rnd.randrange(10**8):08d}"))
+        self.escribir()
+
+    def generar_productos(self):
+        # Se conservan los productos de ejemplo de create_database.py
+        existentes = self.conn.execute("SELECT id, nombre, precio, stock_minimo FROM producto").fetchall()
+        self.productos = {pid: {"nombre": nombre, "precio": precio, "minimo": minimo}
+                          for pid, nombre, precio, minimo in existentes}
+        siguiente_id = max(self.productos, default=0) + 1
+        self.productos_proveedor = {pid: [] for pid in self.proveedores}
+
+        for i in range(self.num_productos):
+            pid = siguiente_id + i
+            categoria, variantes, (minimo_precio, maximo_precio) = self.rnd.choice(CATEGORIAS)
+            variante = self.rnd.choice(variantes)
+            marca = self.rnd.choice(MARCAS)
+            precio = round(self.rnd.uniform(minimo_precio, maximo_precio), 2)
+            stock_minimo = self.rnd.randint(5, 30)
+            proveedor_id = self.rnd.choice(self.proveedores)
+            self.productos[pid] = {"precio": precio, "minimo": stock_minimo, "nombre": f"{categoria} {variante} {marca} #{pid}"}
+            self.productos_proveedor[proveedor_id].append(pid)
+            # El stock final se fija después de generar los movimientos
+            self.agregar("producto", (pid, self.productos[pid]["nombre"], f"{categoria} {variante.lower()} marca {marca}",
+                                      precio, 0, stock_minimo, proveedor_id))
+        self.escribir()
+
+        # Popularidad de Zipf sobre un orden aleatorio de productos
+        ids = list(self.productos)
+        self.rnd.shuffle(ids)
+        self.ids_por_popularidad = ids
+        acumulado = 0.0
+        self.pesos_acumulados = []
+        for rango in range(len(ids)):
+            acumulado += 1.0 / (rango + 1) ** SESGO_POPULARIDAD
+            self.pesos_acumulados.append(acumulado)
+
+    # ------------------------------------------------------------------
+    # Historia
+    # ------------------------------------------------------------------
+
+    def _precio_historico(self, precio: float, dia: date) -> float:
+        # Aproximar una inflación del 3 % anual hacia atrás
+        anios_atras = (self.hasta - dia).days / 365
+        return round(precio / (1.03 ** anios_atras), 2)
+
+    def generar_ventas(self):
+        venta_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM venta").fetchone()[0]
+        ventas_dia = VENTAS_POR_DIA * self.escala
+        dia = self.desde
+        while dia <= self.hasta:
+            esperado = ventas_dia * FACTOR_MES[dia.month] * FACTOR_DIA_SEMANA[dia.weekday()]
+            cantidad_ventas = max(0, int(self.rnd.gauss(esperado, math.sqrt(esperado) + 1)))
+            texto_dia = dia.isoformat()
+
+            segundos = sorted(self.rnd.randrange(8 * 3600, 20 * 3600) for _ in range(cantidad_ventas))
+            for segundo in segundos:
+                venta_id += 1
+                fecha = f"{texto_dia} {segundo // 3600:02d}:{segundo % 3600 // 60:02d}:{segundo % 60:02d}"
+                lineas = min(1 + int(self.rnd.expovariate(0.8)), 8)
+                elegidos = set(self.rnd.choices(self.ids_por_popularidad, cum_weights=self.pesos_acumulados, k=lineas))
+
+                total = 0.0
+                for producto_id in elegidos:
+                    cantidad = min(1 + int(self.rnd.expovariate(0.7)), 20)
+                    precio = self._precio_historico(self.productos[producto_id]["precio"], dia)
+                    total += cantidad * precio
+                    self.agregar("venta_producto", (venta_id, producto_id, cantidad, precio))
+                total = round(total, 2)
+
+                estado = "cancelada" if self.rnd.random() < 0.02 else "completada"
+                metodo = self.rnd.choice(METODOS_PAGO)
+                if self.rnd.random() < 0.3:
+                    cliente_id, cliente_nombre, cliente_email, cliente_telefono = self.rnd.choice(self.clientes)
+                else:
+                    cliente_id = cliente_nombre = cliente_email = cliente_telefono = None
+                self.agregar("venta", (venta_id, fecha, total, estado, cliente_id, 1, cliente_nombre,
+                                       cliente_email, cliente_telefono, metodo, None))
+                self.agregar("comprobante", (fecha, f"Venta realizada el {fecha}", total, "venta", venta_id))
+                if estado == "completada":
+                    referencia = None if metodo == "efectivo" else f"{metodo[:3].upper()}-{venta_id:09d}"
+                    self.agregar("pago", (total, texto_dia, metodo, referencia, "completado", venta_id, None))
+
+            dia += timedelta(days=1)
+        self.escribir()
+
+    def generar_ordenes(self):
+        """Órdenes semanales por proveedor con su factura, pago y recepción en inventario"""
+        orden_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM orden").fetchone()[0]
+        recientes = self.hasta - timedelta(days=30)
+        semana = self.desde
+        while semana <= self.hasta:
+            for proveedor_id in self.proveedores:
+                if self.rnd.random() >= 0.5:
+                    continue
+                catalogo = self.productos_proveedor[proveedor_id] or self.ids_por_popularidad
+                dia = semana + timedelta(days=self.rnd.randrange(7))
+                if dia > self.hasta:
+                    continue
+                orden_id += 1
+                if dia >= recientes:
+                    estado = self.rnd.choice(["pendiente", "confirmada", "en_transito", "entregada"])
+                else:
+                    estado = "cancelada" if self.rnd.random() < 0.08 else "entregada"
+                self.agregar("orden", (orden_id, dia.isoformat(), estado, proveedor_id, 1))
+
+                total = 0.0
+                recepcion = f"{(dia + timedelta(days=3)).isoformat()} 09:00:00"
+                for producto_id in self.rnd.sample(catalogo, min(len(catalogo), self.rnd.randint(2, 10))):
+                    cantidad = self.rnd.randrange(20, 201, 10)
+                    costo = round(self._precio_historico(self.productos[producto_id]["precio"], dia) * 0.6, 2)
+                    total += cantidad * costo
+                    self.agregar("orden_producto", (orden_id, producto_id, cantidad, costo))
+                    if estado == "entregada":
+                        self.agregar("inventario", (producto_id, cantidad, recepcion))
+
+                if estado == "entregada":
+                    pagada = dia < recientes
+                    self.agregar("factura", (dia.isoformat(), round(total, 2), "pagada" if pagada else "pendiente",
+                                             orden_id, proveedor_id))
+                    if pagada:
+                        fecha_pago = (dia + timedelta(days=self.rnd.randint(5, 25))).isoformat()
+                        self.agregar("pago", (round(total, 2), fecha_pago, "transferencia", None, "completado", None, orden_id))
+            semana += timedelta(days=7)
+        self.escribir()
+
+    def generar_stock_y_alertas(self):
+        """Ajustes de inventario, stock final y alertas de stock bajo (históricas y vigentes)"""
+        dias_historia = (self.hasta - self.desde).days
+        for producto_id, producto in self.productos.items():
+            # Conteos físicos ocasionales con pequeñas diferencias
+            for _ in range(self.rnd.randint(0, 2 * self.anios)):
+                dia = self.desde + timedelta(days=self.rnd.randrange(dias_historia + 1))
+                self.agregar("inventario", (producto_id, self.rnd.randint(-5, 5) or -1, f"{dia.isoformat()} 18:30:00"))
+
+            minimo = producto["minimo"]
+            nombre = producto["nombre"]
+            for _ in range(self.rnd.randint(0, self.anios)):
+                dia = self.desde + timedelta(days=self.rnd.randrange(dias_historia + 1))
+                stock = self.rnd.randint(0, minimo)
+                self.agregar("alerta", (f"Stock bajo para {nombre}. Stock actual: {stock}, Mínimo: {minimo}",
+                                        dia.isoformat(), "stock_bajo", producto_id))
+
+            if self.rnd.random() < 0.08:
+                stock = self.rnd.randint(0, minimo)
+                self.agregar("alerta", (f"Stock bajo para {nombre}. Stock actual: {stock}, Mínimo: {minimo}",
+                                        self.hasta.isoformat(), "stock_bajo", producto_id))
+            else:
+                stock = self.rnd.randint(minimo + 1, minimo * 10)
+            producto["stock"] = stock
+        self.escribir()
+        self.conn.executemany("UPDATE producto SET stock_actual = ? WHERE id = ?",
+                              [(p["stock"], pid) for pid, p in self.productos.items()])
+
+    # ------------------------------------------------------------------
+
+    def generar(self):
+        inicio = time.perf_counter()
+        create_database(self.ruta_db)
+        actualizar_tabla_ventas(self.ruta_db)
+
+        self.conn = sqlite3.connect(self.ruta_db, isolation_level=None)
+        try:
+            # Base nueva y desechable: se prioriza la velocidad de carga
+            self.conn.execute("PRAGMA journal_mode = OFF")
+            self.conn.execute("PRAGMA synchronous = OFF")
+            self.conn.execute("PRAGMA cache_size = -200000")
+            self.conn.execute("BEGIN")
+            for paso in (self.generar_personas, self.generar_productos, self.generar_ventas,
+                         self.generar_ordenes, self.generar_stock_y_alertas):
+                inicio_paso = time.perf_counter()
+                paso()
+                print(f"   {paso.__name__}: {time.perf_counter() - inicio_paso:.1f}s")
+            self.conn.execute("COMMIT")
+            self.conn.execute("ANALYZE")
+            self.conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            self.conn.close()
+
+        total = sum(self.conteos.values())
+        duracion = time.perf_counter() - inicio
+        return {"filas": total, "conteos": self.conteos, "segundos": round(duracion, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar una base de datos sintética para pruebas de rendimiento")
+    parser.add_argument("--escala", type=float, default=1.0, help="Factor de escala (1 ≈ un millón de filas con 3 años)")
+    parser.add_argument("--anios", type=int, default=3, help="Años de historia de ventas")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla del generador aleatorio")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=FECHA_FINAL_DEFECTO,
+                        help=f"Fecha final de la historia (AAAA-MM-DD); por defecto {FECHA_FINAL_DEFECTO.isoformat()}")
+    parser.add_argument("--destino", default=os.path.join(os.path.dirname(__file__), "papeleria_dohko_sintetica.db"),
+                        help="Archivo de base de datos a crear")
+    parser.add_argument("--sobrescribir", action="store_true", help="Reemplazar el archivo destino si existe")
+    args = parser.parse_args()
+
+    destino = os.path.abspath(args.destino)
+    if os.path.exists(destino):
+        if not args.sobrescribir:
+            parser.error(f"{destino} ya existe (use --sobrescribir para reemplazarlo)")
+        os.remove(destino)
+
+    print(f"🏭 Generando datos sintéticos (escala {args.escala}, {args.anios} años, semilla {args.semilla}) en {destino}")
+    resultado = GeneradorDatos(destino, args.escala, args.anios, args.semilla, args.hasta).generar()
+    for tabla, cantidad in sorted(resultado["conteos"].items()):
+        print(f"   {tabla:15s} {cantidad:>12,d}")
+    print(f"✅ {resultado['filas']:,d} filas en {resultado['segundos']}s")
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,24 @@ const ListaVentas = () => {
 
   useEffect(() => {
     cargarVentas();
+
+    // Agregar o quitar ventas según los eventos, sin volver a pedir el historial completo
+    const cerrar = apiService.suscribirEventos({
+      venta_registrada: async ({ id }) => {
+        const resultado = await apiService.obtenerVenta(id);
+        if (!resultado.exito) {
+          cargarVentas();
+          return;
+        }
+        // Las filas del historial no incluyen los productos
+        const venta = { ...resultado.data };
+        delete venta.productos;
+        setVentas(actuales => actuales.some(v => v.id === id) ? actuales : [venta, ...actuales]);
+      },
+      venta_eliminada: ({ id }) => setVentas(actuales => actuales.filter(v => v.id !== id)),
+      reinicio: () => cargarVentas()
+    });
+    return cerrar;
   }, []);
 
   const cargarVentas = async () => {
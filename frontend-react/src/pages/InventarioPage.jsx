@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import RegistrarProducto from '../components/inventario/RegistrarProducto';
 import ActualizarProducto from '../components/inventario/ActualizarProducto';
 import ListaProductos from '../components/inventario/ListaProductos';
@@ -9,6 +9,9 @@ const InventarioPage = () => {
   const [subPestana, setSubPestana] = useState('productos');
   const [productos, setProductos] = useState([]);
   const [cargando, setCargando] = useState(false);
+  // Lista vigente para los manejadores de eventos (se registran una sola vez)
+  const productosRef = useRef(productos);
+  productosRef.current = productos;
 
   const subPestanas = [
     { id: 'productos', nombre: 'Ver Productos', icono: '📋' },
@@ -50,6 +53,23 @@ const InventarioPage = () => {
 
   useEffect(() => {
     cargarProductos();
+
+    // Actualizar el stock en la lista sin volver a pedir todos los productos
+    const cerrar = apiService.suscribirEventos({
+      stock_actualizado: ({ producto_id, stock_actual, stock_minimo }) => {
+        // Producto que aún no está en la lista: recargarla completa
+        if (!productosRef.current.some(p => p.id === producto_id)) {
+          cargarProductos();
+          return;
+        }
+        setProductos(actuales =>
+          actuales.map(p => p.id === producto_id ? { ...p, stock_actual, stock_minimo } : p)
+        );
+      },
+      productos_importados: () => cargarProductos(),
+      reinicio: () => cargarProductos()
+    });
+    return cerrar;
   }, []);
 
   return (
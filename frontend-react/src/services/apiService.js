@@ -197,6 +197,20 @@ class ApiService {
       body: JSON.stringify({ monto })
     });
   }
+
+  // ============ EVENTOS ============
+
+  // Suscribirse al stream de cambios. manejadores: { stock_actualizado: (datos) => ..., reinicio: () => ... }
+  // El navegador reconecta solo y reenvía Last-Event-ID, así no se pierden eventos.
+  // Devuelve una función para cerrar la suscripción.
+  suscribirEventos(manejadores) {
+    const tipos = Object.keys(manejadores).filter(tipo => tipo !== 'reinicio');
+    const fuente = new EventSource(`${API_BASE_URL}/eventos/stream?tipos=${tipos.join(',')}`);
+    Object.entries(manejadores).forEach(([tipo, manejador]) => {
+      fuente.addEventListener(tipo, (evento) => manejador(JSON.parse(evento.data)));
+    });
+    return () => fuente.close();
+  }
 }
 
 // Exportar una instancia única del servicio